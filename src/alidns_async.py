@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+from urllib.parse import quote
+
+import aiohttp
+
+
+logger = logging.getLogger(__name__)
+ALIDNS_ENDPOINT = "https://alidns.aliyuncs.com/"
+ALIDNS_API_VERSION = "2015-01-09"
+ALIDNS_TIMEOUT_SECONDS = 15
+ALIDNS_MAX_CONNECTIONS = 8
+SDK_MANAGED_PARAMS = {"Format", "Version", "AccessKeyId", "SignatureMethod", "SignatureVersion", "SignatureNonce", "Timestamp", "Signature"}
+
+
+class AlidnsApiError(Exception):
+    def __init__(self, action: str, status: int, code: str | None, message: str | None, request_id: str | None = None):
+        super().__init__(f"{action} 调用失败: status={status} code={code} message={message} request_id={request_id}")
+        self.action = action
+        self.status = status
+        self.code = code
+        self.message = message
+        self.request_id = request_id
+
+
+def percent_encode(value: object) -> str:
+    return quote(str(value), safe="~")
+
+
+def flatten_params(params: dict[str, Any]) -> dict[str, str]:
+    """把列表参数展开成 RPC 风格的 Key.N.SubKey 形式，并丢弃 None。"""
+    flattened: dict[str, str] = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, list):
+            singular_key = key[:-1] if key.endswith("s") else key
+            for index, item in enumerate(value, start=1):
+                if isinstance(item, dict):
+                    for sub_key, sub_value in item.items():
+                        if sub_value is not None:
+                            flattened[f"{singular_key}.{index}.{sub_key}"] = str(sub_value)
+                else:
+                    flattened[f"{singular_key}.{index}"] = str(item)
+            continue
+        flattened[key] = str(value)
+    return flattened
+
+
+def sign_rpc_params(
+    action: str,
+    params: dict[str, str],
+    access_key_id: str,
+    access_key_secret: str,
+    timestamp: str | None = None,
+    nonce: str | None = None,
+    version: str = ALIDNS_API_VERSION,
+) -> dict[str, str]:
+    """按阿里云 RPC 签名 v1 (HMAC-SHA1) 生成完整的请求参数。"""
+    signed_params = {
+        "Format": "JSON",
+        "Version": version,
+        "AccessKeyId": access_key_id,
+        "SignatureMethod": "HMAC-SHA1",
+        "SignatureVersion": "1.0",
+        "SignatureNonce": nonce or uuid.uuid4().hex,
+        "Timestamp": timestamp or datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if action:
+        signed_params["Action"] = action
+    signed_params.update(params)
+
+    canonical_query = "&".join(f"{percent_encode(key)}={percent_encode(signed_params[key])}" for key in sorted(signed_params))
+    string_to_sign = f"GET&{percent_encode('/')}&{percent_encode(canonical_query)}"
+    digest = hmac.new(f"{access_key_secret}&".encode("utf-8"), string_to_sign.encode("utf-8"), hashlib.sha1).digest()
+    signed_params["Signature"] = base64.b64encode(digest).decode("utf-8")
+    return signed_params
+
+
+class AsyncAlidnsClient:
+    """基于 aiohttp 连接池的 Alidns 异步客户端，每个事件循环持有一个独立会话。"""
+
+    def __init__(
+        self,
+        access_key_id: str,
+        access_key_secret: str,
+        endpoint: str = ALIDNS_ENDPOINT,
+        timeout_seconds: int = ALIDNS_TIMEOUT_SECONDS,
+        max_connections: int = ALIDNS_MAX_CONNECTIONS,
+    ):
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.endpoint = endpoint
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self._sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def call(self, action: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        signed_params = sign_rpc_params(action, flatten_params(params or {}), self.access_key_id, self.access_key_secret)
+        async with self._get_session().get(self.endpoint, params=signed_params) as response:
+            body = await response.text()
+            try:
+                payload = json.loads(body) if body else {}
+            except json.JSONDecodeError:
+                payload = {"Message": body}
+            if response.status != 200:
+                raise AlidnsApiError(action, response.status, payload.get("Code"), payload.get("Message"), payload.get("RequestId"))
+            return payload
+
+    async def describe_domain_records(
+        self,
+        domain_name: str,
+        page_number: int = 1,
+        page_size: int = 500,
+        record_type: str | None = None,
+    ) -> dict[str, Any]:
+        params = {"DomainName": domain_name, "PageNumber": page_number, "PageSize": page_size, "Type": record_type}
+        return await self.call("DescribeDomainRecords", params)
+
+    async def describe_sub_domain_records(
+        self,
+        sub_domain: str,
+        page_number: int = 1,
+        page_size: int = 500,
+        record_type: str | None = None,
+        line: str | None = None,
+    ) -> dict[str, Any]:
+        params = {"SubDomain": sub_domain, "PageNumber": page_number, "PageSize": page_size, "Type": record_type, "Line": line}
+        return await self.call("DescribeSubDomainRecords", params)
+
+    async def add_domain_record(self, domain_name: str, rr: str, record_type: str, value: str, line: str) -> dict[str, Any]:
+        params = {"DomainName": domain_name, "RR": rr, "Type": record_type, "Value": value, "Line": line}
+        return await self.call("AddDomainRecord", params)
+
+    async def update_domain_record(self, record_id: str, rr: str, record_type: str, value: str, line: str) -> dict[str, Any]:
+        params = {"RecordId": record_id, "RR": rr, "Type": record_type, "Value": value, "Line": line}
+        return await self.call("UpdateDomainRecord", params)
+
+    async def delete_domain_record(self, record_id: str) -> dict[str, Any]:
+        return await self.call("DeleteDomainRecord", {"RecordId": record_id})
+
+    async def operate_batch_domain(self, operation_type: str, record_infos: list[dict[str, str]]) -> dict[str, Any]:
+        return await self.call("OperateBatchDomain", {"Type": operation_type, "DomainRecordInfos": record_infos})
+
+    async def describe_batch_result_count(self, task_id: str, batch_type: str) -> dict[str, Any]:
+        return await self.call("DescribeBatchResultCount", {"TaskId": task_id, "BatchType": batch_type})
+
+    async def describe_batch_result_detail(self, task_id: str, batch_type: str, page_number: int, page_size: int) -> dict[str, Any]:
+        params = {"TaskId": task_id, "BatchType": batch_type, "PageNumber": page_number, "PageSize": page_size}
+        return await self.call("DescribeBatchResultDetail", params)
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+class AlidnsSyncClient:
+    """在后台事件循环线程上驱动异步客户端，对外提供与 AcsClient 一致的 do_action_with_exception。"""
+
+    def __init__(self, async_client: AsyncAlidnsClient):
+        self.async_client = async_client
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="alidns-async", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, coroutine):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        return future.result(timeout=self.async_client.timeout_seconds * 2)
+
+    def do_action_with_exception(self, request) -> bytes:
+        action = request.get_action_name()
+        params = {key: value for key, value in (request.get_query_params() or {}).items() if key not in SDK_MANAGED_PARAMS}
+        response_json = self.run(self.async_client.call(action, params))
+        return json.dumps(response_json).encode("utf-8")
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(self.async_client.close(), loop).result(timeout=self.async_client.timeout_seconds)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=self.async_client.timeout_seconds)
+        loop.close()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import logging
+import math
+import random
+import statistics
+from dataclasses import dataclass
+
+from .latency_scoring import LatencyEstimate
+from .project_constants import BANDIT_UNKNOWN_ARM_PRIOR_RATIO, LATENCY_SCORE_PRIOR_STDDEV_SECONDS
+from .runtime_state import RuntimeState, get_candidate_latency_estimate
+from .workflow_rules import get_probe_profile
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BanditDecision:
+    line_name: str
+    chosen: list[str]
+    explored: list[str]
+    regret_seconds: float
+
+
+class ThompsonCandidateSampler:
+    """对 (ip, line) 做 Thompson 采样：按各 IP 延迟后验各抽一个样本，取最小的若干个。
+
+    已有估计的 IP 后验为 N(均值, (方差 + 先验方差) / 样本数)；从未测过的 IP 以同线路已知均值的中位数
+    （没有时取筛选阈值的一半）为均值、先验标准差为宽度，因此新 IP 会按不确定性获得探索机会。
+    """
+
+    def __init__(self, state: RuntimeState, rng: random.Random | None = None):
+        self.state = state
+        self.rng = rng or random.Random()
+        self.decisions: list[BanditDecision] = []
+
+    def _posteriors(self, line_name: str, ip_addresses: list[str]) -> dict[str, tuple[float, float]]:
+        estimates = {}
+        for ip_address in ip_addresses:
+            stored_estimate = get_candidate_latency_estimate(self.state, line_name, ip_address)
+            if stored_estimate is not None:
+                estimates[ip_address] = LatencyEstimate.from_list(stored_estimate)
+
+        if estimates:
+            unknown_mean = statistics.median(estimate.mean for estimate in estimates.values())
+        else:
+            unknown_mean = get_probe_profile(line_name).first_pass_max_total_time_seconds * BANDIT_UNKNOWN_ARM_PRIOR_RATIO
+
+        posteriors = {}
+        for ip_address in ip_addresses:
+            estimate = estimates.get(ip_address)
+            if estimate is None:
+                posteriors[ip_address] = (unknown_mean, LATENCY_SCORE_PRIOR_STDDEV_SECONDS)
+            else:
+                posteriors[ip_address] = (
+                    estimate.mean,
+                    math.sqrt((estimate.variance + LATENCY_SCORE_PRIOR_STDDEV_SECONDS**2) / max(estimate.samples, 1)),
+                )
+        return posteriors
+
+    def draw_latencies(self, line_name: str, ip_addresses: list[str]) -> dict[str, float]:
+        """为每个候选从延迟后验抽一个样本，供需要自行组合决策的调用方（如轮换规划）使用。"""
+        posteriors = self._posteriors(line_name, ip_addresses)
+        return {ip_address: self.rng.gauss(*posteriors[ip_address]) for ip_address in sorted(set(ip_addresses))}
+
+    def note_decision(self, line_name: str, ip_addresses: list[str], chosen: list[str]) -> None:
+        """记录一次选择，计算其中偏离贪心选择的探索数量与预期延迟损失。"""
+        if not chosen:
+            return
+        posteriors = self._posteriors(line_name, ip_addresses)
+        greedy = sorted(set(ip_addresses), key=lambda ip_address: (posteriors[ip_address][0], ip_address))[: len(chosen)]
+        greedy_set = set(greedy)
+        self.decisions.append(
+            BanditDecision(
+                line_name=line_name,
+                chosen=list(chosen),
+                explored=[ip_address for ip_address in chosen if ip_address not in greedy_set],
+                regret_seconds=(
+                    statistics.fmean(posteriors[ip_address][0] for ip_address in chosen)
+                    - statistics.fmean(posteriors[ip_address][0] for ip_address in greedy)
+                ),
+            )
+        )
+
+    def __call__(self, line_name: str, ip_addresses: list[str], limit: int) -> list[str]:
+        """从候选中选出 limit 个 IP；可直接作为 getIPFromW3 的候选采样器。"""
+        unique_ips = sorted(set(ip_addresses))
+        if len(unique_ips) <= limit:
+            return unique_ips
+
+        draws = self.draw_latencies(line_name, unique_ips)
+        chosen = sorted(unique_ips, key=lambda ip_address: (draws[ip_address], ip_address))[:limit]
+        self.note_decision(line_name, unique_ips, chosen)
+        return chosen
+
+    def log_summary(self, purpose: str) -> None:
+        """输出本批决策的探索率与相对贪心选择的预期延迟损失（秒/个）。"""
+        if not self.decisions:
+            return
+        chosen_count = sum(len(decision.chosen) for decision in self.decisions)
+        explored_count = sum(len(decision.explored) for decision in self.decisions)
+        logger.info(
+            "候选探索统计: purpose=%s decisions=%s exploration_rate=%.2f expected_regret=%.3fs lines=%s",
+            purpose,
+            len(self.decisions),
+            explored_count / chosen_count if chosen_count else 0.0,
+            statistics.fmean(decision.regret_seconds for decision in self.decisions),
+            {
+                decision.line_name: f"{len(decision.explored)}/{len(decision.chosen)}"
+                for decision in self.decisions
+            },
+        )
+        self.decisions = []
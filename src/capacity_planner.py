@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+
+logger = logging.getLogger(__name__)
+
+
+ADDRESS_RECORD_TYPES = ("A", "AAAA")
+
+
+@dataclass
+class ZoneCapacity:
+    """同一 zone 内按线路统计已用与剩余的记录槽位，并为各 RR 的下限/temp 池预留额度。
+
+    package_num 视为 zone 内每条线路上所有 RR 共享的地址记录（A/AAAA）槽位数；MX、TXT 等其他类型的记录
+    不占用该配额，不计入已用槽位。
+    """
+
+    domain_root: str
+    package_num: int
+    used: dict[tuple[str, str], int] = field(default_factory=dict)
+    reserved: dict[tuple[str, str], int] = field(default_factory=dict)
+
+    @classmethod
+    def from_records(cls, domain_root: str, package_num: int, records: Iterable[Mapping[str, object]]) -> ZoneCapacity:
+        capacity = cls(domain_root=domain_root, package_num=package_num)
+        for record in records:
+            rr = str(record.get("RR", ""))
+            line_key = str(record.get("Line", "")).lower()
+            if rr and line_key and str(record.get("Type") or "A") in ADDRESS_RECORD_TYPES:
+                capacity.record_added(rr, line_key)
+        return capacity
+
+    def reserve(self, rr: str, line: str, count: int) -> None:
+        """为 RR 在该线路上预留至少 count 个槽位，重复调用取较大值。"""
+        record_key = (rr, line.lower())
+        self.reserved[record_key] = max(self.reserved.get(record_key, 0), min(count, self.package_num))
+
+    def line_used(self, line: str) -> int:
+        line_key = line.lower()
+        return sum(count for (_, used_line), count in self.used.items() if used_line == line_key)
+
+    def available(self, rr: str, line: str) -> int:
+        """扣除其他 RR 尚未用满的预留后，该 RR 在线路上还能新增的记录数。"""
+        line_key = line.lower()
+        protected_slots = sum(
+            max(reserved_count - self.used.get(record_key, 0), 0)
+            for record_key, reserved_count in self.reserved.items()
+            if record_key[1] == line_key and record_key[0] != rr
+        )
+        return max(self.package_num - self.line_used(line_key) - protected_slots, 0)
+
+    def plan_additions(
+        self,
+        rr: str,
+        pending_additions: list[tuple[str, str]],
+    ) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+        """按剩余槽位裁剪一组 (line, value) 新增计划，返回 (可执行, 被拒绝)。"""
+        remaining_by_line: dict[str, int] = {}
+        allowed: list[tuple[str, str]] = []
+        refused: list[tuple[str, str]] = []
+        for line, value in pending_additions:
+            line_key = line.lower()
+            if line_key not in remaining_by_line:
+                remaining_by_line[line_key] = self.available(rr, line_key)
+            if remaining_by_line[line_key] <= 0:
+                refused.append((line, value))
+                continue
+            remaining_by_line[line_key] -= 1
+            allowed.append((line, value))
+
+        if refused:
+            logger.warning(
+                "线路配额不足，提前裁剪新增计划: domain=%s rr=%s refused=%s",
+                self.domain_root,
+                rr,
+                sorted({line for line, _ in refused}),
+            )
+        return allowed, refused
+
+    def record_added(self, rr: str, line: str, count: int = 1) -> None:
+        record_key = (rr, line.lower())
+        self.used[record_key] = self.used.get(record_key, 0) + count
+
+    def record_removed(self, rr: str, line: str, count: int = 1) -> None:
+        record_key = (rr, line.lower())
+        self.used[record_key] = max(self.used.get(record_key, 0) - count, 0)
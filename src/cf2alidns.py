@@ -2,21 +2,68 @@ from __future__ import annotations
 
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from typing import Any
 
 from aliyunsdkalidns.request.v20150109.AddDomainRecordRequest import AddDomainRecordRequest
 from aliyunsdkalidns.request.v20150109.DeleteDomainRecordRequest import DeleteDomainRecordRequest
+from aliyunsdkalidns.request.v20150109.DescribeBatchResultCountRequest import DescribeBatchResultCountRequest
+from aliyunsdkalidns.request.v20150109.DescribeBatchResultDetailRequest import DescribeBatchResultDetailRequest
 from aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest import DescribeDomainRecordsRequest
-from aliyunsdkcore.client import AcsClient
-
+from aliyunsdkalidns.request.v20150109.DescribeSubDomainRecordsRequest import DescribeSubDomainRecordsRequest
+from aliyunsdkalidns.request.v20150109.OperateBatchDomainRequest import OperateBatchDomainRequest
+from aliyunsdkalidns.request.v20150109.SetDNSSLBStatusRequest import SetDNSSLBStatusRequest
+from aliyunsdkalidns.request.v20150109.UpdateDNSSLBWeightRequest import UpdateDNSSLBWeightRequest
+from aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest import UpdateDomainRecordRequest
+
+from .alidns_async import AlidnsApiError, AlidnsSyncClient, AsyncAlidnsClient
+from .capacity_planner import ZoneCapacity
+from .mutation_journal import JournalEntry, MutationJournal, is_entry_applied
+from .dns_provider import BatchRecordResult, DnsProvider, DnsProviderError, DnsQuota, DnsRecord
 from .project_config import get_aliyun_credentials, get_package_num, load_runtime_env
+from .project_constants import (
+    BATCH_OPERATION_MIN_RECORDS,
+    BATCH_RESULT_DETAIL_PAGE_SIZE,
+    BATCH_RESULT_POLL_INTERVAL_SECONDS,
+    BATCH_RESULT_POLL_TIMEOUT_SECONDS,
+    RECORD_QUERY_MAX_WORKERS,
+    RECORD_QUERY_PAGE_SIZE,
+    RECORD_SNAPSHOT_TTL_SECONDS,
+)
 
 
 DomainRecord = dict[str, Any]
+BATCH_ADD_TYPE = "RR_ADD"
+BATCH_DELETE_TYPE = "RR_DEL"
 
 load_runtime_env()
 logger = logging.getLogger(__name__)
 _client = None
+_async_client = None
+_provider_override: DnsProvider | None = None
+_weighted_subdomains: set[tuple[str, str, str, str | None]] = set()
+_weighted_subdomains_lock = threading.Lock()
+_record_snapshots: dict[tuple[str, str | None, str | None, str | None], tuple[float, list[DomainRecord]]] = {}
+_record_snapshots_lock = threading.Lock()
+_mutation_journal: MutationJournal | None = None
+
+
+def get_async_client() -> AsyncAlidnsClient | None:
+    global _async_client
+
+    if _async_client is not None:
+        return _async_client
+
+    access_key_id, access_key_secret = get_aliyun_credentials()
+    if not access_key_id or not access_key_secret:
+        logger.error("未能从环境变量中获取 ALIYUN_ACCESS_KEY_ID 和 ALIYUN_ACCESS_KEY_SECRET。")
+        return None
+
+    _async_client = AsyncAlidnsClient(access_key_id, access_key_secret)
+    return _async_client
 
 
 def get_client():
@@ -25,15 +72,92 @@ def get_client():
     if _client is not None:
         return _client
 
-    access_key_id, access_key_secret = get_aliyun_credentials()
-    if not access_key_id or not access_key_secret:
-        logger.error("未能从环境变量中获取 ALIYUN_ACCESS_KEY_ID 和 ALIYUN_ACCESS_KEY_SECRET。")
+    async_client = get_async_client()
+    if async_client is None:
         return None
 
-    _client = AcsClient(access_key_id, access_key_secret, "cn-hangzhou", timeout=15)
+    _client = AlidnsSyncClient(async_client)
     return _client
 
 
+def close_client() -> None:
+    """关闭后台事件循环与 aiohttp 会话，进程退出前调用。"""
+    global _client, _async_client
+
+    if _client is not None:
+        _client.close()
+    _client = None
+    _async_client = None
+
+
+def set_provider(provider: DnsProvider | None) -> None:
+    """替换默认的阿里云实现（例如离线基准测试使用内存后端）；传 None 恢复默认。"""
+    global _provider_override
+
+    _provider_override = provider
+    invalidate_record_snapshots()
+    with _weighted_subdomains_lock:
+        _weighted_subdomains.clear()
+
+
+def set_mutation_journal(journal: MutationJournal | None) -> None:
+    """启用变更预写日志；为 None 时（默认）不记录。"""
+    global _mutation_journal
+
+    _mutation_journal = journal
+
+
+def _journal_begin(entries: list[JournalEntry]) -> list[int]:
+    if _mutation_journal is None or not entries:
+        return []
+    return _mutation_journal.begin(entries)
+
+
+def _journal_complete(entry_ids: list[int], status: str = "done") -> None:
+    if _mutation_journal is not None and entry_ids:
+        _mutation_journal.complete(entry_ids, status)
+
+
+def _is_definite_rejection(exc: Exception) -> bool:
+    """服务端明确拒绝（或调用前即被拦下）的错误；超时、连接中断、服务端内部错误等结果未知。"""
+    if isinstance(exc, AlidnsApiError):
+        return exc.status < 500
+    return isinstance(exc, DnsProviderError)
+
+
+def _journal_fail(entry_ids: list[int], exc: Exception) -> None:
+    """明确被拒绝的变更结清为 failed；结果未知的保留 pending，由下一轮对账按 zone 实际记录结清。"""
+    if _is_definite_rejection(exc):
+        _journal_complete(entry_ids, "failed")
+    elif entry_ids:
+        logger.warning("DNS 变更结果未知，保留变更日志待对账: entries=%s error=%s", entry_ids, exc)
+
+
+def _journal_entry(operation: str, domain_name: str, record: DnsRecord, **extra: str | None) -> JournalEntry:
+    entry: JournalEntry = {
+        "op": operation,
+        "domain": domain_name,
+        "rr": record.rr,
+        "type": record.record_type,
+        "line": record.line,
+        "value": record.value,
+    }
+    if record.record_id:
+        entry["record_id"] = record.record_id
+    entry.update({key: value for key, value in extra.items() if value is not None})
+    return entry
+
+
+def get_provider() -> DnsProvider | None:
+    if _provider_override is not None:
+        return _provider_override
+
+    client = get_client()
+    if client is None:
+        return None
+    return AliyunDnsProvider(client)
+
+
 def _build_describe_records_request(
     domain_name: str,
     page_number: int = 1,
@@ -53,6 +177,27 @@ def _build_describe_records_request(
     return request
 
 
+def _build_describe_subdomain_records_request(
+    domain_name: str,
+    subdomain: str,
+    page_number: int = 1,
+    page_size: int = 500,
+    record_type: str | None = None,
+    line: str | None = None,
+):
+    request = DescribeSubDomainRecordsRequest()
+    request.set_accept_format("json")
+    request.set_DomainName(domain_name)
+    request.set_SubDomain(domain_name if subdomain == "@" else f"{subdomain}.{domain_name}")
+    request.set_PageNumber(page_number)
+    request.set_PageSize(page_size)
+    if record_type is not None:
+        request.set_Type(record_type)
+    if line is not None:
+        request.set_Line(line)
+    return request
+
+
 def _build_add_record_request(domain_name: str, rr: str, record_type: str, value: str, line: str):
     request = AddDomainRecordRequest()
     request.set_accept_format("json")
@@ -64,27 +209,116 @@ def _build_add_record_request(domain_name: str, rr: str, record_type: str, value
     return request
 
 
+def _build_update_record_request(record_id: str, rr: str, record_type: str, value: str, line: str):
+    request = UpdateDomainRecordRequest()
+    request.set_accept_format("json")
+    request.set_RecordId(record_id)
+    request.set_RR(rr)
+    request.set_Type(record_type)
+    request.set_Value(value)
+    request.set_Line(line)
+    return request
+
+
 def _build_delete_record_request(record_id: str):
     request = DeleteDomainRecordRequest()
     request.set_RecordId(record_id)
     return request
 
 
+def _build_set_slb_status_request(domain_name: str, rr: str, enabled: bool, record_type: str, line: str | None):
+    request = SetDNSSLBStatusRequest()
+    request.set_accept_format("json")
+    request.set_DomainName(domain_name)
+    request.set_SubDomain(domain_name if rr == "@" else f"{rr}.{domain_name}")
+    request.set_Open(enabled)
+    request.set_Type(record_type)
+    if line is not None:
+        request.set_Line(line)
+    return request
+
+
+def _build_update_slb_weight_request(record_id: str, weight: int):
+    request = UpdateDNSSLBWeightRequest()
+    request.set_accept_format("json")
+    request.set_RecordId(record_id)
+    request.set_Weight(weight)
+    return request
+
+
+def _build_operate_batch_request(operation_type: str, record_infos: list[dict[str, str]]):
+    request = OperateBatchDomainRequest()
+    request.set_accept_format("json")
+    request.set_Type(operation_type)
+    request.set_DomainRecordInfos(record_infos)
+    return request
+
+
+def _build_batch_result_count_request(task_id: str, batch_type: str):
+    request = DescribeBatchResultCountRequest()
+    request.set_accept_format("json")
+    request.set_TaskId(task_id)
+    request.set_BatchType(batch_type)
+    return request
+
+
+def _build_batch_result_detail_request(task_id: str, batch_type: str, page_number: int, page_size: int):
+    request = DescribeBatchResultDetailRequest()
+    request.set_accept_format("json")
+    request.set_TaskId(task_id)
+    request.set_BatchType(batch_type)
+    request.set_PageNumber(page_number)
+    request.set_PageSize(page_size)
+    return request
+
+
 def _execute_json_request(client, request) -> dict[str, Any]:
     response = client.do_action_with_exception(request)
     return json.loads(response)
 
 
+def invalidate_record_snapshots() -> None:
+    """任何写操作后清空记录快照，保证后续查询读到最新状态。"""
+    with _record_snapshots_lock:
+        _record_snapshots.clear()
+
+
+def _get_cached_record_snapshot(snapshot_key) -> list[DomainRecord] | None:
+    with _record_snapshots_lock:
+        cached = _record_snapshots.get(snapshot_key)
+        if cached is None:
+            return None
+        cached_at, records = cached
+        if time.monotonic() - cached_at > RECORD_SNAPSHOT_TTL_SECONDS:
+            _record_snapshots.pop(snapshot_key, None)
+            return None
+        return list(records)
+
+
+def _store_record_snapshot(snapshot_key, records: list[DomainRecord]) -> None:
+    with _record_snapshots_lock:
+        _record_snapshots[snapshot_key] = (time.monotonic(), list(records))
+
+
 def _filter_exact_rr_records(records: list[DomainRecord], subdomain: str | None) -> list[DomainRecord]:
     if subdomain is None:
         return records
     return [record for record in records if record.get("RR") == subdomain]
 
 
+def _record_refreshed_at(record: DomainRecord) -> float:
+    timestamps = [
+        record_timestamp
+        for record_timestamp in (record.get("CreateTimestamp"), record.get("UpdateTimestamp"))
+        if isinstance(record_timestamp, (int, float))
+    ]
+    return max(timestamps) if timestamps else float("inf")
+
+
 def _find_oldest_record(records: list[DomainRecord]) -> DomainRecord | None:
     if not records:
         return None
-    return min(records, key=lambda record: record.get("CreateTimestamp", float("inf")))
+    return min(records, key=_record_refreshed_at)
 
 
 def _find_matching_record(
@@ -120,16 +354,338 @@ def _index_records_by_line(existing_records: list[DomainRecord]) -> tuple[set[tu
     return existing_record_set, records_by_line, record_counts
 
 
-def _delete_record_by_id(client, record_id: str) -> None:
-    client.do_action_with_exception(_build_delete_record_request(record_id))
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _run_journaled(entries: list[JournalEntry], action):
+    entry_ids = _journal_begin(entries)
+    try:
+        result = action()
+    except Exception as exc:
+        _journal_fail(entry_ids, exc)
+        raise
+    _journal_complete(entry_ids)
+    return result
+
+
+def _delete_record(provider: DnsProvider, domain_name: str, record: DomainRecord) -> None:
+    invalidate_record_snapshots()
+    dns_record = DnsRecord.from_mapping(record)
+    _run_journaled(
+        [_journal_entry("delete", domain_name, dns_record)],
+        lambda: provider.delete_record(domain_name, dns_record),
+    )
+
+
+def _update_record(provider: DnsProvider, domain_name: str, record: DomainRecord, value: str) -> None:
+    invalidate_record_snapshots()
+    dns_record = DnsRecord.from_mapping(record)
+    _run_journaled(
+        [_journal_entry("update", domain_name, dns_record.with_value(value), old_value=dns_record.value)],
+        lambda: provider.update_record(domain_name, dns_record, value),
+    )
+
 
+def _apply_record_value_update(record: DomainRecord, value: str) -> None:
+    record["Value"] = value
+    record["UpdateTimestamp"] = _now_ms()
+
+
+def _add_record(provider: DnsProvider, domain_name: str, rr: str, record_type: str, value: str, line: str) -> DomainRecord:
+    invalidate_record_snapshots()
+    new_record = DnsRecord(rr=rr, record_type=record_type, value=value, line=line)
+    return _run_journaled(
+        [_journal_entry("add", domain_name, new_record)],
+        lambda: provider.add_record(domain_name, new_record),
+    ).to_mapping()
+
+
+def _complete_batch_journal(entry_ids: list[int], records: list[DnsRecord], results: list[BatchRecordResult]) -> None:
+    """按批量结果结清日志条目；结果未知（None）时保留 pending，留给下一次对账。"""
+    succeeded_keys = {_batch_record_key(result.record) for result in results if result.ok}
+    done_ids = [entry_id for entry_id, record in zip(entry_ids, records) if _batch_record_key(record) in succeeded_keys]
+    _journal_complete(done_ids)
+    _journal_complete([entry_id for entry_id in entry_ids if entry_id not in done_ids], "failed")
+
+
+def _build_batch_record_info(domain_name: str, record: DnsRecord) -> dict[str, str]:
+    return {"Domain": domain_name, "Rr": record.rr, "Type": record.record_type, "Value": record.value, "Line": record.line}
+
+
+def _batch_result_key(item: dict[str, Any]) -> tuple[str, str, str]:
+    return (
+        str(item.get("Rr", item.get("RR", ""))),
+        str(item.get("Value", "")),
+        str(item.get("Line", "")).lower(),
+    )
 
-def _add_record_by_request(client, domain_name: str, rr: str, record_type: str, value: str, line: str) -> None:
-    client.do_action_with_exception(_build_add_record_request(domain_name, rr, record_type, value, line))
+
+def _batch_record_key(record: DnsRecord) -> tuple[str, str, str]:
+    return (record.rr, record.value, record.line.lower())
+
+
+class AliyunDnsProvider(DnsProvider):
+    """基于 Alidns RPC 接口的服务商实现。"""
+
+    name = "aliyun"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _fetch_records_page(self, domain_name, page_number, rr, record_type, line) -> tuple[list[DomainRecord], int]:
+        request = _build_records_page_request(domain_name, page_number, rr, record_type, line)
+        response_json = _execute_json_request(self.client, request)
+        records_on_page = response_json.get("DomainRecords", {}).get("Record", [])
+        total_count = int(response_json.get("TotalCount", len(records_on_page)) or 0)
+        return records_on_page, total_count
+
+    def query_records(self, domain_name, rr=None, record_type=None, line=None) -> list[DnsRecord]:
+        first_page, total_count = self._fetch_records_page(domain_name, 1, rr, record_type, line)
+        raw_records = list(first_page)
+        page_count = max((total_count + RECORD_QUERY_PAGE_SIZE - 1) // RECORD_QUERY_PAGE_SIZE, 1)
+        if page_count > 1:
+            with ThreadPoolExecutor(max_workers=min(RECORD_QUERY_MAX_WORKERS, page_count - 1)) as executor:
+                futures = [
+                    executor.submit(self._fetch_records_page, domain_name, page_number, rr, record_type, line)
+                    for page_number in range(2, page_count + 1)
+                ]
+                for page_number, future in enumerate(futures, start=2):
+                    try:
+                        records_on_page, _ = future.result()
+                    except Exception as exc:
+                        raise DnsProviderError(f"查询第 {page_number} 页失败: {exc}") from exc
+                    raw_records.extend(records_on_page)
+        return [DnsRecord.from_mapping(record) for record in raw_records]
+
+    def add_record(self, domain_name: str, record: DnsRecord) -> DnsRecord:
+        request = _build_add_record_request(domain_name, record.rr, record.record_type, record.value, record.line)
+        response_json = _execute_json_request(self.client, request)
+        record_id = response_json.get("RecordId")
+        return DnsRecord(
+            rr=record.rr,
+            record_type=record.record_type,
+            value=record.value,
+            line=record.line,
+            record_id=str(record_id) if record_id is not None else None,
+            create_timestamp=_now_ms(),
+        )
+
+    def update_record(self, domain_name: str, record: DnsRecord, value: str) -> DnsRecord:
+        if not record.record_id:
+            raise DnsProviderError("记录缺少 RecordId")
+        request = _build_update_record_request(record.record_id, record.rr, record.record_type, value, record.line)
+        response_json = _execute_json_request(self.client, request)
+        if str(response_json.get("RecordId", record.record_id)) != record.record_id:
+            raise DnsProviderError("返回的 RecordId 与本地快照不一致")
+        return record.with_value(value, update_timestamp=_now_ms())
+
+    def delete_record(self, domain_name: str, record: DnsRecord) -> None:
+        if not record.record_id:
+            raise DnsProviderError("记录缺少 RecordId")
+        self.client.do_action_with_exception(_build_delete_record_request(record.record_id))
+
+    def _wait_for_batch_task(self, task_id: str, batch_type: str) -> bool:
+        deadline = time.monotonic() + BATCH_RESULT_POLL_TIMEOUT_SECONDS
+        while True:
+            response_json = _execute_json_request(self.client, _build_batch_result_count_request(task_id, batch_type))
+            status = response_json.get("Status")
+            if status == 1:
+                logger.info(
+                    "批量任务已完成: task_id=%s type=%s success=%s failed=%s",
+                    task_id,
+                    batch_type,
+                    response_json.get("SuccessCount"),
+                    response_json.get("FailedCount"),
+                )
+                return True
+            if status == -1:
+                logger.warning("批量任务执行失败: task_id=%s type=%s", task_id, batch_type)
+                return False
+            if time.monotonic() >= deadline:
+                logger.warning("等待批量任务超时: task_id=%s type=%s", task_id, batch_type)
+                return False
+            time.sleep(BATCH_RESULT_POLL_INTERVAL_SECONDS)
+
+    def _fetch_batch_result_details(self, task_id: str, batch_type: str) -> list[dict[str, Any]]:
+        details: list[dict[str, Any]] = []
+        page_number = 1
+        while True:
+            request = _build_batch_result_detail_request(task_id, batch_type, page_number, BATCH_RESULT_DETAIL_PAGE_SIZE)
+            response_json = _execute_json_request(self.client, request)
+            page_details = response_json.get("BatchResultDetails", {}).get("BatchResultDetail", [])
+            details.extend(page_details)
+            if len(page_details) < BATCH_RESULT_DETAIL_PAGE_SIZE:
+                return details
+            page_number += 1
+
+    def _run_batch_operation(self, domain_name: str, operation_type: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        """提交 OperateBatchDomain 批量任务并等待完成，返回逐条结果；任务未完成时返回 None。"""
+        record_infos = [_build_batch_record_info(domain_name, record) for record in records]
+        response_json = _execute_json_request(self.client, _build_operate_batch_request(operation_type, record_infos))
+        task_id = str(response_json.get("TaskId", ""))
+        if not task_id:
+            raise DnsProviderError("批量任务未返回 TaskId")
+
+        logger.info("已提交批量任务: task_id=%s type=%s count=%s", task_id, operation_type, len(record_infos))
+        if not self._wait_for_batch_task(task_id, operation_type):
+            return None
+
+        details_by_key = {_batch_result_key(item): item for item in self._fetch_batch_result_details(task_id, operation_type)}
+        results = []
+        for record in records:
+            detail = details_by_key.get(_batch_record_key(record))
+            if detail is None:
+                results.append(BatchRecordResult(record=record, ok=False, reason="未返回结果"))
+                continue
+            record_id = detail.get("RecordId") or record.record_id
+            result_record = DnsRecord(
+                rr=record.rr,
+                record_type=record.record_type,
+                value=record.value,
+                line=record.line,
+                record_id=str(record_id) if record_id is not None else None,
+                create_timestamp=record.create_timestamp or _now_ms(),
+            )
+            results.append(BatchRecordResult(record=result_record, ok=detail.get("Status") is True, reason=detail.get("Reason")))
+        return results
+
+    def batch_add(self, domain_name: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        return self._run_batch_operation(domain_name, BATCH_ADD_TYPE, records)
+
+    def batch_delete(self, domain_name: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        return self._run_batch_operation(domain_name, BATCH_DELETE_TYPE, records)
+
+    def set_weighted_round_robin(self, domain_name, rr, enabled, record_type="A", line=None) -> None:
+        request = _build_set_slb_status_request(domain_name, rr, enabled, record_type, line)
+        self.client.do_action_with_exception(request)
+
+    def update_record_weight(self, domain_name: str, record: DnsRecord, weight: int) -> DnsRecord:
+        if not record.record_id:
+            raise DnsProviderError("记录缺少 RecordId")
+        self.client.do_action_with_exception(_build_update_slb_weight_request(record.record_id, weight))
+        return replace(record, weight=weight)
+
+    def get_quota(self) -> DnsQuota:
+        return DnsQuota(max_records_per_line=get_package_num())
+
+
+def _apply_record_deletions(
+    provider: DnsProvider,
+    domain_name: str,
+    rr: str,
+    pending_deletions: list[DomainRecord],
+    snapshot: list[DomainRecord],
+    label: str,
+) -> list[DomainRecord]:
+    """删除一组记录，数量较多时走批量接口，并把结果折回本地快照。"""
+    deleted_records: list[DomainRecord] = []
+    if not pending_deletions:
+        return deleted_records
+
+    if len(pending_deletions) >= BATCH_OPERATION_MIN_RECORDS:
+        invalidate_record_snapshots()
+        batch_records = [DnsRecord.from_mapping(record) for record in pending_deletions]
+        entry_ids = _journal_begin([_journal_entry("delete", domain_name, record) for record in batch_records])
+        try:
+            results = provider.batch_delete(domain_name, batch_records)
+        except Exception as exc:
+            _journal_fail(entry_ids, exc)
+            logger.warning("批量删除%s记录失败，改为逐条删除: rr=%s count=%s error=%s", label, rr, len(pending_deletions), exc)
+        else:
+            if results is None:
+                logger.warning("批量删除%s记录结果未知，等待下一轮查询校准: rr=%s count=%s", label, rr, len(pending_deletions))
+                return deleted_records
+
+            _complete_batch_journal(entry_ids, batch_records, results)
+
+            succeeded_keys = {_batch_record_key(result.record) for result in results if result.ok}
+            for record in pending_deletions:
+                if _batch_record_key(DnsRecord.from_mapping(record)) not in succeeded_keys:
+                    logger.warning("批量删除%s记录未成功: rr=%s line=%s value=%s", label, rr, record.get("Line"), record.get("Value"))
+                    continue
+                if record in snapshot:
+                    snapshot.remove(record)
+                deleted_records.append(record)
+            logger.info("批量删除%s记录完成: rr=%s success=%s total=%s", label, rr, len(deleted_records), len(pending_deletions))
+            return deleted_records
+
+    for record in pending_deletions:
+        record_value = str(record.get("Value", ""))
+        try:
+            _delete_record(provider, domain_name, record)
+            if record in snapshot:
+                snapshot.remove(record)
+            deleted_records.append(record)
+            logger.info("删除%s记录: rr=%s line=%s value=%s", label, rr, record.get("Line"), record_value)
+        except Exception as exc:
+            logger.warning("删除%s记录失败: rr=%s line=%s value=%s error=%s", label, rr, record.get("Line"), record_value, exc)
+
+    return deleted_records
+
+
+def _apply_record_additions(
+    provider: DnsProvider,
+    domain_name: str,
+    rr: str,
+    record_type: str,
+    pending_additions: list[tuple[str, str]],
+    snapshot: list[DomainRecord],
+    label: str,
+) -> list[DomainRecord]:
+    """新增一组 (line, value) 记录，数量较多时走批量接口，并把结果折回本地快照。"""
+    added_records: list[DomainRecord] = []
+    if not pending_additions:
+        return added_records
+
+    if len(pending_additions) >= BATCH_OPERATION_MIN_RECORDS:
+        invalidate_record_snapshots()
+        new_records = [DnsRecord(rr=rr, record_type=record_type, value=value, line=line) for line, value in pending_additions]
+        entry_ids = _journal_begin([_journal_entry("add", domain_name, record) for record in new_records])
+        try:
+            results = provider.batch_add(domain_name, new_records)
+        except Exception as exc:
+            _journal_fail(entry_ids, exc)
+            logger.warning("批量新增%s记录失败，改为逐条新增: rr=%s count=%s error=%s", label, rr, len(pending_additions), exc)
+        else:
+            if results is None:
+                logger.warning("批量新增%s记录结果未知，等待下一轮查询校准: rr=%s count=%s", label, rr, len(pending_additions))
+                return added_records
+
+            _complete_batch_journal(entry_ids, new_records, results)
+
+            for result in results:
+                if not result.ok:
+                    logger.warning(
+                        "批量新增%s记录未成功: rr=%s line=%s value=%s reason=%s",
+                        label,
+                        rr,
+                        result.record.line,
+                        result.record.value,
+                        result.reason,
+                    )
+                    continue
+                record = result.record.to_mapping()
+                snapshot.append(record)
+                added_records.append(record)
+            logger.info("批量新增%s记录完成: rr=%s success=%s total=%s", label, rr, len(added_records), len(pending_additions))
+            return added_records
+
+    for line, value in pending_additions:
+        try:
+            record = _add_record(provider, domain_name, rr, record_type, value, line)
+            snapshot.append(record)
+            added_records.append(record)
+            logger.info("新增%s记录: rr=%s line=%s value=%s", label, rr, line, value)
+        except Exception as exc:
+            logger.warning("新增%s记录失败: rr=%s line=%s value=%s error=%s", label, rr, line, value, exc)
+
+    return added_records
 
 
 def _ensure_line_capacity(
-    client,
+    provider: DnsProvider,
+    domain_name: str,
     line_key: str,
     carrier_line: str,
     package_num: int,
@@ -146,84 +702,141 @@ def _ensure_line_capacity(
         logger.warning("线路达到上限但未找到可删除记录: line=%s", carrier_line)
         return False
 
-    _delete_record_by_id(client, oldest_record["RecordId"])
+    _delete_record(provider, domain_name, oldest_record)
     line_records.remove(oldest_record)
     record_counts[line_key] = current_count - 1
     logger.info("为新增记录腾出空间，删除最旧记录: line=%s value=%s", carrier_line, oldest_record.get("Value"))
     return True
 
 
-def query_all_domain_records(domain_name, subdomain=None):
-    """查询并返回指定域名的记录。"""
-    client = get_client()
-    if not client:
-        logger.error("AcsClient 未初始化，无法查询记录。")
-        return []
+def _build_records_page_request(domain_name, page_number, subdomain, record_type, line):
+    if subdomain is not None:
+        return _build_describe_subdomain_records_request(
+            domain_name=domain_name,
+            subdomain=subdomain,
+            page_number=page_number,
+            page_size=RECORD_QUERY_PAGE_SIZE,
+            record_type=record_type,
+            line=line,
+        )
+    return _build_describe_records_request(
+        domain_name=domain_name,
+        page_number=page_number,
+        page_size=RECORD_QUERY_PAGE_SIZE,
+        record_type=record_type,
+    )
 
-    all_records = []
-    page_number = 1
-    page_size = 500
 
-    while True:
-        try:
-            request = _build_describe_records_request(
-                domain_name=domain_name,
-                page_number=page_number,
-                page_size=page_size,
-                subdomain=subdomain,
-            )
-            response_json = _execute_json_request(client, request)
-            records_on_page = response_json.get("DomainRecords", {}).get("Record", [])
-            all_records.extend(_filter_exact_rr_records(records_on_page, subdomain))
+def query_all_domain_records(domain_name, subdomain=None, record_type=None, line=None):
+    """查询并返回指定域名的记录；首页拿到 TotalCount 后并发拉取剩余分页，结果短时缓存为快照。"""
+    records = try_query_all_domain_records(domain_name, subdomain=subdomain, record_type=record_type, line=line)
+    return records if records is not None else []
 
-            if len(records_on_page) < page_size:
-                break
 
-            page_number += 1
-        except Exception as exc:
-            logger.error("查询域名记录失败: domain=%s rr=%s error=%s", domain_name, subdomain, exc)
-            break
+def try_query_all_domain_records(domain_name, subdomain=None, record_type=None, line=None):
+    """同 query_all_domain_records，但查询失败时返回 None，供需要区分“没有记录”与“查询失败”的调用方使用。"""
+    provider = get_provider()
+    if not provider:
+        logger.error("DNS 服务商未初始化，无法查询记录。")
+        return None
+
+    snapshot_key = (domain_name, subdomain, record_type, line)
+    cached_records = _get_cached_record_snapshot(snapshot_key)
+    if cached_records is not None:
+        return cached_records
 
+    try:
+        records = provider.query_records(domain_name, rr=subdomain, record_type=record_type, line=line)
+    except Exception as exc:
+        logger.error("查询域名记录失败: domain=%s rr=%s error=%s", domain_name, subdomain, exc)
+        return None
+
+    all_records = _filter_exact_rr_records([record.to_mapping() for record in records], subdomain)
+    _store_record_snapshot(snapshot_key, all_records)
     return all_records
 
 
-def record_exists(domain_name, rr, record_type, value, line):
-    """检查指定 DNS 记录是否已存在。"""
-    client = get_client()
-    if not client:
-        return False
+def load_zone_capacity(domain_name: str) -> ZoneCapacity | None:
+    """查询整个 zone 的记录，按线路统计已用槽位，供本轮所有 RR 共享配额规划。"""
+    provider = get_provider()
+    if not provider:
+        logger.error("DNS 服务商未初始化，无法规划线路配额。")
+        return None
 
     try:
-        request = _build_describe_records_request(domain_name=domain_name, subdomain=rr, record_type=record_type)
-        response_json = _execute_json_request(client, request)
-        records = _filter_exact_rr_records(response_json.get("DomainRecords", {}).get("Record", []), rr)
-        return _find_matching_record(records, rr=rr, value=value, line=line, record_type=record_type) is not None
+        package_num = provider.get_quota().max_records_per_line
     except Exception as exc:
-        logger.error(
-            "检查记录是否存在失败: domain=%s rr=%s value=%s line=%s error=%s",
+        logger.warning("获取线路配额失败，本轮不做配额规划: domain=%s error=%s", domain_name, exc)
+        return None
+    zone_records = try_query_all_domain_records(domain_name)
+    if zone_records is None:
+        logger.warning("查询 zone 记录失败，本轮不做配额规划: domain=%s", domain_name)
+        return None
+    return ZoneCapacity.from_records(domain_name, package_num, zone_records)
+
+
+def reconcile_pending_mutations() -> list[JournalEntry]:
+    """只查询日志里涉及的 (domain, rr)，核对未完成的变更是否已生效并结清；返回已生效的条目。"""
+    if _mutation_journal is None:
+        return []
+
+    pending_entries = _mutation_journal.pending_entries()
+    if not pending_entries:
+        return []
+
+    entries_by_subdomain: dict[tuple[str, str], list[JournalEntry]] = {}
+    for entry in pending_entries:
+        entries_by_subdomain.setdefault((str(entry.get("domain", "")), str(entry.get("rr", ""))), []).append(entry)
+
+    applied_entries: list[JournalEntry] = []
+    invalidate_record_snapshots()
+    for (domain_name, rr), entries in entries_by_subdomain.items():
+        provider = get_provider()
+        if provider is None:
+            logger.error("DNS 服务商未初始化，暂缓变更日志对账。")
+            return applied_entries
+        try:
+            records = [record.to_mapping() for record in provider.query_records(domain_name, rr=rr)]
+        except Exception as exc:
+            logger.warning("变更日志对账查询失败，保留待下次处理: domain=%s rr=%s error=%s", domain_name, rr, exc)
+            continue
+
+        records = _filter_exact_rr_records(records, rr)
+        applied_ids = [entry["id"] for entry in entries if is_entry_applied(entry, records)]
+        abandoned_ids = [entry["id"] for entry in entries if entry["id"] not in applied_ids]
+        applied_entries.extend(entry for entry in entries if entry["id"] in applied_ids)
+        _mutation_journal.complete(applied_ids, "done")
+        _mutation_journal.complete(abandoned_ids, "abandoned")
+        logger.info(
+            "变更日志对账完成: domain=%s rr=%s applied=%s abandoned=%s",
             domain_name,
             rr,
-            value,
-            line,
-            exc,
+            len(applied_ids),
+            len(abandoned_ids),
         )
-    return False
+
+    return applied_entries
+
+
+def record_exists(domain_name, rr, record_type, value, line):
+    """检查指定 DNS 记录是否已存在。"""
+    records = query_all_domain_records(domain_name, subdomain=rr, record_type=record_type)
+    return _find_matching_record(records, rr=rr, value=value, line=line, record_type=record_type) is not None
 
 
 def delete_oldest_record(domain_name, rr, line):
     """查找并删除特定主机记录和线路的最早一条记录。"""
-    client = get_client()
-    if not client:
+    provider = get_provider()
+    if not provider:
         return
 
     try:
-        records = query_all_domain_records(domain_name)
-        filtered_records = [record for record in records if record.get("RR") == rr and record.get("Line") == line]
+        filtered_records = query_all_domain_records(domain_name, subdomain=rr, line=line)
         oldest_record = _find_oldest_record(filtered_records)
         if oldest_record is None:
             return
 
-        _delete_record_by_id(client, oldest_record["RecordId"])
+        _delete_record(provider, domain_name, oldest_record)
         logger.info("已删除最旧记录: rr=%s value=%s line=%s", rr, oldest_record.get("Value"), line)
     except Exception as exc:
         logger.error("删除最旧记录失败: domain=%s rr=%s line=%s error=%s", domain_name, rr, line, exc)
@@ -231,24 +844,23 @@ def delete_oldest_record(domain_name, rr, line):
 
 def add_record(domain_name, rr, record_type, value, line):
     """添加一条新的 DNS 记录，如果达到数量上限则删除最旧的记录。"""
-    client = get_client()
-    if not client:
-        logger.error("AcsClient 未初始化，无法添加记录。")
+    provider = get_provider()
+    if not provider:
+        logger.error("DNS 服务商未初始化，无法添加记录。")
         return
 
-    package_num = get_package_num()
+    package_num = provider.get_quota().max_records_per_line
 
     try:
         if record_exists(domain_name, rr, record_type, value, line):
             return
 
-        records = query_all_domain_records(domain_name=domain_name)
-        count = sum(1 for record in records if record.get("RR") == rr and record.get("Line") == line)
+        count = len(query_all_domain_records(domain_name, subdomain=rr, line=line))
         if count >= package_num:
             logger.warning("%s (%s) 的记录数量已达上限 (%s)，将删除最旧记录。", rr, line, package_num)
             delete_oldest_record(domain_name, rr, line)
 
-        client.do_action_with_exception(_build_add_record_request(domain_name, rr, record_type, value, line))
+        _add_record(provider, domain_name, rr, record_type, value, line)
         logger.info("成功添加记录: %s.%s | %s -> %s (%s)", rr, domain_name, record_type, value, line)
     except Exception as exc:
         logger.warning(
@@ -268,61 +880,126 @@ def add_a_record(domain_name, rr, ip_addresses, line):
         add_record(domain_name, rr, "A", ip_address, line)
 
 
-def sync_aliyun_dns_records_exact(domain_rr: str, domain_root: str, ips_by_carrier: dict[str, list[str]]):
-    """将指定 RR 的线路记录同步为目标集合，适合 temp 这类内部测速域名。"""
-    client = get_client()
-    if not all([domain_root, domain_rr, client]):
-        logger.error("域名、主机记录或阿里云客户端未正确配置，中止精确同步。")
-        return
+def update_record_value(domain_name: str, record: DomainRecord, value: str) -> bool:
+    """原地改写一条已有记录的值（阿里云为 UpdateDomainRecord），并同步本地快照。"""
+    provider = get_provider()
+    if not provider:
+        logger.error("DNS 服务商未初始化，无法改写记录。")
+        return False
 
-    assert client is not None
+    record_id = record.get("RecordId")
+    rr = str(record.get("RR", ""))
+    line = str(record.get("Line", ""))
+    old_value = str(record.get("Value", ""))
+    if not record_id or not rr or not line:
+        logger.warning("记录缺少 RecordId/RR/Line，无法原地改写: domain=%s value=%s", domain_name, old_value)
+        return False
+    if old_value == value:
+        return True
+
+    try:
+        _update_record(provider, domain_name, record, value)
+    except Exception as exc:
+        logger.warning(
+            "原地改写记录失败: domain=%s rr=%s line=%s old_value=%s new_value=%s error=%s",
+            domain_name,
+            rr,
+            line,
+            old_value,
+            value,
+            exc,
+        )
+        return False
+
+    _apply_record_value_update(record, value)
+    logger.info("成功原地改写记录: rr=%s line=%s old_value=%s new_value=%s record_id=%s", rr, line, old_value, value, record_id)
+    return True
+
+
+def sync_aliyun_dns_records_exact(
+    domain_rr: str,
+    domain_root: str,
+    ips_by_carrier: dict[str, list[str]],
+    record_type: str = "A",
+    capacity: ZoneCapacity | None = None,
+) -> list[DomainRecord]:
+    """将指定 RR 的线路记录同步为目标集合，适合 temp 这类内部测速域名；返回同步后的本地快照。
+
+    传入 capacity 时，新增计划先按 zone 剩余槽位裁剪，不再靠删除最旧记录腾位置。
+    """
+    provider = get_provider()
+    if not all([domain_root, domain_rr, provider]):
+        logger.error("域名、主机记录或 DNS 服务商未正确配置，中止精确同步。")
+        return []
+
+    assert provider is not None
 
     try:
         existing_records = query_all_domain_records(domain_root, subdomain=domain_rr)
     except Exception as exc:
         logger.error("获取现有 DNS 记录失败: rr=%s domain=%s error=%s", domain_rr, domain_root, exc)
-        return
+        return []
 
-    logger.info("开始执行精确同步: rr=%s domain=%s", domain_rr, domain_root)
+    logger.info("开始执行精确同步: rr=%s domain=%s type=%s", domain_rr, domain_root, record_type)
+    pending_deletions: list[DomainRecord] = []
+    pending_additions: list[tuple[str, str]] = []
     for carrier_line, ip_list in ips_by_carrier.items():
         line_key = carrier_line.lower()
         desired_values = set(ip_list)
         line_records = [
             record
             for record in existing_records
-            if record.get("Type") == "A" and str(record.get("Line", "")).lower() == line_key
+            if record.get("Type") == record_type and str(record.get("Line", "")).lower() == line_key
         ]
         current_values = {str(record.get("Value", "")) for record in line_records}
+        stale_records = [
+            record
+            for record in line_records
+            if str(record.get("Value", "")) and str(record.get("Value", "")) not in desired_values
+        ]
+        missing_values = sorted(desired_values - current_values)
 
-        for record in line_records:
+        # 只有值变化的记录直接原地改写，一次调用完成一组删除+新增；改写失败的记录回退为删除+新增。
+        while stale_records and missing_values:
+            record = stale_records.pop(0)
             record_value = str(record.get("Value", ""))
-            if record_value and record_value not in desired_values:
-                try:
-                    _delete_record_by_id(client, record["RecordId"])
-                    logger.info("删除 temp 旧记录: rr=%s line=%s value=%s", domain_rr, carrier_line, record_value)
-                except Exception as exc:
-                    logger.warning(
-                        "删除 temp 旧记录失败: rr=%s line=%s value=%s error=%s",
-                        domain_rr,
-                        carrier_line,
-                        record_value,
-                        exc,
-                    )
-
-        for ip_address in sorted(desired_values - current_values):
+            ip_address = missing_values.pop(0)
             try:
-                _add_record_by_request(client, domain_root, domain_rr, "A", ip_address, carrier_line)
-                logger.info("新增 temp 记录: rr=%s line=%s value=%s", domain_rr, carrier_line, ip_address)
+                _update_record(provider, domain_root, record, ip_address)
+                _apply_record_value_update(record, ip_address)
+                logger.info(
+                    "改写 temp 记录: rr=%s line=%s old_value=%s new_value=%s",
+                    domain_rr,
+                    carrier_line,
+                    record_value,
+                    ip_address,
+                )
             except Exception as exc:
                 logger.warning(
-                    "新增 temp 记录失败: rr=%s line=%s value=%s error=%s",
+                    "改写 temp 记录失败: rr=%s line=%s old_value=%s new_value=%s error=%s",
                     domain_rr,
                     carrier_line,
+                    record_value,
                     ip_address,
                     exc,
                 )
-
+                pending_deletions.append(record)
+                pending_additions.append((carrier_line, ip_address))
+
+        pending_deletions.extend(stale_records)
+        pending_additions.extend((carrier_line, ip_address) for ip_address in missing_values)
+
+    deleted_records = _apply_record_deletions(provider, domain_root, domain_rr, pending_deletions, existing_records, "temp")
+    if capacity is not None:
+        for record in deleted_records:
+            capacity.record_removed(domain_rr, str(record.get("Line", "")))
+        pending_additions, _ = capacity.plan_additions(domain_rr, pending_additions)
+    added_records = _apply_record_additions(provider, domain_root, domain_rr, record_type, pending_additions, existing_records, "temp")
+    if capacity is not None:
+        for record in added_records:
+            capacity.record_added(domain_rr, str(record.get("Line", "")))
     logger.info("精确同步执行完毕: rr=%s domain=%s", domain_rr, domain_root)
+    return existing_records
 
 
 def ensure_production_dns_records(
@@ -332,32 +1009,38 @@ def ensure_production_dns_records(
     floor_count: int,
     target_count: int,
     ceiling_count: int,
+    record_type: str = "A",
+    capacity: ZoneCapacity | None = None,
 ):
-    """保守维护生产域名记录池，只补足到目标数量，不主动做大规模替换。"""
-    client = get_client()
-    if not all([domain_root, domain_rr, client]):
-        logger.error("域名、主机记录或阿里云客户端未正确配置，中止生产池维护。")
+    """保守维护生产域名记录池，只补足到目标数量，不主动做大规模替换；各线路的新增合并提交。"""
+    provider = get_provider()
+    if not all([domain_root, domain_rr, provider]):
+        logger.error("域名、主机记录或 DNS 服务商未正确配置，中止生产池维护。")
         return
 
-    assert client is not None
+    assert provider is not None
 
     try:
         existing_records = query_all_domain_records(domain_root, subdomain=domain_rr)
-        existing_record_set, records_by_line, record_counts = _index_records_by_line(existing_records)
+        existing_record_set, _, record_counts = _index_records_by_line(
+            [record for record in existing_records if record.get("Type") == record_type]
+        )
     except Exception as exc:
         logger.error("获取现有 DNS 记录失败: rr=%s domain=%s error=%s", domain_rr, domain_root, exc)
         return
 
     effective_target = min(target_count, ceiling_count)
     logger.info(
-        "开始维护生产记录池: rr=%s domain=%s floor=%s target=%s ceiling=%s",
+        "开始维护生产记录池: rr=%s domain=%s type=%s floor=%s target=%s ceiling=%s",
         domain_rr,
         domain_root,
+        record_type,
         floor_count,
         effective_target,
         ceiling_count,
     )
 
+    pending_additions: list[tuple[str, str]] = []
     for carrier_line, ip_list in ips_by_carrier.items():
         line_key = carrier_line.lower()
         current_count = record_counts.get(line_key, 0)
@@ -368,26 +1051,22 @@ def ensure_production_dns_records(
             continue
 
         logger.info("开始维护生产线路: line=%s current=%s candidates=%s", carrier_line, current_count, len(desired_candidates))
-        for ip_address in desired_candidates:
-            if current_count >= effective_target or current_count >= ceiling_count:
-                break
-
-            try:
-                _add_record_by_request(client, domain_root, domain_rr, "A", ip_address, carrier_line)
-                logger.info("新增生产记录: rr=%s line=%s value=%s", domain_rr, carrier_line, ip_address)
-                existing_record_set.add((ip_address, line_key))
-                records_by_line.setdefault(line_key, []).append({"Value": ip_address, "Line": carrier_line, "RR": domain_rr, "Type": "A"})
-                current_count += 1
-                record_counts[line_key] = current_count
-            except Exception as exc:
-                logger.warning(
-                    "新增生产记录失败: rr=%s line=%s value=%s error=%s",
-                    domain_rr,
-                    carrier_line,
-                    ip_address,
-                    exc,
-                )
+        planned_count = max(effective_target - current_count, 0)
+        for ip_address in desired_candidates[:planned_count]:
+            pending_additions.append((carrier_line, ip_address))
+            existing_record_set.add((ip_address, line_key))
+
+    if capacity is not None:
+        pending_additions, _ = capacity.plan_additions(domain_rr, pending_additions)
+    added_records = _apply_record_additions(provider, domain_root, domain_rr, record_type, pending_additions, existing_records, "生产")
+    for record in added_records:
+        line_key = str(record.get("Line", "")).lower()
+        record_counts[line_key] = record_counts.get(line_key, 0) + 1
+        if capacity is not None:
+            capacity.record_added(domain_rr, line_key)
 
+    for carrier_line in ips_by_carrier:
+        current_count = record_counts.get(carrier_line.lower(), 0)
         if current_count < floor_count:
             logger.warning("生产线路低于安全下限: line=%s current=%s floor=%s", carrier_line, current_count, floor_count)
 
@@ -401,14 +1080,16 @@ def prune_production_dns_records(
     floor_count: int,
     ceiling_count: int,
     max_prune_per_line: int,
+    record_type: str = "A",
+    capacity: ZoneCapacity | None = None,
 ) -> list[dict[str, str]]:
-    """当生产池超过 ceiling 时，温和删除本轮未入选且最旧的记录。"""
-    client = get_client()
-    if not all([domain_root, domain_rr, client]):
-        logger.error("域名、主机记录或阿里云客户端未正确配置，中止生产池收敛。")
+    """当生产池超过 ceiling 时，温和删除本轮未入选且最旧的记录；传入 capacity 时同步释放槽位。"""
+    provider = get_provider()
+    if not all([domain_root, domain_rr, provider]):
+        logger.error("域名、主机记录或 DNS 服务商未正确配置，中止生产池收敛。")
         return []
 
-    assert client is not None
+    assert provider is not None
 
     try:
         existing_records = query_all_domain_records(domain_root, subdomain=domain_rr)
@@ -416,13 +1097,13 @@ def prune_production_dns_records(
         logger.error("获取现有 DNS 记录失败: rr=%s domain=%s error=%s", domain_rr, domain_root, exc)
         return []
 
-    pruned_records: list[dict[str, str]] = []
+    pending_deletions: list[DomainRecord] = []
     for carrier_line, preferred_ips in preferred_ips_by_carrier.items():
         line_key = carrier_line.lower()
         line_records = [
             record
             for record in existing_records
-            if record.get("Type") == "A" and str(record.get("Line", "")).lower() == line_key
+            if record.get("Type") == record_type and str(record.get("Line", "")).lower() == line_key
         ]
         current_count = len(line_records)
         if current_count <= ceiling_count:
@@ -431,46 +1112,170 @@ def prune_production_dns_records(
         protected_values = set(preferred_ips)
         deletable_records = sorted(
             [record for record in line_records if str(record.get("Value", "")) not in protected_values],
-            key=lambda record: record.get("CreateTimestamp", float("inf")),
+            key=_record_refreshed_at,
         )
         deletions_needed = min(current_count - ceiling_count, max_prune_per_line, max(current_count - floor_count, 0))
 
         if deletions_needed <= 0:
             continue
 
-        for record in deletable_records[:deletions_needed]:
-            record_value = str(record.get("Value", ""))
-            if not record_value:
-                continue
+        pending_deletions.extend(record for record in deletable_records[:deletions_needed] if str(record.get("Value", "")))
+
+    deleted_records = _apply_record_deletions(provider, domain_root, domain_rr, pending_deletions, existing_records, "收敛生产")
+    if capacity is not None:
+        for record in deleted_records:
+            capacity.record_removed(domain_rr, str(record.get("Line", "")))
+    return [
+        {"ip": str(record.get("Value", "")), "line": str(record.get("Line", "")).lower()}
+        for record in deleted_records
+    ]
+
+
+def restore_production_snapshot(
+    domain_rr: str,
+    domain_root: str,
+    snapshot_records: set[tuple[str, str]],
+    record_type: str = "A",
+    capacity: ZoneCapacity | None = None,
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """按最小差异把快照涉及的线路恢复为已知良好的 (ip, line) 集合；多出的记录优先原地改写为缺失值，返回 (移除, 恢复)。"""
+    provider = get_provider()
+    if not all([domain_root, domain_rr, provider]):
+        logger.error("域名、主机记录或 DNS 服务商未正确配置，中止快照回滚。")
+        return [], []
+
+    assert provider is not None
+
+    existing_records = query_all_domain_records(domain_root, subdomain=domain_rr)
+    removed_records: list[tuple[str, str]] = []
+    restored_records: list[tuple[str, str]] = []
+    pending_deletions: list[DomainRecord] = []
+    pending_additions: list[tuple[str, str]] = []
+    for line_key in sorted({line for _, line in snapshot_records}):
+        desired_values = {ip_address for ip_address, line in snapshot_records if line == line_key}
+        line_records = [
+            record
+            for record in existing_records
+            if record.get("Type") == record_type and str(record.get("Line", "")).lower() == line_key
+        ]
+        current_values = {str(record.get("Value", "")) for record in line_records}
+        extra_records = sorted(
+            [record for record in line_records if str(record.get("Value", "")) not in desired_values],
+            key=_record_refreshed_at,
+            reverse=True,
+        )
+        missing_values = sorted(desired_values - current_values)
 
+        while extra_records and missing_values:
+            record = extra_records.pop(0)
+            old_value = str(record.get("Value", ""))
+            ip_address = missing_values.pop(0)
             try:
-                _delete_record_by_id(client, record["RecordId"])
-                pruned_records.append({"ip": record_value, "line": line_key})
-                logger.info("收敛删除生产记录: rr=%s line=%s value=%s", domain_rr, carrier_line, record_value)
+                _update_record(provider, domain_root, record, ip_address)
             except Exception as exc:
-                logger.warning(
-                    "收敛删除生产记录失败: rr=%s line=%s value=%s error=%s",
-                    domain_rr,
-                    carrier_line,
-                    record_value,
-                    exc,
-                )
+                logger.warning("回滚改写失败: rr=%s line=%s old_value=%s new_value=%s error=%s", domain_rr, line_key, old_value, ip_address, exc)
+                continue
+            _apply_record_value_update(record, ip_address)
+            removed_records.append((old_value, line_key))
+            restored_records.append((ip_address, line_key))
+
+        pending_deletions.extend(extra_records)
+        pending_additions.extend((line_key, ip_address) for ip_address in missing_values)
+
+    deleted_records = _apply_record_deletions(provider, domain_root, domain_rr, pending_deletions, existing_records, "回滚")
+    if capacity is not None:
+        for record in deleted_records:
+            capacity.record_removed(domain_rr, str(record.get("Line", "")))
+    added_records = _apply_record_additions(provider, domain_root, domain_rr, record_type, pending_additions, existing_records, "回滚")
+    if capacity is not None:
+        for record in added_records:
+            capacity.record_added(domain_rr, str(record.get("Line", "")))
+    removed_records.extend((str(record.get("Value", "")), str(record.get("Line", "")).lower()) for record in deleted_records)
+    restored_records.extend((str(record.get("Value", "")), str(record.get("Line", "")).lower()) for record in added_records)
+    return removed_records, restored_records
+
+
+def _ensure_weighted_round_robin(provider: DnsProvider, domain_root: str, domain_rr: str, record_type: str, line: str) -> bool:
+    """每个进程对同一 RR+记录类型+线路只开启一次权重轮询，避免每轮重复调用。"""
+    weighted_key = (domain_root, domain_rr, record_type, line)
+    with _weighted_subdomains_lock:
+        if weighted_key in _weighted_subdomains:
+            return True
 
-    return pruned_records
+    try:
+        provider.set_weighted_round_robin(domain_root, domain_rr, True, record_type=record_type, line=line)
+    except Exception as exc:
+        logger.warning("开启权重轮询失败: rr=%s type=%s line=%s error=%s", domain_rr, record_type, line, exc)
+        return False
+
+    with _weighted_subdomains_lock:
+        _weighted_subdomains.add(weighted_key)
+    logger.info("已开启权重轮询: rr=%s type=%s line=%s", domain_rr, record_type, line)
+    return True
+
+
+def apply_production_record_weights(
+    domain_rr: str,
+    domain_root: str,
+    weights_by_record: dict[tuple[str, str], int],
+    hysteresis: int,
+) -> int:
+    """为生产 RR 维护权重轮询，只推送与当前权重相差不小于 hysteresis 的记录；返回实际改写条数。"""
+    provider = get_provider()
+    if not all([domain_root, domain_rr, provider]):
+        logger.error("域名、主机记录或 DNS 服务商未正确配置，中止权重更新。")
+        return 0
+
+    assert provider is not None
+    existing_records = query_all_domain_records(domain_root, subdomain=domain_rr)
+    weighted_records = [
+        record
+        for record in existing_records
+        if (str(record.get("Value", "")), str(record.get("Line", "")).lower()) in weights_by_record
+    ]
+    weighted_groups = {
+        group
+        for group in sorted({(str(record.get("Type") or "A"), str(record.get("Line", "")).lower()) for record in weighted_records})
+        if _ensure_weighted_round_robin(provider, domain_root, domain_rr, group[0], group[1])
+    }
+
+    updated_count = 0
+    for record in weighted_records:
+        record_key = (str(record.get("Value", "")), str(record.get("Line", "")).lower())
+        weight = weights_by_record[record_key]
+        if (str(record.get("Type") or "A"), record_key[1]) not in weighted_groups:
+            continue
+
+        current_weight = DnsRecord.from_mapping(record).weight
+        if current_weight is not None and abs(weight - current_weight) < hysteresis:
+            continue
+
+        try:
+            invalidate_record_snapshots()
+            provider.update_record_weight(domain_root, DnsRecord.from_mapping(record), weight)
+        except Exception as exc:
+            logger.warning("更新记录权重失败: rr=%s line=%s value=%s weight=%s error=%s", domain_rr, record_key[1], record_key[0], weight, exc)
+            continue
+
+        record["Weight"] = weight
+        updated_count += 1
+        logger.info("更新记录权重: rr=%s line=%s value=%s weight=%s->%s", domain_rr, record_key[1], record_key[0], current_weight, weight)
+
+    return updated_count
 
 
 def update_aliyun_dns_records(domain_rr: str, domain_root: str, ips_by_carrier: dict[str, list[str]]):
     """先查询现有记录，再只对不存在的记录执行添加操作。"""
-    client = get_client()
-    package_num = get_package_num()
+    provider = get_provider()
 
     logger.info("开始执行阿里云 DNS 更新流程: rr=%s domain=%s", domain_rr, domain_root)
 
-    if not all([domain_root, domain_rr, client]):
-        logger.error("域名、主机记录或阿里云客户端未正确配置，中止 DNS 更新。")
+    if not all([domain_root, domain_rr, provider]):
+        logger.error("域名、主机记录或 DNS 服务商未正确配置，中止 DNS 更新。")
         return
 
-    assert client is not None
+    assert provider is not None
+    package_num = provider.get_quota().max_records_per_line
 
     try:
         existing_records = query_all_domain_records(domain_root, subdomain=domain_rr)
@@ -493,7 +1298,8 @@ def update_aliyun_dns_records(domain_rr: str, domain_root: str, ips_by_carrier:
 
             try:
                 if not _ensure_line_capacity(
-                    client=client,
+                    provider=provider,
+                    domain_name=domain_root,
                     line_key=line_key,
                     carrier_line=carrier_line,
                     package_num=package_num,
@@ -502,7 +1308,7 @@ def update_aliyun_dns_records(domain_rr: str, domain_root: str, ips_by_carrier:
                 ):
                     continue
 
-                client.do_action_with_exception(_build_add_record_request(domain_root, domain_rr, "A", ip_address, carrier_line))
+                _add_record(provider, domain_root, domain_rr, "A", ip_address, carrier_line)
                 logger.info("成功添加记录: rr=%s ip=%s line=%s", domain_rr, ip_address, carrier_line)
 
                 existing_record_set.add((ip_address, line_key))
@@ -520,21 +1326,30 @@ def update_aliyun_dns_records(domain_rr: str, domain_root: str, ips_by_carrier:
     logger.info("阿里云 DNS 更新流程执行完毕: rr=%s domain=%s", domain_rr, domain_root)
 
 
-def delete_record_by_value(domain_name: str, rr: str, value: str, line: str):
-    """根据记录值和线路删除一条指定的 A 记录。"""
-    client = get_client()
-    if not client:
-        logger.error("AcsClient 未初始化，无法删除记录。")
+def delete_record_by_value(
+    domain_name: str,
+    rr: str,
+    value: str,
+    line: str,
+    record_type: str = "A",
+    capacity: ZoneCapacity | None = None,
+):
+    """根据记录值和线路删除一条指定类型（默认 A）的记录；传入 capacity 时同步释放槽位。"""
+    provider = get_provider()
+    if not provider:
+        logger.error("DNS 服务商未初始化，无法删除记录。")
         return
 
     try:
         records = query_all_domain_records(domain_name, subdomain=rr)
-        record_to_delete = _find_matching_record(records, rr=rr, value=value, line=line, record_type="A")
+        record_to_delete = _find_matching_record(records, rr=rr, value=value, line=line, record_type=record_type)
         if record_to_delete is None:
             logger.warning("未找到要删除的记录: rr=%s value=%s line=%s", rr, value, line)
             return
 
-        _delete_record_by_id(client, record_to_delete["RecordId"])
+        _delete_record(provider, domain_name, record_to_delete)
+        if capacity is not None:
+            capacity.record_removed(rr, line)
         logger.info(
             "成功删除记录: rr=%s value=%s line=%s record_id=%s",
             rr,
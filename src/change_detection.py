@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from .project_constants import (
+    CHANGE_DETECTION_MAX_LEVEL,
+    CHANGE_DETECTION_MAX_SCORE,
+    CHANGE_DETECTION_REFERENCE_LEVEL,
+    CHANGE_DETECTION_THRESHOLD,
+    VALIDATION_MIN_SUCCESS_RATE,
+)
+from .runtime_state import (
+    RuntimeState,
+    get_line_pollution_score,
+    get_record_anomaly_score,
+    set_line_pollution_score,
+    set_record_anomaly_score,
+)
+from .workflow_rules import RecordAggregate, get_probe_profile, is_validation_aggregate_healthy
+
+
+def cusum_step(score: float, level: float) -> float:
+    """单侧 CUSUM：每次观测累加超出参考水平的部分，低于参考水平时回落，结果限制在 [0, 上限]。
+
+    观测水平以 1 为健康/异常的分界、参考水平取 0.5：边界上的异常需要连续两次才达到阈值，严重劣化
+    （水平 1.5 以上）一次即可报警；每次正常观测（水平 0）使统计量回落一个参考水平。
+    """
+    return min(max(score + min(level, CHANGE_DETECTION_MAX_LEVEL) - CHANGE_DETECTION_REFERENCE_LEVEL, 0.0), CHANGE_DETECTION_MAX_SCORE)
+
+
+def is_change_detected(score: float) -> bool:
+    return score >= CHANGE_DETECTION_THRESHOLD
+
+
+def record_degradation_level(aggregate: RecordAggregate, line_name: str) -> float:
+    """把第二次测速的记录汇总折算为劣化水平：p50 耗时占删除阈值的比例与失败率占容忍失败率的比例取较大者。
+
+    判定为健康的记录水平记为 0：无论 p50 离阈值多近，都让统计量回落，避免异常后的正常观测把统计量卡在原处。
+    """
+    profile = get_probe_profile(line_name)
+    if is_validation_aggregate_healthy(aggregate, profile):
+        return 0.0
+    failure_level = (1 - aggregate.success_rate) / (1 - VALIDATION_MIN_SUCCESS_RATE)
+    if aggregate.p50_total_time is None:
+        return max(failure_level, CHANGE_DETECTION_MAX_LEVEL)
+    return max(aggregate.p50_total_time / profile.second_pass_delete_min_total_time_seconds, failure_level)
+
+
+def update_record_anomaly_score(state: RuntimeState, rr: str, line: str, ip_address: str, level: float) -> float:
+    score = cusum_step(get_record_anomaly_score(state, rr, line, ip_address), level)
+    set_record_anomaly_score(state, rr, line, ip_address, score)
+    return score
+
+
+def update_line_pollution_scores(state: RuntimeState, line_aggregates: dict[str, RecordAggregate]) -> set[str]:
+    """以各线路本轮全部检测点的 p50 耗时与失败率折算的劣化水平更新统计量，返回判定为受污染的线路。
+
+    本轮没有观测的线路同样参与更新（水平为 0），统计量随之回落。
+    """
+    polluted_lines = set()
+    levels_by_line = {
+        line_name.lower(): record_degradation_level(aggregate, line_name) for line_name, aggregate in line_aggregates.items()
+    }
+    for line_name in set(state.line_pollution_scores) | set(levels_by_line):
+        score = cusum_step(get_line_pollution_score(state, line_name), levels_by_line.get(line_name, 0.0))
+        set_line_pollution_score(state, line_name, score)
+        if is_change_detected(score):
+            polluted_lines.add(line_name)
+    return polluted_lines
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+if __name__ == "__main__" and (__package__ is None or __package__ == ""):
+    import sys
+    from pathlib import Path
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    __package__ = "src"
+
+import argparse
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import replace
+
+from .dns_provider import BatchRecordResult, DnsProvider, DnsProviderError, DnsQuota, DnsRecord, DnsThrottledError
+from .logging_utils import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryDnsProvider(DnsProvider):
+    """离线内存后端：可注入延迟、限流与随机失败，并统计每类 API 调用次数。"""
+
+    name = "memory"
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        max_calls_per_second: float | None = None,
+        failure_rate: float = 0.0,
+        max_records_per_line: int = 10,
+        seed: int | None = None,
+    ):
+        self.latency_seconds = latency_seconds
+        self.max_calls_per_second = max_calls_per_second
+        self.failure_rate = failure_rate
+        self.max_records_per_line = max_records_per_line
+        self.call_counts: Counter[str] = Counter()
+        self.weighted_subdomains: set[tuple[str, str, str, str | None]] = set()
+        self._records: dict[str, dict[str, DnsRecord]] = {}
+        self._record_ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(max_calls_per_second or 0)
+        self._tokens_updated_at = time.monotonic()
+
+    def _take_token(self) -> bool:
+        if not self.max_calls_per_second:
+            return True
+        now = time.monotonic()
+        elapsed = now - self._tokens_updated_at
+        self._tokens_updated_at = now
+        self._tokens = min(self.max_calls_per_second, self._tokens + elapsed * self.max_calls_per_second)
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _enter_call(self, action: str) -> None:
+        with self._lock:
+            self.call_counts[action] += 1
+            throttled = not self._take_token()
+            failed = self.failure_rate > 0 and self._random.random() < self.failure_rate
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        if throttled:
+            raise DnsThrottledError(f"{action} 触发限流")
+        if failed:
+            raise DnsProviderError(f"{action} 注入失败")
+
+    def _now_ms(self) -> int:
+        return int(time.time() * 1000)
+
+    def _line_count(self, domain_name: str, record: DnsRecord) -> int:
+        return sum(
+            1
+            for existing in self._records.get(domain_name, {}).values()
+            if existing.rr == record.rr and existing.line.lower() == record.line.lower()
+        )
+
+    def _insert(self, domain_name: str, record: DnsRecord) -> DnsRecord:
+        if self._line_count(domain_name, record) >= self.max_records_per_line:
+            raise DnsProviderError(f"线路记录数已达上限: rr={record.rr} line={record.line}")
+        if any(existing.identity() == record.identity() for existing in self._records.get(domain_name, {}).values()):
+            raise DnsProviderError(f"记录已存在: rr={record.rr} line={record.line} value={record.value}")
+
+        stored = DnsRecord(
+            rr=record.rr,
+            record_type=record.record_type,
+            value=record.value,
+            line=record.line,
+            record_id=str(next(self._record_ids)),
+            ttl=record.ttl,
+            weight=record.weight,
+            create_timestamp=self._now_ms(),
+        )
+        self._records.setdefault(domain_name, {})[stored.record_id or ""] = stored
+        return stored
+
+    def _remove(self, domain_name: str, record: DnsRecord) -> None:
+        if self._records.get(domain_name, {}).pop(record.record_id or "", None) is None:
+            raise DnsProviderError(f"记录不存在: record_id={record.record_id}")
+
+    def seed_records(self, domain_name: str, records: list[DnsRecord]) -> list[DnsRecord]:
+        """直接写入初始记录，不计入调用次数。"""
+        with self._lock:
+            return [self._insert(domain_name, record) for record in records]
+
+    def query_records(self, domain_name, rr=None, record_type=None, line=None) -> list[DnsRecord]:
+        self._enter_call("query")
+        with self._lock:
+            return [
+                record
+                for record in self._records.get(domain_name, {}).values()
+                if (rr is None or record.rr == rr)
+                and (record_type is None or record.record_type == record_type)
+                and (line is None or record.line.lower() == line.lower())
+            ]
+
+    def add_record(self, domain_name: str, record: DnsRecord) -> DnsRecord:
+        self._enter_call("add")
+        with self._lock:
+            return self._insert(domain_name, record)
+
+    def update_record(self, domain_name: str, record: DnsRecord, value: str) -> DnsRecord:
+        self._enter_call("update")
+        with self._lock:
+            records = self._records.get(domain_name, {})
+            stored = records.get(record.record_id or "")
+            if stored is None:
+                raise DnsProviderError(f"记录不存在: record_id={record.record_id}")
+            updated = stored.with_value(value, update_timestamp=self._now_ms())
+            records[record.record_id or ""] = updated
+            return updated
+
+    def delete_record(self, domain_name: str, record: DnsRecord) -> None:
+        self._enter_call("delete")
+        with self._lock:
+            self._remove(domain_name, record)
+
+    def batch_add(self, domain_name: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        self._enter_call("batch_add")
+        results = []
+        with self._lock:
+            for record in records:
+                try:
+                    results.append(BatchRecordResult(record=self._insert(domain_name, record), ok=True))
+                except DnsProviderError as exc:
+                    results.append(BatchRecordResult(record=record, ok=False, reason=str(exc)))
+        return results
+
+    def batch_delete(self, domain_name: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        self._enter_call("batch_delete")
+        results = []
+        with self._lock:
+            for record in records:
+                try:
+                    self._remove(domain_name, record)
+                    results.append(BatchRecordResult(record=record, ok=True))
+                except DnsProviderError as exc:
+                    results.append(BatchRecordResult(record=record, ok=False, reason=str(exc)))
+        return results
+
+    def set_weighted_round_robin(self, domain_name, rr, enabled, record_type="A", line=None) -> None:
+        self._enter_call("set_weighted")
+        weighted_key = (domain_name, rr, record_type, line.lower() if line else None)
+        with self._lock:
+            if enabled:
+                self.weighted_subdomains.add(weighted_key)
+            else:
+                self.weighted_subdomains.discard(weighted_key)
+
+    def update_record_weight(self, domain_name: str, record: DnsRecord, weight: int) -> DnsRecord:
+        self._enter_call("update_weight")
+        with self._lock:
+            records = self._records.get(domain_name, {})
+            stored = records.get(record.record_id or "")
+            if stored is None:
+                raise DnsProviderError(f"记录不存在: record_id={record.record_id}")
+            updated = replace(stored, weight=weight)
+            records[record.record_id or ""] = updated
+            return updated
+
+    def get_quota(self) -> DnsQuota:
+        return DnsQuota(max_records_per_line=self.max_records_per_line)
+
+
+def _random_ips(rng: random.Random, count: int) -> list[str]:
+    return [f"104.{rng.randint(16, 31)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(count)]
+
+
+def run_cycle_benchmark(
+    provider: InMemoryDnsProvider,
+    cycles: int = 20,
+    candidates_per_line: int = 8,
+    domain_root: str = "example.com",
+    seed: int = 0,
+) -> dict[str, object]:
+    """在内存后端上重复执行一轮 DNS 阶段（temp 精确同步、生产补足、生产收敛），返回吞吐与调用统计。"""
+    from . import cf2alidns
+    from .project_constants import (
+        MAX_SURPLUS_PRUNE_PER_LINE_PER_CYCLE,
+        PRODUCTION_RECORD_CEILING,
+        PRODUCTION_RECORD_FLOOR,
+        PRODUCTION_RECORD_TARGET,
+        TEMP_SUBDOMAIN,
+    )
+
+    rng = random.Random(seed)
+    lines = ("mobile", "unicom", "telecom")
+    cf2alidns.set_provider(provider)
+    started_at = time.perf_counter()
+    try:
+        for _ in range(cycles):
+            ips_by_carrier = {line: _random_ips(rng, candidates_per_line) for line in lines}
+            cf2alidns.sync_aliyun_dns_records_exact(TEMP_SUBDOMAIN, domain_root, ips_by_carrier)
+            selected_ips = {line: ips[: PRODUCTION_RECORD_TARGET] for line, ips in ips_by_carrier.items()}
+            cf2alidns.ensure_production_dns_records(
+                "www",
+                domain_root,
+                selected_ips,
+                PRODUCTION_RECORD_FLOOR,
+                PRODUCTION_RECORD_TARGET,
+                PRODUCTION_RECORD_CEILING,
+            )
+            cf2alidns.prune_production_dns_records(
+                "www",
+                domain_root,
+                selected_ips,
+                PRODUCTION_RECORD_FLOOR,
+                PRODUCTION_RECORD_CEILING,
+                MAX_SURPLUS_PRUNE_PER_LINE_PER_CYCLE,
+            )
+    finally:
+        cf2alidns.set_provider(None)
+
+    elapsed_seconds = time.perf_counter() - started_at
+    total_calls = sum(provider.call_counts.values())
+    return {
+        "cycles": cycles,
+        "elapsed_seconds": round(elapsed_seconds, 4),
+        "cycles_per_second": round(cycles / elapsed_seconds, 2) if elapsed_seconds > 0 else None,
+        "api_calls": total_calls,
+        "api_calls_per_cycle": round(total_calls / cycles, 2) if cycles else 0,
+        "call_counts": dict(provider.call_counts),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="在内存 DNS 后端上离线测量一轮 DNS 阶段的吞吐与 API 调用次数")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="每次调用的模拟延迟（秒）")
+    parser.add_argument("--qps", type=float, default=None, help="令牌桶限流速率，超出时抛出限流错误")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configure_logging(level=logging.WARNING)
+    provider = InMemoryDnsProvider(
+        latency_seconds=args.latency,
+        max_calls_per_second=args.qps,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    result = run_cycle_benchmark(provider, cycles=args.cycles, candidates_per_line=args.candidates, seed=args.seed)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
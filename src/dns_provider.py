@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Any, Mapping
+
+
+class DnsProviderError(Exception):
+    pass
+
+
+class DnsThrottledError(DnsProviderError):
+    pass
+
+
+def _optional_int(value: object) -> int | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+@dataclass(frozen=True)
+class DnsRecord:
+    rr: str
+    record_type: str
+    value: str
+    line: str
+    record_id: str | None = None
+    ttl: int | None = None
+    weight: int | None = None
+    create_timestamp: int | None = None
+    update_timestamp: int | None = None
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, Any]) -> "DnsRecord":
+        record_id = mapping.get("RecordId")
+        return cls(
+            rr=str(mapping.get("RR", "")),
+            record_type=str(mapping.get("Type") or "A"),
+            value=str(mapping.get("Value", "")),
+            line=str(mapping.get("Line", "")),
+            record_id=str(record_id) if record_id is not None else None,
+            ttl=_optional_int(mapping.get("TTL")),
+            weight=_optional_int(mapping.get("Weight")),
+            create_timestamp=_optional_int(mapping.get("CreateTimestamp")),
+            update_timestamp=_optional_int(mapping.get("UpdateTimestamp")),
+        )
+
+    def to_mapping(self) -> dict[str, Any]:
+        """转换为项目内通用的阿里云风格记录字典。"""
+        mapping: dict[str, Any] = {
+            "RR": self.rr,
+            "Type": self.record_type,
+            "Value": self.value,
+            "Line": self.line,
+            "RecordId": self.record_id,
+        }
+        optional_fields = {
+            "TTL": self.ttl,
+            "Weight": self.weight,
+            "CreateTimestamp": self.create_timestamp,
+            "UpdateTimestamp": self.update_timestamp,
+        }
+        mapping.update({key: value for key, value in optional_fields.items() if value is not None})
+        return mapping
+
+    def with_value(self, value: str, update_timestamp: int | None = None) -> "DnsRecord":
+        return replace(self, value=value, update_timestamp=update_timestamp)
+
+    def identity(self) -> tuple[str, str, str, str]:
+        return (self.rr, self.record_type, self.value, self.line.lower())
+
+
+@dataclass(frozen=True)
+class BatchRecordResult:
+    record: DnsRecord
+    ok: bool
+    reason: str | None = None
+
+
+@dataclass(frozen=True)
+class DnsQuota:
+    max_records_per_line: int
+
+
+class DnsProvider(ABC):
+    """DNS 服务商接口：cf2alidns 的同步、维护与收敛逻辑只依赖这些操作。"""
+
+    name = "abstract"
+
+    @abstractmethod
+    def query_records(
+        self,
+        domain_name: str,
+        rr: str | None = None,
+        record_type: str | None = None,
+        line: str | None = None,
+    ) -> list[DnsRecord]:
+        """返回完整结果；任一分页失败时抛出异常，避免调用方拿到残缺快照。"""
+
+    @abstractmethod
+    def add_record(self, domain_name: str, record: DnsRecord) -> DnsRecord:
+        """新增记录并返回带 record_id 的结果。"""
+
+    @abstractmethod
+    def update_record(self, domain_name: str, record: DnsRecord, value: str) -> DnsRecord:
+        """原地改写记录值，返回改写后的记录。"""
+
+    @abstractmethod
+    def delete_record(self, domain_name: str, record: DnsRecord) -> None:
+        """按 record_id 删除记录。"""
+
+    @abstractmethod
+    def batch_add(self, domain_name: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        """批量新增；结果未知（如超时）时返回 None。"""
+
+    @abstractmethod
+    def batch_delete(self, domain_name: str, records: list[DnsRecord]) -> list[BatchRecordResult] | None:
+        """批量删除；结果未知（如超时）时返回 None。"""
+
+    @abstractmethod
+    def set_weighted_round_robin(
+        self,
+        domain_name: str,
+        rr: str,
+        enabled: bool,
+        record_type: str = "A",
+        line: str | None = None,
+    ) -> None:
+        """开启或关闭指定主机记录（可限定线路）的权重轮询。"""
+
+    @abstractmethod
+    def update_record_weight(self, domain_name: str, record: DnsRecord, weight: int) -> DnsRecord:
+        """改写单条记录的轮询权重，返回改写后的记录。"""
+
+    @abstractmethod
+    def get_quota(self) -> DnsQuota:
+        """返回套餐配额信息。"""
@@ -12,7 +12,7 @@ import logging
 import random
 import re
 import socket
-from typing import List, Mapping, Tuple
+from typing import Callable, List, Mapping, Optional, Tuple
 
 import cloudscraper
 import requests
@@ -25,12 +25,16 @@ from .project_constants import (
     IP_SOURCE_URLS,
     MAX_CANDIDATE_IPS_PER_CARRIER,
     MAX_CF090227_IPS_PER_CARRIER,
+    MAX_OVERSEA_CANDIDATE_IPS,
     PUBLIC_DOH_ENDPOINTS,
 )
 
 
 logger = logging.getLogger(__name__)
 IPV4_PATTERN = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+DOH_ANSWER_TYPES = {"A": 1, "AAAA": 28}
+SOCKET_FAMILIES = {"A": socket.AF_INET, "AAAA": socket.AF_INET6}
+CandidateSampler = Callable[[str, List[str], int], List[str]]
 
 
 def _is_public_ipv4(ip_address: str) -> bool:
@@ -43,10 +47,24 @@ def _is_public_ipv4(ip_address: str) -> bool:
         return False
 
 
-def _filter_candidate_ips(ip_addresses: List[str]) -> List[str]:
+def _is_public_ipv6(ip_address: str) -> bool:
+    try:
+        parsed_ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return False
+    return parsed_ip.version == 6 and parsed_ip.is_global
+
+
+def _is_public_ip(ip_address: str, record_type: str = "A") -> bool:
+    if record_type == "AAAA":
+        return _is_public_ipv6(ip_address)
+    return _is_public_ipv4(ip_address)
+
+
+def _filter_candidate_ips(ip_addresses: List[str], record_type: str = "A") -> List[str]:
     filtered_ips = []
     for ip_address in ip_addresses:
-        if not _is_public_ipv4(ip_address):
+        if not _is_public_ip(ip_address, record_type):
             continue
         if any(ip_address.startswith(prefix) for prefix in EXCLUDED_IP_PREFIXES):
             continue
@@ -54,21 +72,30 @@ def _filter_candidate_ips(ip_addresses: List[str]) -> List[str]:
     return filtered_ips
 
 
-def _select_sample(ip_addresses: List[str], limit: int) -> List[str]:
-    unique_ips = sorted(set(_filter_candidate_ips(ip_addresses)))
+def _select_sample(
+    ip_addresses: List[str],
+    limit: int,
+    record_type: str = "A",
+    sampler: Optional[CandidateSampler] = None,
+    line_name: str = "",
+) -> List[str]:
+    """过滤并去重后取 limit 个候选；提供 sampler 时由其按线路决定取舍，否则随机抽取。"""
+    unique_ips = sorted(set(_filter_candidate_ips(ip_addresses, record_type)))
     if len(unique_ips) <= limit:
         return unique_ips
+    if sampler is not None:
+        return sampler(line_name, unique_ips, limit)
     return random.sample(unique_ips, limit)
 
 
-def _resolve_ipv4_records_via_doh(hostname: str) -> List[str]:
+def _resolve_records_via_doh(hostname: str, record_type: str = "A") -> List[str]:
     headers = {"accept": "application/dns-json"}
 
     for endpoint in PUBLIC_DOH_ENDPOINTS:
         try:
             response = requests.get(
                 endpoint,
-                params={"name": hostname, "type": "A"},
+                params={"name": hostname, "type": record_type},
                 headers=headers,
                 timeout=10,
             )
@@ -77,7 +104,7 @@ def _resolve_ipv4_records_via_doh(hostname: str) -> List[str]:
             resolved_ips = [
                 answer.get("data", "")
                 for answer in response_json.get("Answer", [])
-                if answer.get("type") == 1 and _is_public_ipv4(answer.get("data", ""))
+                if answer.get("type") == DOH_ANSWER_TYPES[record_type] and _is_public_ip(answer.get("data", ""), record_type)
             ]
             if resolved_ips:
                 return sorted(set(resolved_ips))
@@ -88,8 +115,8 @@ def _resolve_ipv4_records_via_doh(hostname: str) -> List[str]:
         resolved_ips = sorted(
             {
                 str(result[4][0])
-                for result in socket.getaddrinfo(hostname, None, socket.AF_INET)
-                if _is_public_ipv4(str(result[4][0]))
+                for result in socket.getaddrinfo(hostname, None, SOCKET_FAMILIES[record_type])
+                if _is_public_ip(str(result[4][0]), record_type)
             }
         )
         return resolved_ips
@@ -153,7 +180,7 @@ def classify_api_ip_data(data: Mapping[str, object]) -> Tuple[List[str], List[st
     return local_cm, local_cu, local_ct
 
 
-def parse_table_ips_from_html(html: str) -> Tuple[List[str], List[str], List[str]]:
+def parse_table_ips_from_html(html: str, record_type: str = "A") -> Tuple[List[str], List[str], List[str]]:
     cm_ips, cu_ips, ct_ips = [], [], []
     soup = BeautifulSoup(html, "html.parser")
     table = soup.find("table")
@@ -167,7 +194,7 @@ def parse_table_ips_from_html(html: str) -> Tuple[List[str], List[str], List[str
 
         carrier_name = columns[0].get_text(strip=True)
         ip_address = columns[1].get_text(strip=True)
-        if not _is_public_ipv4(ip_address):
+        if not _is_public_ip(ip_address, record_type):
             continue
 
         if "移动" in carrier_name:
@@ -184,6 +211,35 @@ def parse_text_ips(text: str) -> List[str]:
     return [ip.strip() for ip in text.split(",") if _is_public_ipv4(ip.strip())]
 
 
+def parse_cidr_ranges(text: str) -> list[ipaddress.IPv4Network]:
+    networks = []
+    for line in text.splitlines():
+        try:
+            network = ipaddress.ip_network(line.strip(), strict=False)
+        except ValueError:
+            continue
+        if network.version == 4:
+            networks.append(network)
+    return networks
+
+
+def sample_hosts_from_ranges(networks: list[ipaddress.IPv4Network], count: int, rng: random.Random | None = None) -> List[str]:
+    """按网段大小加权，从 Cloudflare 官方网段中随机抽取主机地址（跳过网络号与广播地址）。"""
+    rng = rng or random.Random()
+    usable_networks = [network for network in networks if network.num_addresses > 2]
+    if not usable_networks:
+        return []
+
+    sampled_ips: set[str] = set()
+    weights = [network.num_addresses for network in usable_networks]
+    for _ in range(count * 4):
+        if len(sampled_ips) >= count:
+            break
+        network = rng.choices(usable_networks, weights=weights)[0]
+        sampled_ips.add(str(network.network_address + rng.randint(1, network.num_addresses - 2)))
+    return _filter_candidate_ips(sorted(sampled_ips))
+
+
 def parse_cf090227_domain_cards(html: str) -> list[tuple[str, list[str]]]:
     soup = BeautifulSoup(html, "html.parser")
     parsed_cards = []
@@ -216,14 +272,13 @@ def extract_ips_from_api(url: str) -> Tuple[List[str], List[str], List[str]]:
     return classify_api_ip_data(data)
 
 
-def extract_table_ips_from_html(url: str) -> Tuple[List[str], List[str], List[str]]:
+def extract_table_ips_from_html(url: str, record_type: str = "A") -> Tuple[List[str], List[str], List[str]]:
     """从 HTML 页面表格中提取 IP，并按运营商分类。"""
-    cm_ips, cu_ips, ct_ips = [], [], []
     try:
         scraper = cloudscraper.create_scraper()
         response = scraper.get(url, timeout=10)
         response.raise_for_status()
-        return parse_table_ips_from_html(response.text)
+        return parse_table_ips_from_html(response.text, record_type)
     except Exception as exc:
         logger.warning("提取表格 IP 失败: url=%s error=%s", url, exc)
         return [], [], []
@@ -242,8 +297,8 @@ def extract_ips_from_text(url: str) -> Tuple[List[str], List[str], List[str]]:
         return [], [], []
 
 
-def extract_ips_from_cf090227(url: str) -> Tuple[List[str], List[str], List[str]]:
-    """从 cf.090227.xyz 的域名卡片中提取域名，并通过公共 DoH 解析出 A 记录。"""
+def extract_ips_from_cf090227(url: str, record_type: str = "A") -> Tuple[List[str], List[str], List[str]]:
+    """从 cf.090227.xyz 的域名卡片中提取域名，并通过公共 DoH 解析出 A/AAAA 记录。"""
     carrier_ips = {"mobile": [], "unicom": [], "telecom": []}
     try:
         response = requests.get(url, timeout=10)
@@ -253,23 +308,23 @@ def extract_ips_from_cf090227(url: str) -> Tuple[List[str], List[str], List[str]
         return [], [], []
 
     for host, carriers in parse_cf090227_domain_cards(response.text):
-        resolved_ips = _resolve_ipv4_records_via_doh(host)
+        resolved_ips = _resolve_records_via_doh(host, record_type)
         if not resolved_ips:
-            logger.info("cf.090227.xyz 域名未解析到公网 IPv4: host=%s", host)
+            logger.info("cf.090227.xyz 域名未解析到公网地址: host=%s type=%s", host, record_type)
             continue
 
         for carrier in carriers:
             carrier_ips[carrier].extend(resolved_ips)
 
     return (
-        _select_sample(carrier_ips["mobile"], MAX_CF090227_IPS_PER_CARRIER),
-        _select_sample(carrier_ips["unicom"], MAX_CF090227_IPS_PER_CARRIER),
-        _select_sample(carrier_ips["telecom"], MAX_CF090227_IPS_PER_CARRIER),
+        _select_sample(carrier_ips["mobile"], MAX_CF090227_IPS_PER_CARRIER, record_type),
+        _select_sample(carrier_ips["unicom"], MAX_CF090227_IPS_PER_CARRIER, record_type),
+        _select_sample(carrier_ips["telecom"], MAX_CF090227_IPS_PER_CARRIER, record_type),
     )
 
 
-def get_cf_ips() -> Tuple[List[str], List[str], List[str]]:
-    """执行获取、合并和处理 Cloudflare IP 的完整流程。"""
+def get_cf_ips(sampler: Optional[CandidateSampler] = None) -> Tuple[List[str], List[str], List[str]]:
+    """执行获取、合并和处理 Cloudflare IP 的完整流程；sampler 决定每个运营商进入 temp 的候选。"""
     all_cm_ips, all_cu_ips, all_ct_ips = [], [], []
 
     try:
@@ -313,9 +368,9 @@ def get_cf_ips() -> Tuple[List[str], List[str], List[str]]:
                 len(ct_ips),
             )
 
-    final_ct_ip = _select_sample(all_ct_ips, MAX_CANDIDATE_IPS_PER_CARRIER)
-    final_cm_ip = _select_sample(all_cm_ips, MAX_CANDIDATE_IPS_PER_CARRIER)
-    final_cu_ip = _select_sample(all_cu_ips, MAX_CANDIDATE_IPS_PER_CARRIER)
+    final_ct_ip = _select_sample(all_ct_ips, MAX_CANDIDATE_IPS_PER_CARRIER, sampler=sampler, line_name="telecom")
+    final_cm_ip = _select_sample(all_cm_ips, MAX_CANDIDATE_IPS_PER_CARRIER, sampler=sampler, line_name="mobile")
+    final_cu_ip = _select_sample(all_cu_ips, MAX_CANDIDATE_IPS_PER_CARRIER, sampler=sampler, line_name="unicom")
 
     logger.info(
         "处理后：电信 %s 个, 移动 %s 个, 联通 %s 个。",
@@ -327,6 +382,43 @@ def get_cf_ips() -> Tuple[List[str], List[str], List[str]]:
     return final_ct_ip, final_cm_ip, final_cu_ip
 
 
+def get_cf_ipv6s(sampler: Optional[CandidateSampler] = None) -> Tuple[List[str], List[str], List[str]]:
+    """获取 Cloudflare IPv6 候选，返回顺序与 get_cf_ips 一致（电信、移动、联通）。"""
+    all_cm_ips, all_cu_ips, all_ct_ips = [], [], []
+    source_extractors = [
+        ("wetest.vip(v6)", lambda: extract_table_ips_from_html(IP_SOURCE_URLS["wetest_v6"], "AAAA")),
+        ("cf.090227.xyz(v6)", lambda: extract_ips_from_cf090227(IP_SOURCE_URLS["cf090227"], "AAAA")),
+    ]
+
+    for source_name, extractor in source_extractors:
+        cm_ips, cu_ips, ct_ips = extractor()
+        all_cm_ips.extend(cm_ips)
+        all_cu_ips.extend(cu_ips)
+        all_ct_ips.extend(ct_ips)
+        logger.info("%s 获取完成。移动 %s, 联通 %s, 电信 %s 个IP。", source_name, len(cm_ips), len(cu_ips), len(ct_ips))
+
+    final_ct_ip = _select_sample(all_ct_ips, MAX_CANDIDATE_IPS_PER_CARRIER, "AAAA", sampler, "telecom")
+    final_cm_ip = _select_sample(all_cm_ips, MAX_CANDIDATE_IPS_PER_CARRIER, "AAAA", sampler, "mobile")
+    final_cu_ip = _select_sample(all_cu_ips, MAX_CANDIDATE_IPS_PER_CARRIER, "AAAA", sampler, "unicom")
+    logger.info("IPv6 处理后：电信 %s 个, 移动 %s 个, 联通 %s 个。", len(final_ct_ip), len(final_cm_ip), len(final_cu_ip))
+    return final_ct_ip, final_cm_ip, final_cu_ip
+
+
+def get_oversea_cf_ips() -> List[str]:
+    """海外用户直连 Cloudflare 任播即可就近接入，候选取自官方 IPv4 网段的随机抽样。"""
+    try:
+        response = requests.get(IP_SOURCE_URLS["cloudflare_v4"], timeout=10)
+        response.raise_for_status()
+        networks = parse_cidr_ranges(response.text)
+    except Exception as exc:
+        logger.warning("获取 Cloudflare 官方网段失败: url=%s error=%s", IP_SOURCE_URLS["cloudflare_v4"], exc)
+        return []
+
+    oversea_ips = sample_hosts_from_ranges(networks, MAX_OVERSEA_CANDIDATE_IPS)
+    logger.info("海外候选获取完成。网段 %s 个，抽样 %s 个IP。", len(networks), len(oversea_ips))
+    return oversea_ips
+
+
 if __name__ == "__main__":
     configure_logging(format_string="%(asctime)s - %(levelname)s - [IPSource] - %(message)s")
     ct_ip, cm_ip, cu_ip = get_cf_ips()
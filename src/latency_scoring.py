@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import math
+import statistics
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from .project_constants import (
+    FIRST_PASS_REQUIRED_STATUS,
+    LATENCY_EWMA_ALPHA,
+    LATENCY_SCORE_CONFIDENCE_Z,
+    LATENCY_SCORE_PRIOR_STDDEV_SECONDS,
+)
+from .runtime_state import RuntimeState, get_candidate_latency_estimate, set_candidate_latency_estimate
+from .workflow_rules import ProbeObservation, get_parent_line, get_probe_profile, is_fine_grained_line
+
+
+@dataclass(frozen=True)
+class LatencyEstimate:
+    mean: float
+    variance: float
+    samples: int
+
+    def to_list(self) -> list[float]:
+        return [self.mean, self.variance, float(self.samples)]
+
+    @classmethod
+    def from_list(cls, values: list[float]) -> LatencyEstimate:
+        return cls(mean=values[0], variance=values[1], samples=int(values[2]))
+
+
+def update_latency_estimate(
+    estimate: LatencyEstimate | None,
+    sample: float,
+    alpha: float = LATENCY_EWMA_ALPHA,
+) -> LatencyEstimate:
+    """指数加权更新延迟均值与方差；首个样本直接作为均值。"""
+    if estimate is None:
+        return LatencyEstimate(mean=sample, variance=0.0, samples=1)
+    difference = sample - estimate.mean
+    increment = alpha * difference
+    return LatencyEstimate(
+        mean=estimate.mean + increment,
+        variance=(1 - alpha) * (estimate.variance + difference * increment),
+        samples=estimate.samples + 1,
+    )
+
+
+def score_latency_estimate(
+    estimate: LatencyEstimate,
+    confidence_z: float = LATENCY_SCORE_CONFIDENCE_Z,
+    prior_stddev_seconds: float = LATENCY_SCORE_PRIOR_STDDEV_SECONDS,
+) -> float:
+    """返回偏保守的延迟评分（越小越好）：样本越少、波动越大，惩罚越高。"""
+    uncertainty = math.sqrt((estimate.variance + prior_stddev_seconds**2) / max(estimate.samples, 1))
+    return estimate.mean + confidence_z * uncertainty
+
+
+def collect_cycle_latency_samples(observations: Iterable[ProbeObservation]) -> dict[tuple[str, str], float]:
+    """把一次测速的观测压缩为每个 (ip, line) 一个样本：取各检测点耗时的中位数，失败按删除阈值计。
+
+    细分线路的观测同时计入所属运营商线路，与第一次筛选的归属方式一致。
+    """
+    latencies: dict[tuple[str, str], list[float]] = {}
+    for observation in observations:
+        profile = get_probe_profile(observation.line_name)
+        if observation.status == FIRST_PASS_REQUIRED_STATUS and observation.total_time_seconds is not None:
+            latency = min(observation.total_time_seconds, profile.second_pass_delete_min_total_time_seconds)
+        else:
+            latency = profile.second_pass_delete_min_total_time_seconds
+
+        line_names = [observation.line_name]
+        if is_fine_grained_line(observation.line_name):
+            line_names.append(get_parent_line(observation.line_name))
+        for line_name in line_names:
+            latencies.setdefault((observation.ip_address, line_name), []).append(latency)
+    return {record_key: statistics.median(samples) for record_key, samples in latencies.items()}
+
+
+def update_candidate_latency_scores(
+    state: RuntimeState,
+    observations: Iterable[ProbeObservation],
+) -> dict[tuple[str, str], float]:
+    """用本轮测速更新各 (ip, line) 的 EWMA 估计，返回本轮观测到的记录的最新评分。"""
+    scores = {}
+    for (ip_address, line_name), sample in collect_cycle_latency_samples(observations).items():
+        stored_estimate = get_candidate_latency_estimate(state, line_name, ip_address)
+        estimate = update_latency_estimate(
+            LatencyEstimate.from_list(stored_estimate) if stored_estimate is not None else None,
+            sample,
+        )
+        set_candidate_latency_estimate(state, line_name, ip_address, estimate.to_list())
+        scores[(ip_address, line_name)] = score_latency_estimate(estimate)
+    return scores
+
+
+def get_candidate_latency_scores(
+    state: RuntimeState,
+    record_keys: Iterable[tuple[str, str]],
+) -> dict[tuple[str, str], float]:
+    scores = {}
+    for ip_address, line_name in record_keys:
+        stored_estimate = get_candidate_latency_estimate(state, line_name, ip_address)
+        if stored_estimate is not None:
+            scores[(ip_address, line_name)] = score_latency_estimate(LatencyEstimate.from_list(stored_estimate))
+    return scores
@@ -10,64 +10,97 @@ if __name__ == "__main__" and (__package__ is None or __package__ == ""):
 
 import asyncio
 import logging
+import math
+import statistics
 import sys
 import time
 from time import sleep
 
 from . import cf2alidns, getIPFromW3, webTestUnion
+from .candidate_bandit import ThompsonCandidateSampler
+from .capacity_planner import ZoneCapacity
+from .change_detection import (
+    is_change_detected,
+    record_degradation_level,
+    update_line_pollution_scores,
+    update_record_anomaly_score,
+)
 from .healthcheck import log_healthcheck_result, run_healthcheck
+from .latency_scoring import LatencyEstimate, get_candidate_latency_scores, update_candidate_latency_scores
 from .logging_utils import configure_logging
+from .measurement_store import PHASE_FIRST_PASS, PHASE_VALIDATION, MeasurementStore
+from .mutation_journal import MutationJournal
+from .node_reliability import get_node_weights, log_node_weights, update_node_reliability
 from .process_lock import SingleInstanceLock
 from .project_config import RuntimeConfig, load_runtime_config
 from .project_constants import (
     CARRIER_DISPLAY_NAMES,
-    CONSECUTIVE_ANOMALY_DELETE_THRESHOLD,
+    DNS_WEIGHT_HYSTERESIS,
+    LAST_GOOD_SNAPSHOT_MAX_AGE_HOURS,
+    LAST_GOOD_SNAPSHOT_MAX_ANOMALY_RATIO,
+    MAX_CANDIDATE_IPS_PER_CARRIER,
     MAX_REPLACE_PER_LINE_PER_CYCLE,
     MAX_REPLACE_TOTAL_PER_CYCLE,
     MAX_SURPLUS_PRUNE_PER_LINE_PER_CYCLE,
     MIN_RECOMMENDED_SLEEP_SECONDS,
-    POLLUTION_SCORE_MAX,
-    PRODUCTION_RECORD_CEILING,
-    PRODUCTION_RECORD_FLOOR,
-    PRODUCTION_RECORD_TARGET,
+    PRODUCTION_RECORD_LIMITS_BY_TYPE,
+    RECORD_LATENCY_HISTORY_CYCLES,
     RECOMMENDED_SLEEP_SECONDS,
     ROTATION_COOLDOWN_HOURS,
-    ROTATION_HARD_AGE_HOURS,
-    ROTATION_SOFT_AGE_HOURS,
+    STANDBY_FIRST_PASS_MAX_AGE_HOURS,
+    STANDBY_POOL_SIZE_PER_LINE,
+    STANDBY_VALIDATION_MAX_AGE_HOURS,
 )
 from .runtime_state import (
     RuntimeState,
+    append_record_latency_samples,
     clear_record_state,
-    decay_line_pollution_scores,
+    compact_record_state,
+    discard_standby_entry,
+    evict_stale_runtime_state,
+    get_candidate_latency_estimate,
     get_line_pollution_score,
-    increment_record_anomaly_streak,
-    increment_line_pollution_score,
+    get_production_snapshot,
+    get_record_latency_samples,
+    get_standby_ips,
     is_record_in_rotation_cooldown,
     load_runtime_state,
-    mark_record_healthy,
+    mark_production_snapshot_rolled_back,
+    mark_standby_first_pass,
+    mark_standby_validated,
     prune_expired_runtime_state,
+    prune_standby_pool,
+    save_production_snapshot,
     save_runtime_state,
     set_record_rotation_cooldown,
 )
+from .rotation_planner import RotationRecord, plan_rotation_swaps
+from .stage_checkpoint import StageCheckpoint, config_fingerprint
+from .time_profiles import PeakOutlook, build_peak_outlook, log_peak_outlook
 from .workflow_rules import (
     ValidationSummary,
+    compute_record_weights,
+    extract_probe_observations,
     filter_and_select_ips,
+    get_parent_line,
     should_freeze_production_deletions,
     summarize_validation_results,
 )
 
 
 logger = logging.getLogger(__name__)
+_measurement_store: MeasurementStore | None = None
+_peak_outlook: PeakOutlook | None = None
 
 
 def log_selected_ips(selected_ips_by_carrier: dict[str, list[str]]) -> None:
     logger.info("成功筛选出各线路的优质 IP：")
     for carrier, ips in selected_ips_by_carrier.items():
-        logger.info("%s (%s 个): %s", CARRIER_DISPLAY_NAMES[carrier], len(ips), ips)
+        logger.info("%s (%s 个): %s", CARRIER_DISPLAY_NAMES.get(carrier, carrier), len(ips), ips)
 
 
-def run_itdog_test(target_host: str, custom_dns: str) -> str | None:
-    return asyncio.run(webTestUnion.run_itdog_test(target_host=target_host, custom_dns=custom_dns))
+def run_itdog_test(target_host: str, custom_dns: str, record_type: str = "A") -> str | None:
+    return asyncio.run(webTestUnion.run_itdog_test(target_host=target_host, custom_dns=custom_dns, record_type=record_type))
 
 
 def log_sleep_time_guidance(config: RuntimeConfig) -> None:
@@ -113,12 +146,27 @@ def _normalize_record_timestamp(record_timestamp: object) -> int | None:
     return None
 
 
-def _build_production_record_maps(records: list[dict[str, object]]) -> tuple[set[tuple[str, str]], dict[str, list[dict[str, object]]]]:
+def _record_refreshed_timestamp(record: dict[str, object]) -> int | None:
+    timestamps = [
+        timestamp_value
+        for timestamp_value in (
+            _normalize_record_timestamp(record.get("CreateTimestamp")),
+            _normalize_record_timestamp(record.get("UpdateTimestamp")),
+        )
+        if timestamp_value is not None
+    ]
+    return max(timestamps) if timestamps else None
+
+
+def _build_production_record_maps(
+    records: list[dict[str, object]],
+    record_type: str = "A",
+) -> tuple[set[tuple[str, str]], dict[str, list[dict[str, object]]]]:
     production_record_set: set[tuple[str, str]] = set()
     records_by_line: dict[str, list[dict[str, object]]] = {}
 
     for record in records:
-        if record.get("Type") != "A":
+        if record.get("Type") != record_type:
             continue
 
         line_key = str(record.get("Line", "")).lower()
@@ -136,6 +184,11 @@ def _get_current_production_records(config: RuntimeConfig) -> list[dict[str, obj
     return cf2alidns.query_all_domain_records(config.domain_root, subdomain=config.domain_rr)
 
 
+def _try_get_current_production_records(config: RuntimeConfig) -> list[dict[str, object]] | None:
+    """查询失败时返回 None，而不是当作生产池为空。"""
+    return cf2alidns.try_query_all_domain_records(config.domain_root, subdomain=config.domain_rr)
+
+
 def _filter_candidates_for_rotation(
     config: RuntimeConfig,
     state: RuntimeState,
@@ -149,7 +202,7 @@ def _filter_candidates_for_rotation(
             ip_address
             for ip_address in ip_list
             if (ip_address, line_name) not in production_record_set
-            and not is_record_in_rotation_cooldown(state, config.domain_rr, line_name, ip_address)
+            and not is_record_in_rotation_cooldown(state, config.state_key, line_name, ip_address)
         ]
 
     return filtered_candidates
@@ -164,64 +217,114 @@ def _filter_candidates_by_cooldown(
         line_name: [
             ip_address
             for ip_address in ip_list
-            if not is_record_in_rotation_cooldown(state, config.domain_rr, line_name, ip_address)
+            if not is_record_in_rotation_cooldown(state, config.state_key, line_name, ip_address)
         ]
         for line_name, ip_list in selected_ips_by_carrier.items()
     }
 
 
+def _attribute_record_key(record_key: tuple[str, str], production_record_set: set[tuple[str, str]]) -> tuple[str, str]:
+    """细分线路没有对应记录时解析会回落到运营商线路，此时把观测结果归到父线路上的生产记录。"""
+    ip_address, line_name = record_key
+    parent_record_key = (ip_address, get_parent_line(line_name))
+    if record_key not in production_record_set and parent_record_key in production_record_set:
+        return parent_record_key
+    return record_key
+
+
+def _attribute_to_production_lines(
+    record_keys: set[tuple[str, str]],
+    production_record_set: set[tuple[str, str]],
+) -> set[tuple[str, str]]:
+    return {_attribute_record_key(record_key, production_record_set) for record_key in record_keys}
+
+
+def _record_degradation_levels(
+    summary: ValidationSummary,
+    production_record_set: set[tuple[str, str]],
+) -> dict[tuple[str, str], float]:
+    """按生产记录汇总本轮劣化水平；同一记录被多条细分线路观测到时取最好的一次，与健康优先的判定一致。"""
+    levels: dict[tuple[str, str], float] = {}
+    for record_key, aggregate in summary.record_aggregates.items():
+        production_key = _attribute_record_key(record_key, production_record_set)
+        level = record_degradation_level(aggregate, record_key[1])
+        levels[production_key] = min(levels.get(production_key, level), level)
+    return levels
+
+
 def _apply_validation_state(
     config: RuntimeConfig,
     state: RuntimeState,
     summary: ValidationSummary,
     production_record_set: set[tuple[str, str]],
 ) -> tuple[list[dict[str, str]], set[str]]:
-    polluted_lines: set[str] = set()
-    production_healthy_records = sorted(record_key for record_key in summary.healthy_records if record_key in production_record_set)
-    observed_non_production_records = sorted((summary.healthy_records | summary.anomalous_records) - production_record_set)
-
-    for ip_address, line_name in production_healthy_records:
-        mark_record_healthy(state, config.domain_rr, line_name, ip_address)
+    healthy_records = _attribute_to_production_lines(summary.healthy_records, production_record_set)
+    anomalous_records = _attribute_to_production_lines(summary.anomalous_records, production_record_set) - healthy_records
+    observed_production_records = sorted((healthy_records | anomalous_records) & production_record_set)
+    observed_non_production_records = sorted((healthy_records | anomalous_records) - production_record_set)
 
     for ip_address, line_name in observed_non_production_records:
-        polluted_lines.add(line_name)
-        score = increment_line_pollution_score(state, line_name, POLLUTION_SCORE_MAX)
-        logger.warning(
-            "检测到疑似运营商污染信号: observed_ip=%s line=%s pollution_score=%s",
-            ip_address,
+        logger.warning("检测到疑似运营商污染信号: observed_ip=%s line=%s", ip_address, line_name)
+    polluted_lines = update_line_pollution_scores(state, summary.line_aggregates)
+    for line_name in sorted(polluted_lines):
+        logger.warning("线路污染变点报警: line=%s pollution_score=%.2f", line_name, get_line_pollution_score(state, line_name))
+
+    for ip_address, line_name in observed_production_records:
+        if (ip_address, line_name) in anomalous_records:
+            discard_standby_entry(state, line_name, ip_address)
+        else:
+            mark_standby_validated(state, line_name, ip_address)
+
+    # 每轮为每条生产记录追加一个 p50 耗时，保留最近若干轮，供权重轮询与轮换规划共用，与是否启用权重轮询无关。
+    samples_by_record: dict[tuple[str, str], list[float]] = {}
+    for record_key, samples in summary.record_total_times.items():
+        production_key = _attribute_record_key(record_key, production_record_set)
+        if production_key in production_record_set and samples:
+            samples_by_record.setdefault(production_key, []).extend(samples)
+    for (ip_address, line_name), samples in samples_by_record.items():
+        append_record_latency_samples(
+            state,
+            config.state_key,
             line_name,
-            score,
+            ip_address,
+            [statistics.median(samples)],
+            RECORD_LATENCY_HISTORY_CYCLES,
         )
 
+    degradation_levels = _record_degradation_levels(summary, production_record_set)
     deletion_candidates = []
-    for ip_address, line_name in sorted(summary.anomalous_records):
-        if (ip_address, line_name) not in production_record_set:
-            continue
-
-        streak = increment_record_anomaly_streak(state, config.domain_rr, line_name, ip_address)
-        logger.info("生产记录异常累计: ip=%s line=%s streak=%s", ip_address, line_name, streak)
-        if streak >= CONSECUTIVE_ANOMALY_DELETE_THRESHOLD:
+    for ip_address, line_name in observed_production_records:
+        level = degradation_levels.get((ip_address, line_name), 1.0 if (ip_address, line_name) in anomalous_records else 0.0)
+        score = update_record_anomaly_score(state, config.state_key, line_name, ip_address, level)
+        if (ip_address, line_name) in anomalous_records:
+            logger.info("生产记录异常累计: ip=%s line=%s level=%.2f score=%.2f", ip_address, line_name, level, score)
+        # 只处理本轮仍判定为异常的记录：统计量尚未回落到阈值以下、但本轮已恢复健康的记录不删除也不替换。
+        if (ip_address, line_name) in anomalous_records and is_change_detected(score):
             deletion_candidates.append({"ip": ip_address, "line": line_name})
 
-    decay_line_pollution_scores(state, polluted_lines)
     return deletion_candidates, polluted_lines
 
 
-def _filter_deletions_by_floor(config: RuntimeConfig, deletion_candidates: list[dict[str, str]]) -> list[dict[str, str]]:
+def _filter_deletions_by_floor(
+    config: RuntimeConfig,
+    deletion_candidates: list[dict[str, str]],
+    record_type: str = "A",
+) -> list[dict[str, str]]:
     existing_records = _get_current_production_records(config)
-    line_counts = _count_records_by_line(existing_records)
+    line_counts = _count_records_by_line([record for record in existing_records if record.get("Type") == record_type])
+    floor_count = PRODUCTION_RECORD_LIMITS_BY_TYPE[record_type][0]
     allowed_deletions = []
 
     for candidate in deletion_candidates:
         line_key = candidate["line"].lower()
         remaining_count = line_counts.get(line_key, 0)
-        if remaining_count <= PRODUCTION_RECORD_FLOOR:
+        if remaining_count <= floor_count:
             logger.warning(
                 "跳过删除以保护生产池下限: ip=%s line=%s current=%s floor=%s",
                 candidate["ip"],
                 candidate["line"],
                 remaining_count,
-                PRODUCTION_RECORD_FLOOR,
+                floor_count,
             )
             continue
 
@@ -244,24 +347,33 @@ def _should_freeze_for_source_healthcheck(config: RuntimeConfig, has_anomalies:
     return not result.ok
 
 
-def _prune_surplus_production_records(config: RuntimeConfig, state: RuntimeState, selected_ips_by_carrier: dict[str, list[str]]) -> None:
+def _prune_surplus_production_records(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    selected_ips_by_carrier: dict[str, list[str]],
+    record_type: str = "A",
+    capacity: ZoneCapacity | None = None,
+) -> None:
+    floor_count, _, ceiling_count = PRODUCTION_RECORD_LIMITS_BY_TYPE[record_type]
     pruned_records = cf2alidns.prune_production_dns_records(
         domain_rr=config.domain_rr,
         domain_root=config.domain_root,
         preferred_ips_by_carrier=selected_ips_by_carrier,
-        floor_count=PRODUCTION_RECORD_FLOOR,
-        ceiling_count=PRODUCTION_RECORD_CEILING,
+        floor_count=floor_count,
+        ceiling_count=ceiling_count,
         max_prune_per_line=MAX_SURPLUS_PRUNE_PER_LINE_PER_CYCLE,
+        record_type=record_type,
+        capacity=capacity,
     )
     for record in pruned_records:
-        clear_record_state(state, config.domain_rr, record["line"], record["ip"])
+        clear_record_state(state, config.state_key, record["line"], record["ip"])
 
 
 def _record_age_hours(record: dict[str, object], now_timestamp: int) -> float:
-    created_at = _normalize_record_timestamp(record.get("CreateTimestamp"))
-    if created_at is None:
+    refreshed_at = _record_refreshed_timestamp(record)
+    if refreshed_at is None:
         return 0.0
-    return max(now_timestamp - created_at, 0) / 3600.0
+    return max(now_timestamp - refreshed_at, 0) / 3600.0
 
 
 def _replace_production_record(config: RuntimeConfig, state: RuntimeState, line_name: str, old_record: dict[str, object], new_ip: str) -> bool:
@@ -269,31 +381,44 @@ def _replace_production_record(config: RuntimeConfig, state: RuntimeState, line_
     if not old_ip or old_ip == new_ip:
         return False
 
-    cf2alidns.add_record(config.domain_root, config.domain_rr, "A", new_ip, line_name)
-    existing_records = _get_current_production_records(config)
-    production_record_set, _ = _build_production_record_maps(existing_records)
-    if (new_ip, line_name) not in production_record_set:
-        logger.warning("生产记录替换失败：新记录未成功写入，跳过删除旧记录: line=%s new_ip=%s old_ip=%s", line_name, new_ip, old_ip)
+    if not cf2alidns.update_record_value(config.domain_root, old_record, new_ip):
+        logger.warning("生产记录替换失败：原地改写未成功，保留旧记录: line=%s new_ip=%s old_ip=%s", line_name, new_ip, old_ip)
         return False
 
-    cf2alidns.delete_record_by_value(config.domain_root, config.domain_rr, old_ip, line_name)
-    set_record_rotation_cooldown(state, config.domain_rr, line_name, old_ip, ROTATION_COOLDOWN_HOURS)
-    clear_record_state(state, config.domain_rr, line_name, old_ip)
+    set_record_rotation_cooldown(state, config.state_key, line_name, old_ip, ROTATION_COOLDOWN_HOURS)
+    clear_record_state(state, config.state_key, line_name, old_ip)
     logger.info("完成生产记录温和轮换: line=%s old_ip=%s new_ip=%s", line_name, old_ip, new_ip)
     return True
 
 
+def _expected_record_latency(config: RuntimeConfig, state: RuntimeState, line_name: str, ip_address: str) -> float | None:
+    """生产记录的预期延迟：优先用第二次测速近几轮 p50 的中位数，没有时退回第一次测速的 EWMA 均值；
+    线路即将进入高峰时再按该 IP 的高峰历史上调。"""
+    samples = get_record_latency_samples(state, config.state_key, line_name, ip_address)
+    stored_estimate = get_candidate_latency_estimate(state, line_name, ip_address)
+    if samples:
+        expected_latency = statistics.median(samples)
+    elif stored_estimate is not None:
+        expected_latency = LatencyEstimate.from_list(stored_estimate).mean
+    else:
+        return None
+    if _peak_outlook is not None:
+        return _peak_outlook.adjust_latency(ip_address, line_name, expected_latency)
+    return expected_latency
+
+
 def _rotate_aged_production_records(
     config: RuntimeConfig,
     state: RuntimeState,
     selected_ips_by_carrier: dict[str, list[str]],
     deleted_records: list[dict[str, str]],
     polluted_lines: set[str],
+    record_type: str = "A",
 ) -> None:
     prune_expired_runtime_state(state)
     now_timestamp = int(time.time())
     existing_records = _get_current_production_records(config)
-    production_record_set, records_by_line = _build_production_record_maps(existing_records)
+    production_record_set, records_by_line = _build_production_record_maps(existing_records, record_type)
     filtered_candidates = _filter_candidates_for_rotation(config, state, selected_ips_by_carrier, production_record_set)
     deleted_counts_by_line: dict[str, int] = {}
     for record in deleted_records:
@@ -304,155 +429,689 @@ def _rotate_aged_production_records(
     if remaining_total_budget <= 0:
         return
 
-    prioritized_lines = []
+    replacement_sampler = ThompsonCandidateSampler(state)
+    rotation_records: dict[str, list[RotationRecord]] = {}
+    candidate_latencies_by_line: dict[str, dict[str, float]] = {}
+    line_budgets: dict[str, int] = {}
     for line_name, line_records in records_by_line.items():
-        available_candidates = filtered_candidates.get(line_name, [])
-        if not available_candidates:
+        candidate_ips = filtered_candidates.get(line_name, [])
+        if not candidate_ips:
             continue
 
-        sorted_records = sorted(line_records, key=lambda record: _normalize_record_timestamp(record.get("CreateTimestamp")) or 0)
-        oldest_record = sorted_records[0] if sorted_records else None
-        if oldest_record is None:
-            continue
+        # 只有被变点检测判定为受污染的线路才给轮换加成，偶发的污染信号不触发换血。
+        pollution_score = get_line_pollution_score(state, line_name) if line_name in polluted_lines else 0.0
+        rotation_records[line_name] = [
+            RotationRecord(
+                line_name=line_name,
+                record=record,
+                expected_latency=_expected_record_latency(config, state, line_name, str(record.get("Value", ""))),
+                age_hours=_record_age_hours(record, now_timestamp),
+                pollution_score=pollution_score,
+            )
+            for record in line_records
+        ]
+        # 候选的预期延迟取自 Thompson 后验抽样，轮换在择优的同时保留对少测 IP 的探索。
+        candidate_latencies_by_line[line_name] = {
+            ip_address: _peak_outlook.adjust_latency(ip_address, line_name, latency) if _peak_outlook is not None else latency
+            for ip_address, latency in replacement_sampler.draw_latencies(line_name, candidate_ips).items()
+        }
+        line_budgets[line_name] = max(MAX_REPLACE_PER_LINE_PER_CYCLE - deleted_counts_by_line.get(line_name, 0), 0)
+
+    planned_swaps = plan_rotation_swaps(rotation_records, candidate_latencies_by_line, line_budgets, remaining_total_budget)
+    for swap in planned_swaps:
+        logger.info(
+            "轮换规划: line=%s old_ip=%s new_ip=%s expected_gain=%.3fs",
+            swap.line_name,
+            swap.old_ip,
+            swap.new_ip,
+            swap.gain_seconds,
+        )
+        replacement_sampler.note_decision(swap.line_name, filtered_candidates[swap.line_name], [swap.new_ip])
+        if _replace_production_record(config, state, swap.line_name, swap.record, swap.new_ip):
+            production_record_set.discard((swap.old_ip, swap.line_name))
+            production_record_set.add((swap.new_ip, swap.line_name))
+    replacement_sampler.log_summary("rotation")
 
-        oldest_age_hours = _record_age_hours(oldest_record, now_timestamp)
-        pollution_score = get_line_pollution_score(state, line_name)
-        eligible = oldest_age_hours >= ROTATION_HARD_AGE_HOURS or (pollution_score > 0 and oldest_age_hours >= ROTATION_SOFT_AGE_HOURS)
-        if not eligible:
-            continue
 
-        prioritized_lines.append(
-            {
-                "line": line_name,
-                "oldest_record": oldest_record,
-                "oldest_age_hours": oldest_age_hours,
-                "pollution_score": pollution_score,
-                "is_polluted": line_name in polluted_lines,
-            }
-        )
+def _rebalance_production_weights(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    summary: ValidationSummary,
+    record_type: str = "A",
+) -> None:
+    if not config.weighted_round_robin:
+        return
 
-    prioritized_lines.sort(
-        key=lambda item: (
-            item["oldest_age_hours"] >= ROTATION_HARD_AGE_HOURS,
-            item["is_polluted"],
-            item["pollution_score"],
-            item["oldest_age_hours"],
-        ),
-        reverse=True,
+    production_record_set, _ = _build_production_record_maps(_get_current_production_records(config), record_type)
+    latency_by_record = {
+        (ip_address, line_name): get_record_latency_samples(state, config.state_key, line_name, ip_address)
+        for ip_address, line_name in production_record_set
+    }
+    anomalous_records = _attribute_to_production_lines(summary.anomalous_records, production_record_set)
+    weights_by_record = compute_record_weights(latency_by_record, anomalous_records)
+    updated_count = cf2alidns.apply_production_record_weights(
+        domain_rr=config.domain_rr,
+        domain_root=config.domain_root,
+        weights_by_record=weights_by_record,
+        hysteresis=DNS_WEIGHT_HYSTERESIS,
     )
+    logger.info("权重轮询更新完成: records=%s updated=%s", len(weights_by_record), updated_count)
 
-    for item in prioritized_lines:
-        if remaining_total_budget <= 0:
-            break
 
-        line_name = str(item["line"])
-        line_budget = max(MAX_REPLACE_PER_LINE_PER_CYCLE - deleted_counts_by_line.get(line_name, 0), 0)
-        if line_budget <= 0:
-            continue
+def _validated_record_sets(
+    summary: ValidationSummary,
+    production_record_set: set[tuple[str, str]],
+) -> tuple[set[tuple[str, str]], set[tuple[str, str]]]:
+    healthy_records = _attribute_to_production_lines(summary.healthy_records, production_record_set) & production_record_set
+    anomalous_records = _attribute_to_production_lines(summary.anomalous_records, production_record_set) & production_record_set
+    return healthy_records, anomalous_records - healthy_records
 
-        candidate_ips = filtered_candidates.get(line_name, [])
-        if not candidate_ips:
-            continue
 
-        if _replace_production_record(config, state, line_name, item["oldest_record"], candidate_ips[0]):
-            deleted_counts_by_line[line_name] = deleted_counts_by_line.get(line_name, 0) + 1
-            remaining_total_budget -= 1
+def _save_last_good_snapshot(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    summary: ValidationSummary,
+    production_record_set: set[tuple[str, str]],
+    record_type: str,
+) -> None:
+    """本轮验证通过时，把验证时在线且未异常的生产记录存为已知良好快照。"""
+    _, anomalous_records = _validated_record_sets(summary, production_record_set)
+    if not production_record_set or len(anomalous_records) > len(production_record_set) * LAST_GOOD_SNAPSHOT_MAX_ANOMALY_RATIO:
+        return
+    save_production_snapshot(state, config.state_key, record_type, production_record_set - anomalous_records)
 
 
-def run_single_cycle(config: RuntimeConfig, state: RuntimeState) -> None:
-    logger.info("@@@@@ 开始一次完整的 IP 筛选与更新任务 @@@@@")
+def _rollback_recent_changes(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    summary: ValidationSummary,
+    record_type: str,
+    capacity: ZoneCapacity | None = None,
+) -> bool:
+    """冻结时若异常全部落在快照之后上线的记录上、而快照里的旧记录仍有健康观测，则一次性回滚到已知良好快照。"""
+    snapshot_records = get_production_snapshot(state, config.state_key, record_type, LAST_GOOD_SNAPSHOT_MAX_AGE_HOURS)
+    if not snapshot_records:
+        return False
 
-    logger.info("步骤1：开始从所有来源获取 IP...")
-    ct_ip, cm_ip, cu_ip = getIPFromW3.get_cf_ips()
-    logger.info("IP 获取完成。移动: %s, 联通: %s, 电信: %s", len(cm_ip), len(cu_ip), len(ct_ip))
+    production_record_set, _ = _build_production_record_maps(_get_current_production_records(config), record_type)
+    recent_records = production_record_set - snapshot_records
+    healthy_records, anomalous_records = _validated_record_sets(summary, production_record_set)
+    if not anomalous_records or not anomalous_records <= recent_records or not healthy_records & snapshot_records:
+        return False
 
-    logger.info("步骤2：更新临时域名并进行第一次测速: %s.%s", config.temp_subdomain, config.domain_root)
-    initial_ips_dict = {
-        "mobile": cm_ip,
-        "unicom": cu_ip,
-        "telecom": ct_ip,
-    }
-    cf2alidns.sync_aliyun_dns_records_exact(
-        domain_rr=config.temp_subdomain,
+    logger.warning(
+        "异常集中在最近变更的记录上，回滚到已知良好快照: %s.%s type=%s anomalous=%s",
+        config.domain_rr,
+        config.domain_root,
+        record_type,
+        sorted(anomalous_records),
+    )
+    removed_records, restored_records = cf2alidns.restore_production_snapshot(
+        domain_rr=config.domain_rr,
         domain_root=config.domain_root,
-        ips_by_carrier=initial_ips_dict,
+        snapshot_records=snapshot_records,
+        record_type=record_type,
+        capacity=capacity,
     )
+    for ip_address, line_name in removed_records:
+        set_record_rotation_cooldown(state, config.state_key, line_name, ip_address, ROTATION_COOLDOWN_HOURS)
+        clear_record_state(state, config.state_key, line_name, ip_address)
+
+    # 只有移除与恢复的记录和快照差异完全一致才算回滚完成；否则保留快照，下一轮冻结时继续回滚。
+    snapshot_lines = {line_name for _, line_name in snapshot_records}
+    expected_removed = {record for record in recent_records if record[1] in snapshot_lines}
+    expected_restored = snapshot_records - production_record_set
+    if set(removed_records) != expected_removed or set(restored_records) != expected_restored:
+        logger.warning(
+            "快照回滚未完成，保留快照待下一轮重试: removed=%s/%s restored=%s/%s",
+            len(removed_records),
+            len(expected_removed),
+            len(restored_records),
+            len(expected_restored),
+        )
+        return False
+
+    mark_production_snapshot_rolled_back(state, config.state_key, record_type)
+    logger.info("快照回滚完成: removed=%s restored=%s", len(removed_records), len(restored_records))
+    return True
+
+
+def _record_measurements(
+    config: RuntimeConfig,
+    json_string: str,
+    phase: int,
+    oversea_lines: list[str],
+    state: RuntimeState | None = None,
+) -> None:
+    """记录本次测速的逐检测点观测。
+
+    第一次测速的结果更新候选 IP 的 EWMA 延迟评分；第二次测速的结果按同伴共识更新检测点可靠度。
+    """
+    observations = extract_probe_observations(
+        json_string,
+        validation=phase == PHASE_VALIDATION,
+        fine_grained_lines=config.fine_grained_lines,
+        oversea_lines=oversea_lines,
+        include_unresolved=True,
+    )
+    resolved_observations = [observation for observation in observations if observation.ip_address]
+    if state is not None and phase == PHASE_FIRST_PASS:
+        update_candidate_latency_scores(state, resolved_observations)
+    if state is not None and phase == PHASE_VALIDATION:
+        update_node_reliability(state, observations)
+    if _measurement_store is not None:
+        _measurement_store.append_observations(resolved_observations, phase)
+
+
+def _refresh_peak_outlook() -> None:
+    """每轮开始时根据测量历史预测即将到来的高峰，供筛选与轮换提前规避高峰表现差的 IP。"""
+    global _peak_outlook
+
+    if _measurement_store is None:
+        return
+    _peak_outlook = build_peak_outlook(_measurement_store)
+    log_peak_outlook(_peak_outlook)
 
-    json_temp = run_itdog_test(target_host=f"{config.temp_subdomain}.{config.domain_root}", custom_dns=config.custom_dns)
-    if not json_temp:
-        logger.error("第一次 IT-Dog 测速失败，程序中止。")
+
+def _compact_measurement_store() -> None:
+    """滚动汇总过期的原始观测，并输出近 24 小时各线路的测量概况。"""
+    if _measurement_store is None:
         return
+    _measurement_store.compact()
+    for line_name, stats in sorted(_measurement_store.summarize_by_line(since=int(time.time()) - 86400).items()):
+        mean_total_time = stats.mean_total_time
+        logger.info(
+            "近 24 小时测量概况: line=%s samples=%s pass_rate=%.2f mean_total_time=%s",
+            line_name,
+            stats.samples,
+            stats.pass_rate,
+            f"{mean_total_time:.3f}s" if mean_total_time is not None else "-",
+        )
+
+
+def _load_stage(checkpoint: StageCheckpoint | None, stage: str):
+    if checkpoint is None:
+        return None
+    return checkpoint.get(stage)
+
+
+def _save_stage(checkpoint: StageCheckpoint | None, stage: str, payload) -> None:
+    if checkpoint is not None:
+        checkpoint.put(stage, payload)
+
+
+def _target_stage_suffix(config: RuntimeConfig, record_type: str) -> str:
+    return f"{record_type}:{config.domain_rr}.{config.domain_root}"
+
+
+def _plan_zone_capacity(
+    config: RuntimeConfig,
+    record_type: str,
+    initial_ips_dict: dict[str, list[str]],
+) -> dict[str, ZoneCapacity]:
+    """按 zone 统计线路槽位，为 temp 候选池与每个生产目标的下限预留额度，新增计划据此提前裁剪。"""
+    floor_count = PRODUCTION_RECORD_LIMITS_BY_TYPE[record_type][0]
+    production_lines = [*initial_ips_dict, *config.fine_grained_lines]
+    capacity_by_zone: dict[str, ZoneCapacity] = {}
+    for target_config in config.target_configs():
+        if target_config.domain_root not in capacity_by_zone:
+            capacity = cf2alidns.load_zone_capacity(target_config.domain_root)
+            if capacity is None:
+                continue
+            capacity_by_zone[target_config.domain_root] = capacity
+        for line_name in production_lines:
+            capacity_by_zone[target_config.domain_root].reserve(target_config.domain_rr, line_name, floor_count)
+
+    temp_capacity = capacity_by_zone.get(config.domain_root)
+    if temp_capacity is not None:
+        for line_name, ip_list in initial_ips_dict.items():
+            temp_capacity.reserve(config.temp_subdomain, line_name, len(ip_list))
+    return capacity_by_zone
+
+
+def _run_first_pass(
+    config: RuntimeConfig,
+    record_type: str,
+    initial_ips_dict: dict[str, list[str]],
+    oversea_lines: list[str],
+    capacity: ZoneCapacity | None = None,
+    checkpoint: StageCheckpoint | None = None,
+    state: RuntimeState | None = None,
+) -> dict[str, list[str]] | None:
+    """步骤2-3：temp 同步与第一次测速，所有生产目标共用同一份筛选结果。"""
+    selected_ips_by_carrier = _load_stage(checkpoint, f"selection:{record_type}")
+    if selected_ips_by_carrier is not None:
+        log_selected_ips(selected_ips_by_carrier)
+        return selected_ips_by_carrier
+
+    json_temp = _load_stage(checkpoint, f"first_pass:{record_type}")
+    if json_temp is None:
+        logger.info("步骤2：更新临时域名并进行第一次测速: %s.%s type=%s", config.temp_subdomain, config.domain_root, record_type)
+        cf2alidns.sync_aliyun_dns_records_exact(
+            domain_rr=config.temp_subdomain,
+            domain_root=config.domain_root,
+            ips_by_carrier=initial_ips_dict,
+            record_type=record_type,
+            capacity=capacity,
+        )
+
+        json_temp = run_itdog_test(
+            target_host=f"{config.temp_subdomain}.{config.domain_root}",
+            custom_dns=config.custom_dns,
+            record_type=record_type,
+        )
+        if not json_temp:
+            logger.error("第一次 IT-Dog 测速失败，本地址族中止: type=%s", record_type)
+            return None
+        _record_measurements(config, json_temp, PHASE_FIRST_PASS, oversea_lines, state)
+        _save_stage(checkpoint, f"first_pass:{record_type}", json_temp)
 
     logger.info("步骤3：第一次测速完成，开始筛选优质 IP...")
-    selected_ips_by_carrier = filter_and_select_ips(json_temp)
+    latency_scores = None
+    if state is not None:
+        candidate_ips = {ip_address for ip_list in initial_ips_dict.values() for ip_address in ip_list}
+        candidate_lines = [*initial_ips_dict, *config.fine_grained_lines]
+        latency_scores = get_candidate_latency_scores(
+            state,
+            [(ip_address, line_name) for ip_address in candidate_ips for line_name in candidate_lines],
+        )
+        if _peak_outlook is not None:
+            latency_scores = _peak_outlook.adjust_scores(latency_scores)
+    selected_ips_by_carrier = filter_and_select_ips(
+        json_temp,
+        fine_grained_lines=config.fine_grained_lines,
+        oversea_lines=oversea_lines,
+        latency_scores=latency_scores,
+        node_weights=get_node_weights(state) if state is not None else None,
+    )
     if not any(selected_ips_by_carrier.values()):
-        logger.warning("未能从第一次测速结果中筛选出任何符合条件的 IP，程序中止。")
-        return
+        logger.warning("未能从第一次测速结果中筛选出任何符合条件的 IP，本地址族中止: type=%s", record_type)
+        return None
 
     log_selected_ips(selected_ips_by_carrier)
-    selected_ips_for_production = _filter_candidates_by_cooldown(config, state, selected_ips_by_carrier)
+    if state is not None:
+        for line_name, ip_list in selected_ips_by_carrier.items():
+            for ip_address in ip_list:
+                mark_standby_first_pass(state, line_name, ip_address)
+    _save_stage(checkpoint, f"selection:{record_type}", selected_ips_by_carrier)
+    return selected_ips_by_carrier
 
-    logger.info("步骤4：更新生产域名: %s.%s", config.domain_rr, config.domain_root)
-    cf2alidns.ensure_production_dns_records(
-        domain_rr=config.domain_rr,
-        domain_root=config.domain_root,
-        ips_by_carrier=selected_ips_for_production,
-        floor_count=PRODUCTION_RECORD_FLOOR,
-        target_count=PRODUCTION_RECORD_TARGET,
-        ceiling_count=PRODUCTION_RECORD_CEILING,
-    )
 
-    logger.info("步骤5：执行第二次测速并剔除不良记录...")
-    json_validate = run_itdog_test(target_host=f"{config.domain_rr}.{config.domain_root}", custom_dns=config.custom_dns)
-    if not json_validate:
-        logger.warning("第二次验证测速失败，无法执行剔除操作。")
-        return
+def _maintain_production_target(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    record_type: str,
+    selected_ips_by_carrier: dict[str, list[str]],
+    oversea_lines: list[str],
+    capacity: ZoneCapacity | None = None,
+    checkpoint: StageCheckpoint | None = None,
+) -> None:
+    """步骤4-5：对单个生产目标补足记录、第二次测速验证并维护生产池。"""
+    floor_count, target_count, ceiling_count = PRODUCTION_RECORD_LIMITS_BY_TYPE[record_type]
+    stage_suffix = _target_stage_suffix(config, record_type)
+    selected_ips_for_production = _load_stage(checkpoint, f"production_plan:{stage_suffix}")
+    if selected_ips_for_production is None:
+        selected_ips_for_production = _filter_candidates_by_cooldown(
+            config,
+            state,
+            _with_standby_candidates(state, selected_ips_by_carrier, record_type),
+        )
 
-    summary = summarize_validation_results(json_validate)
+        logger.info("步骤4：更新生产域名: %s.%s type=%s", config.domain_rr, config.domain_root, record_type)
+        cf2alidns.ensure_production_dns_records(
+            domain_rr=config.domain_rr,
+            domain_root=config.domain_root,
+            ips_by_carrier=selected_ips_for_production,
+            floor_count=floor_count,
+            target_count=target_count,
+            ceiling_count=ceiling_count,
+            record_type=record_type,
+            capacity=capacity,
+        )
+        _save_stage(checkpoint, f"production_plan:{stage_suffix}", selected_ips_for_production)
+
+    json_validate = _load_stage(checkpoint, f"validation:{stage_suffix}")
+    if json_validate is None:
+        logger.info("步骤5：执行第二次测速并剔除不良记录: %s.%s", config.domain_rr, config.domain_root)
+        json_validate = run_itdog_test(
+            target_host=f"{config.domain_rr}.{config.domain_root}",
+            custom_dns=config.custom_dns,
+            record_type=record_type,
+        )
+        if not json_validate:
+            logger.warning("第二次验证测速失败，无法执行剔除操作。")
+            return
+        _record_measurements(config, json_validate, PHASE_VALIDATION, oversea_lines, state)
+        _save_stage(checkpoint, f"validation:{stage_suffix}", json_validate)
+
+    summary = summarize_validation_results(
+        json_validate,
+        fine_grained_lines=config.fine_grained_lines,
+        oversea_lines=oversea_lines,
+        node_weights=get_node_weights(state),
+    )
     if summary is None:
         logger.warning("无法解析第二次测速结果，跳过状态更新与删除。")
         return
 
     if should_freeze_production_deletions(summary):
         logger.warning(
-            "检测到疑似全局异常，冻结本轮生产删除: total_points=%s healthy_points=%s anomalous_points=%s lines_seen=%s",
+            "检测到疑似全局异常，冻结本轮生产删除: type=%s total_points=%.1f healthy_points=%.1f anomalous_points=%.1f "
+            "excluded_points=%s lines_seen=%s",
+            record_type,
             summary.total_points,
             summary.healthy_points,
             summary.anomalous_points,
+            summary.excluded_points,
             sorted(summary.lines_seen),
         )
+        _rollback_recent_changes(config, state, summary, record_type, capacity)
         return
 
     if _should_freeze_for_source_healthcheck(config, has_anomalies=bool(summary.anomalous_records)):
+        _rollback_recent_changes(config, state, summary, record_type, capacity)
         return
 
     existing_production_records = _get_current_production_records(config)
-    production_record_set, _ = _build_production_record_maps(existing_production_records)
+    production_record_set, _ = _build_production_record_maps(existing_production_records, record_type)
+    _save_last_good_snapshot(config, state, summary, production_record_set, record_type)
     records_to_delete, polluted_lines = _apply_validation_state(config, state, summary, production_record_set)
     if not records_to_delete:
         logger.info("最终验证测试结果良好，没有需要删除的 DNS 记录。")
     else:
-        records_to_delete = _filter_deletions_by_floor(config, records_to_delete)
-        logger.info("共找到 %s 条达到删除阈值的 DNS 记录。", len(records_to_delete))
-        for record in records_to_delete:
+        # 先按下限保护裁剪，通过保护的记录优先用备用池原地替换，其余直接删除。
+        records_to_delete = _filter_deletions_by_floor(config, records_to_delete, record_type)
+        swapped_records = [
+            record
+            for record in records_to_delete
+            if _replace_with_standby(config, state, record, existing_production_records, production_record_set, record_type)
+        ]
+        records_to_delete = swapped_records + [record for record in records_to_delete if record not in swapped_records]
+        logger.info("共找到 %s 条达到删除阈值的 DNS 记录，其中 %s 条已由备用池替换。", len(records_to_delete), len(swapped_records))
+        for record in records_to_delete[len(swapped_records):]:
             logger.info("标记待删除记录: ip=%s line=%s", record["ip"], record["line"])
             cf2alidns.delete_record_by_value(
                 domain_name=config.domain_root,
                 rr=config.domain_rr,
                 value=record["ip"],
                 line=record["line"],
+                record_type=record_type,
+                capacity=capacity,
             )
-            clear_record_state(state, config.domain_rr, record["line"], record["ip"])
+            clear_record_state(state, config.state_key, record["line"], record["ip"])
+            discard_standby_entry(state, record["line"], record["ip"])
 
-    _rotate_aged_production_records(config, state, selected_ips_for_production, records_to_delete, polluted_lines)
-    _prune_surplus_production_records(config, state, selected_ips_for_production)
+    _rotate_aged_production_records(config, state, selected_ips_for_production, records_to_delete, polluted_lines, record_type)
+    _prune_surplus_production_records(config, state, selected_ips_for_production, record_type, capacity)
+    _rebalance_production_weights(config, state, summary, record_type)
 
+
+def _run_production_track(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    record_type: str,
+    initial_ips_dict: dict[str, list[str]],
+    checkpoint: StageCheckpoint | None = None,
+) -> None:
+    """对单一地址族（A 或 AAAA）执行一次 temp 同步与第一次测速，再依次维护每个生产目标。"""
+    oversea_lines = [line_name for line_name in config.oversea_lines if line_name in initial_ips_dict]
+    capacity_by_zone = _plan_zone_capacity(config, record_type, initial_ips_dict)
+    selected_ips_by_carrier = _run_first_pass(
+        config,
+        record_type,
+        initial_ips_dict,
+        oversea_lines,
+        capacity=capacity_by_zone.get(config.domain_root),
+        checkpoint=checkpoint,
+        state=state,
+    )
+    if selected_ips_by_carrier is None:
+        return
+
+    for target_config in config.target_configs():
+        done_stage = f"done:{_target_stage_suffix(target_config, record_type)}"
+        if _load_stage(checkpoint, done_stage):
+            logger.info("生产目标本轮已处理完毕，跳过: %s.%s type=%s", target_config.domain_rr, target_config.domain_root, record_type)
+            continue
+        try:
+            _maintain_production_target(
+                target_config,
+                state,
+                record_type,
+                selected_ips_by_carrier,
+                oversea_lines,
+                capacity=capacity_by_zone.get(target_config.domain_root),
+                checkpoint=checkpoint,
+            )
+            if checkpoint is not None:
+                # 先落盘运行态再记完成标记，重启后既不会重复累计异常，也不会丢失本目标的状态变化。
+                save_runtime_state(state)
+                checkpoint.put(done_stage, True)
+        except Exception as exc:
+            logger.error(
+                "生产目标维护失败，继续处理下一个目标: %s.%s type=%s error=%s",
+                target_config.domain_rr,
+                target_config.domain_root,
+                record_type,
+                exc,
+                exc_info=True,
+            )
+
+
+def _recover_pending_mutations(config: RuntimeConfig, state: RuntimeState) -> None:
+    """对账上次中断或结果未知的 DNS 变更；已生效的生产删除/改写同步清理对应运行态。"""
+    applied_entries = cf2alidns.reconcile_pending_mutations()
+    state_keys = {(target.domain_root, target.domain_rr): target.state_key for target in config.target_configs()}
+    for entry in applied_entries:
+        state_key = state_keys.get((entry.get("domain"), entry.get("rr")))
+        if state_key is None:
+            continue
+
+        line_name = str(entry.get("line", "")).lower()
+        if entry.get("op") == "delete":
+            clear_record_state(state, state_key, line_name, str(entry.get("value", "")))
+        elif entry.get("op") == "update" and entry.get("old_value"):
+            set_record_rotation_cooldown(state, state_key, line_name, str(entry["old_value"]), ROTATION_COOLDOWN_HOURS)
+            clear_record_state(state, state_key, line_name, str(entry["old_value"]))
+
+
+def _compact_runtime_state(config: RuntimeConfig, state: RuntimeState) -> None:
+    """丢弃 zone 中已不存在的记录及不再管理的 RR 的运行态，再按 TTL/数量上限淘汰最久未访问的键。"""
+    live_records_by_scope: dict[str, set[tuple[str, str]] | None] = {}
+    for target_config in config.target_configs():
+        records = _try_get_current_production_records(target_config)
+        if records is None:
+            logger.warning("获取 zone 快照失败，跳过该目标的运行态压缩: %s.%s", target_config.domain_rr, target_config.domain_root)
+            live_records_by_scope[target_config.state_key] = None
+            continue
+        live_records_by_scope[target_config.state_key] = {
+            (str(record.get("Value", "")), str(record.get("Line", "")).lower()) for record in records
+        }
+
+    compact_record_state(state, live_records_by_scope)
+    evict_stale_runtime_state(state, config.state_entry_ttl_hours, config.state_max_entries_per_map)
+
+
+def _is_record_type_address(ip_address: str, record_type: str) -> bool:
+    return (":" in ip_address) == (record_type == "AAAA")
+
+
+def _fresh_standby_ips(state: RuntimeState, line_name: str, record_type: str) -> list[str]:
+    return [
+        ip_address
+        for ip_address in get_standby_ips(state, line_name, STANDBY_FIRST_PASS_MAX_AGE_HOURS, STANDBY_VALIDATION_MAX_AGE_HOURS)
+        if _is_record_type_address(ip_address, record_type)
+    ][:STANDBY_POOL_SIZE_PER_LINE]
+
+
+def _with_standby_candidates(
+    state: RuntimeState,
+    selected_ips_by_carrier: dict[str, list[str]],
+    record_type: str = "A",
+) -> dict[str, list[str]]:
+    """在本轮筛选结果之后追加备用池 IP；本轮第一次测速偏少的线路也能补足与轮换。"""
+    merged = {}
+    for line_name, ip_list in selected_ips_by_carrier.items():
+        standby_ips = [ip_address for ip_address in _fresh_standby_ips(state, line_name, record_type) if ip_address not in ip_list]
+        merged[line_name] = [*ip_list, *standby_ips]
+    return merged
+
+
+def _replace_with_standby(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    record: dict[str, str],
+    existing_records: list[dict[str, object]],
+    production_record_set: set[tuple[str, str]],
+    record_type: str = "A",
+) -> bool:
+    """用备用池中两次测速都在有效期内通过的 IP 原地替换待删除记录，不再等待下一轮筛选与验证。"""
+    line_name, old_ip = record["line"], record["ip"]
+    old_record = next(
+        (
+            existing_record
+            for existing_record in existing_records
+            if existing_record.get("Type") == record_type
+            and str(existing_record.get("Line", "")).lower() == line_name
+            and str(existing_record.get("Value", "")) == old_ip
+        ),
+        None,
+    )
+    if old_record is None:
+        return False
+
+    for new_ip in _fresh_standby_ips(state, line_name, record_type):
+        if (new_ip, line_name) in production_record_set or is_record_in_rotation_cooldown(state, config.state_key, line_name, new_ip):
+            continue
+        if not cf2alidns.update_record_value(config.domain_root, old_record, new_ip):
+            logger.warning("备用池替换失败，改为删除异常记录: line=%s old_ip=%s new_ip=%s", line_name, old_ip, new_ip)
+            return False
+        clear_record_state(state, config.state_key, line_name, old_ip)
+        discard_standby_entry(state, line_name, old_ip)
+        production_record_set.discard((old_ip, line_name))
+        production_record_set.add((new_ip, line_name))
+        logger.info("用备用池 IP 立即替换异常记录: line=%s old_ip=%s new_ip=%s", line_name, old_ip, new_ip)
+        return True
+    return False
+
+
+def _add_standby_reprobes(
+    config: RuntimeConfig,
+    state: RuntimeState,
+    initial_ips_dict: dict[str, list[str]],
+    record_type: str = "A",
+) -> dict[str, list[str]]:
+    """把备用池中不在生产池的 IP 放进本轮 temp 候选一起做第一次测速，备用池随每轮测速持续刷新。"""
+    production_records: set[tuple[str, str]] = set()
+    for target_config in config.target_configs():
+        records = _try_get_current_production_records(target_config)
+        if records is None:
+            logger.warning("获取生产记录失败，备用池复测不排除该目标: %s.%s", target_config.domain_rr, target_config.domain_root)
+            continue
+        production_records |= _build_production_record_maps(records, record_type)[0]
+
+    reprobe_ips_by_line: dict[str, list[str]] = {}
+    for line_name in [*initial_ips_dict, *config.fine_grained_lines]:
+        temp_line = line_name if line_name in initial_ips_dict else get_parent_line(line_name)
+        if temp_line not in initial_ips_dict:
+            continue
+        reprobe_ips = reprobe_ips_by_line.setdefault(temp_line, [])
+        for ip_address in get_standby_ips(state, line_name, math.inf, STANDBY_VALIDATION_MAX_AGE_HOURS):
+            if (
+                _is_record_type_address(ip_address, record_type)
+                and (ip_address, line_name) not in production_records
+                and ip_address not in reprobe_ips
+            ):
+                reprobe_ips.append(ip_address)
+
+    merged = {}
+    for line_name, ip_list in initial_ips_dict.items():
+        reprobe_ips = reprobe_ips_by_line.get(line_name, [])[:STANDBY_POOL_SIZE_PER_LINE]
+        limit = max(len(ip_list), MAX_CANDIDATE_IPS_PER_CARRIER)
+        other_ips = [ip_address for ip_address in ip_list if ip_address not in reprobe_ips]
+        merged[line_name] = [*reprobe_ips, *other_ips[: max(limit - len(reprobe_ips), 0)]]
+        if reprobe_ips:
+            logger.info("备用池 IP 加入本轮第一次测速: line=%s ips=%s", line_name, reprobe_ips)
+    return merged
+
+
+def _maintain_standby_pool(state: RuntimeState) -> None:
+    """清理第二次测速已过期的备用池条目，并输出各线路当前可立即使用的备用 IP 数。"""
+    prune_standby_pool(state, STANDBY_VALIDATION_MAX_AGE_HOURS)
+    line_names = sorted({candidate_key.partition("|")[0] for candidate_key in state.line_standby_pool})
+    if not line_names:
+        return
+    logger.info(
+        "备用池概况（两次测速均在有效期内的 IP 数）: %s",
+        {
+            line_name: len(get_standby_ips(state, line_name, STANDBY_FIRST_PASS_MAX_AGE_HOURS, STANDBY_VALIDATION_MAX_AGE_HOURS))
+            for line_name in line_names
+        },
+    )
+
+
+def _fetch_ipv4_candidates(config: RuntimeConfig, state: RuntimeState | None = None) -> dict[str, list[str]]:
+    logger.info("步骤1：开始从所有来源获取 IP...")
+    sampler = ThompsonCandidateSampler(state) if state is not None else None
+    ct_ip, cm_ip, cu_ip = getIPFromW3.get_cf_ips(sampler=sampler)
+    if sampler is not None:
+        sampler.log_summary("temp")
+    logger.info("IP 获取完成。移动: %s, 联通: %s, 电信: %s", len(cm_ip), len(cu_ip), len(ct_ip))
+    initial_ips_dict = {"mobile": cm_ip, "unicom": cu_ip, "telecom": ct_ip}
+    if config.oversea_lines:
+        # 海外线路随 A 轨道一起写入 temp，由同一轮 IT-Dog 的境外检测点测量，不额外增加测速次数。
+        oversea_ips = getIPFromW3.get_oversea_cf_ips()
+        if oversea_ips:
+            initial_ips_dict.update({line_name: oversea_ips for line_name in config.oversea_lines})
+        else:
+            logger.warning("未获取到任何海外候选，本轮跳过海外线路维护。")
+    return initial_ips_dict
+
+
+def _fetch_ipv6_candidates(state: RuntimeState | None = None) -> dict[str, list[str]]:
+    logger.info("步骤1（IPv6）：开始获取 IPv6 候选...")
+    sampler = ThompsonCandidateSampler(state) if state is not None else None
+    ct_ipv6, cm_ipv6, cu_ipv6 = getIPFromW3.get_cf_ipv6s(sampler=sampler)
+    if sampler is not None:
+        sampler.log_summary("temp_v6")
+    return {"mobile": cm_ipv6, "unicom": cu_ipv6, "telecom": ct_ipv6}
+
+
+def run_single_cycle(config: RuntimeConfig, state: RuntimeState, checkpoint: StageCheckpoint | None = None) -> None:
+    logger.info("@@@@@ 开始一次完整的 IP 筛选与更新任务 @@@@@")
+    _recover_pending_mutations(config, state)
+    _refresh_peak_outlook()
+
+    initial_ips_dict = _load_stage(checkpoint, "candidates:A")
+    if initial_ips_dict is None:
+        initial_ips_dict = _add_standby_reprobes(config, state, _fetch_ipv4_candidates(config, state), "A")
+        _save_stage(checkpoint, "candidates:A", initial_ips_dict)
+    _run_production_track(config, state, "A", initial_ips_dict, checkpoint=checkpoint)
+
+    if config.ipv6_enabled:
+        initial_ipv6_dict = _load_stage(checkpoint, "candidates:AAAA")
+        if initial_ipv6_dict is None:
+            initial_ipv6_dict = _add_standby_reprobes(config, state, _fetch_ipv6_candidates(state), "AAAA")
+            _save_stage(checkpoint, "candidates:AAAA", initial_ipv6_dict)
+        if any(initial_ipv6_dict.values()):
+            _run_production_track(config, state, "AAAA", initial_ipv6_dict, checkpoint=checkpoint)
+        else:
+            logger.warning("未获取到任何 IPv6 候选，跳过 AAAA 维护。")
+
+    log_node_weights(state)
+    _maintain_standby_pool(state)
+    _compact_runtime_state(config, state)
     save_runtime_state(state)
+    _compact_measurement_store()
+    if checkpoint is not None:
+        checkpoint.clear()
 
     logger.info("@@@@@ 本次任务全部执行完毕 @@@@@")
 
 
 def main() -> int:
+    global _measurement_store
+
     configure_logging(format_string="%(asctime)s - %(levelname)s - [Main] - %(message)s")
 
     try:
@@ -469,11 +1128,15 @@ def main() -> int:
         logger.error("检测到已有实例正在运行，本次启动将退出。")
         return 1
 
+    cf2alidns.set_mutation_journal(MutationJournal())
+    stage_checkpoint = StageCheckpoint(fingerprint=config_fingerprint(runtime_config))
+    _measurement_store = MeasurementStore()
+
     try:
         try:
             while True:
                 try:
-                    run_single_cycle(runtime_config, runtime_state)
+                    run_single_cycle(runtime_config, runtime_state, stage_checkpoint)
                 except Exception as exc:
                     logger.error("任务执行周期中发生错误: %s", exc, exc_info=True)
                     save_runtime_state(runtime_state)
@@ -485,6 +1148,7 @@ def main() -> int:
             return 0
     finally:
         save_runtime_state(runtime_state)
+        cf2alidns.close_client()
         instance_lock.release()
 
 
@@ -0,0 +1,515 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from .project_config import REPO_ROOT
+from .project_constants import (
+    MEASUREMENT_HOURLY_RETENTION_DAYS,
+    MEASUREMENT_PROFILE_UTC_OFFSET_HOURS,
+    MEASUREMENT_RAW_RETENTION_HOURS,
+    MEASUREMENT_STORE_DIRNAME,
+)
+from .workflow_rules import ProbeObservation
+
+
+logger = logging.getLogger(__name__)
+MEASUREMENT_STORE_PATH = REPO_ROOT / MEASUREMENT_STORE_DIRNAME
+
+PHASE_FIRST_PASS = 1
+PHASE_VALIDATION = 2
+
+RAW_COLUMNS = {
+    "timestamp": "I",
+    "ip": "I",
+    "line": "H",
+    "node": "H",
+    "status": "H",
+    "phase": "B",
+    "total_time": "f",
+    "passed": "B",
+}
+HOURLY_COLUMNS = {
+    "hour": "I",
+    "ip": "I",
+    "line": "H",
+    "phase": "B",
+    "samples": "I",
+    "passes": "I",
+    "timed_samples": "I",
+    "total_time_sum": "d",
+}
+DICTIONARY_NAMES = ("ip", "line", "node", "status")
+
+
+def hour_of_week(timestamp: int, utc_offset_hours: int = MEASUREMENT_PROFILE_UTC_OFFSET_HOURS) -> int:
+    """本地时间的周内小时：周一 0 点为 0，周日 23 点为 167。"""
+    local_hours = (timestamp + utc_offset_hours * 3600) // 3600
+    # Unix 纪元（1970-01-01）是周四，平移 3 天后对齐到周一。
+    return (local_hours + 3 * 24) % (7 * 24)
+
+
+@dataclass
+class MeasurementStats:
+    samples: int = 0
+    passes: int = 0
+    timed_samples: int = 0
+    total_time_sum: float = 0.0
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passes / self.samples if self.samples else 0.0
+
+    @property
+    def mean_total_time(self) -> float | None:
+        return self.total_time_sum / self.timed_samples if self.timed_samples else None
+
+    def add(self, samples: int, passes: int, timed_samples: int, total_time_sum: float) -> None:
+        self.samples += samples
+        self.passes += passes
+        self.timed_samples += timed_samples
+        self.total_time_sum += total_time_sum
+
+
+@dataclass(frozen=True)
+class MeasurementRow:
+    timestamp: int
+    ip_address: str
+    line_name: str
+    detection_point: str
+    status: str
+    phase: int
+    total_time_seconds: float | None
+    passed: bool
+
+
+class MeasurementStore:
+    """逐检测点观测的列式追加存储：每列一个定长数组文件，查询时内存映射按列扫描。
+
+    超过 raw_retention_hours 的原始行按 (小时, ip, 线路, 阶段) 滚动汇总为小时聚合，小时聚合保留
+    hourly_retention_days 天。字符串字典与列文件同属一个数据代目录；压缩时只保留仍被引用的字典项并重排编码，
+    写入新的数据代目录后再原子切换 CURRENT，中途退出不会出现列错位或无法解码的编码。
+    """
+
+    def __init__(
+        self,
+        path: Path = MEASUREMENT_STORE_PATH,
+        raw_retention_hours: int = MEASUREMENT_RAW_RETENTION_HOURS,
+        hourly_retention_days: int = MEASUREMENT_HOURLY_RETENTION_DAYS,
+    ):
+        self.path = path
+        self.raw_retention_hours = raw_retention_hours
+        self.hourly_retention_days = hourly_retention_days
+        self._lock = threading.Lock()
+        self._dictionaries: dict[str, list[str]] = {name: [] for name in DICTIONARY_NAMES}
+        self._codes: dict[str, dict[str, int]] = {name: {} for name in DICTIONARY_NAMES}
+        self._generation = 0
+        self._load()
+
+    @property
+    def _data_dir(self) -> Path:
+        return self.path / f"gen-{self._generation}"
+
+    def _column_path(self, table: str, column: str, data_dir: Path | None = None) -> Path:
+        return (data_dir or self._data_dir) / f"{table}.{column}.col"
+
+    def _load(self) -> None:
+        try:
+            self._generation = int((self.path / "CURRENT").read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            self._generation = 0
+
+        try:
+            payload = json.loads((self._data_dir / "dictionary.json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            payload = {}
+        except Exception as exc:
+            # 字典损坏后已有编码无法解码，丢弃当前数据代从空存储开始。
+            logger.warning("读取测量字典失败，将从空存储开始: path=%s error=%s", self.path, exc)
+            payload = {}
+            shutil.rmtree(self._data_dir, ignore_errors=True)
+        for name in DICTIONARY_NAMES:
+            values = payload.get(name, []) if isinstance(payload, dict) else []
+            self._dictionaries[name] = [str(value) for value in values]
+            self._codes[name] = {value: code for code, value in enumerate(self._dictionaries[name])}
+
+        if self.path.exists():
+            for child in self.path.glob("gen-*"):
+                if child != self._data_dir:
+                    shutil.rmtree(child, ignore_errors=True)
+            self._repair_table("raw", RAW_COLUMNS)
+            self._repair_table("hourly", HOURLY_COLUMNS)
+            self._drop_undecodable_rows("raw", RAW_COLUMNS)
+            self._drop_undecodable_rows("hourly", HOURLY_COLUMNS)
+
+    def _row_count(self, table: str, column_types: dict[str, str]) -> int:
+        row_counts = []
+        for column, typecode in column_types.items():
+            column_path = self._column_path(table, column)
+            size = column_path.stat().st_size if column_path.exists() else 0
+            row_counts.append(size // array(typecode).itemsize)
+        return min(row_counts)
+
+    def _repair_table(self, table: str, column_types: dict[str, str]) -> None:
+        """追加中途退出时各列长度可能不一致，按最短列截断。"""
+        row_count = self._row_count(table, column_types)
+        for column, typecode in column_types.items():
+            column_path = self._column_path(table, column)
+            expected_size = row_count * array(typecode).itemsize
+            if column_path.exists() and column_path.stat().st_size != expected_size:
+                logger.warning("测量列长度不一致，截断到 %s 行: path=%s", row_count, column_path)
+                os.truncate(column_path, expected_size)
+
+    def _truncate_table(self, table: str, column_types: dict[str, str], row_count: int) -> None:
+        for column, typecode in column_types.items():
+            column_path = self._column_path(table, column)
+            expected_size = row_count * array(typecode).itemsize
+            if column_path.exists() and column_path.stat().st_size > expected_size:
+                os.truncate(column_path, expected_size)
+
+    def _drop_undecodable_rows(self, table: str, column_types: dict[str, str]) -> None:
+        """字典先于列落盘，无法解码的编码只会出现在表尾；从第一条无法解码的行起截断。"""
+        with self._mapped_table(table, column_types) as (row_count, columns):
+            first_bad_row = next(
+                (
+                    row
+                    for row in range(row_count)
+                    if any(
+                        columns[name][row] >= len(self._dictionaries[name])
+                        for name in DICTIONARY_NAMES
+                        if name in column_types
+                    )
+                ),
+                None,
+            )
+        if first_bad_row is not None:
+            logger.warning("测量列含字典中不存在的编码，截断到 %s 行: table=%s", first_bad_row, table)
+            self._truncate_table(table, column_types, first_bad_row)
+
+    def _encode(self, name: str, value: str) -> int:
+        code = self._codes[name].get(value)
+        if code is None:
+            code = len(self._dictionaries[name])
+            self._dictionaries[name].append(value)
+            self._codes[name][value] = code
+        return code
+
+    def _save_dictionaries(self, dictionaries: dict[str, list[str]] | None = None, data_dir: Path | None = None) -> None:
+        target_dir = data_dir or self._data_dir
+        temp_path = target_dir / "dictionary.json.tmp"
+        temp_path.write_text(json.dumps(dictionaries or self._dictionaries, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, target_dir / "dictionary.json")
+
+    def _append_columns(self, table: str, columns: dict[str, array], data_dir: Path | None = None) -> None:
+        for column, values in columns.items():
+            with self._column_path(table, column, data_dir).open("ab") as handle:
+                values.tofile(handle)
+
+    def append_observations(
+        self,
+        observations: list[ProbeObservation],
+        phase: int,
+        timestamp: int | None = None,
+    ) -> int:
+        if not observations:
+            return 0
+
+        observed_at = timestamp if timestamp is not None else int(time.time())
+        with self._lock:
+            dictionary_sizes = [len(self._dictionaries[name]) for name in DICTIONARY_NAMES]
+            columns = {column: array(typecode) for column, typecode in RAW_COLUMNS.items()}
+            for observation in observations:
+                columns["timestamp"].append(observed_at)
+                columns["ip"].append(self._encode("ip", observation.ip_address))
+                columns["line"].append(self._encode("line", observation.line_name))
+                columns["node"].append(self._encode("node", observation.detection_point))
+                columns["status"].append(self._encode("status", observation.status))
+                columns["phase"].append(phase)
+                total_time = observation.total_time_seconds
+                columns["total_time"].append(math.nan if total_time is None else total_time)
+                columns["passed"].append(1 if observation.passed else 0)
+
+            try:
+                self._data_dir.mkdir(parents=True, exist_ok=True)
+                # 先落盘字典再追加列，保证任何已写入的编码都能解码。
+                if dictionary_sizes != [len(self._dictionaries[name]) for name in DICTIONARY_NAMES]:
+                    self._save_dictionaries()
+                self._append_columns("raw", columns)
+            except OSError as exc:
+                logger.warning("写入测量数据失败: path=%s error=%s", self.path, exc)
+                return 0
+        return len(observations)
+
+    @contextmanager
+    def _mapped_table(self, table: str, column_types: dict[str, str]) -> Iterator[tuple[int, dict[str, memoryview]]]:
+        row_count = self._row_count(table, column_types)
+        with ExitStack() as stack:
+            views: dict[str, memoryview] = {}
+            for column, typecode in column_types.items():
+                if row_count == 0:
+                    views[column] = memoryview(array(typecode))
+                    continue
+                handle = stack.enter_context(self._column_path(table, column).open("rb"))
+                mapped = stack.enter_context(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+                raw_view = stack.enter_context(memoryview(mapped))
+                views[column] = stack.enter_context(raw_view.cast(typecode))
+            yield row_count, views
+
+    def _lookup_filters(self, ip_address: str | None, line_name: str | None) -> tuple[int | None, int | None] | None:
+        ip_code = self._codes["ip"].get(ip_address) if ip_address is not None else None
+        line_code = self._codes["line"].get(line_name.lower()) if line_name is not None else None
+        if (ip_address is not None and ip_code is None) or (line_name is not None and line_code is None):
+            return None
+        return ip_code, line_code
+
+    def iter_observations(
+        self,
+        since: int | None = None,
+        ip_address: str | None = None,
+        line_name: str | None = None,
+    ) -> list[MeasurementRow]:
+        """返回保留期内的原始观测；只解码命中过滤条件的行。"""
+        with self._lock:
+            filters = self._lookup_filters(ip_address, line_name)
+            if filters is None:
+                return []
+            ip_code, line_code = filters
+            rows = []
+            with self._mapped_table("raw", RAW_COLUMNS) as (row_count, columns):
+                start_row = bisect_left(columns["timestamp"], since, 0, row_count) if since is not None else 0
+                for row in range(start_row, row_count):
+                    if ip_code is not None and columns["ip"][row] != ip_code:
+                        continue
+                    if line_code is not None and columns["line"][row] != line_code:
+                        continue
+                    total_time = columns["total_time"][row]
+                    rows.append(
+                        MeasurementRow(
+                            timestamp=columns["timestamp"][row],
+                            ip_address=self._dictionaries["ip"][columns["ip"][row]],
+                            line_name=self._dictionaries["line"][columns["line"][row]],
+                            detection_point=self._dictionaries["node"][columns["node"][row]],
+                            status=self._dictionaries["status"][columns["status"][row]],
+                            phase=columns["phase"][row],
+                            total_time_seconds=None if math.isnan(total_time) else round(total_time, 3),
+                            passed=bool(columns["passed"][row]),
+                        )
+                    )
+            return rows
+
+    def _collect_stats(
+        self,
+        since: int | None,
+        ip_address: str | None,
+        line_name: str | None,
+        phase: int | None,
+        bucket_of: Callable[[int], int],
+    ) -> dict[tuple[str, str], dict[int, MeasurementStats]]:
+        """按 (ip, line) 与 bucket_of(时间戳) 分桶汇总小时聚合与原始观测。"""
+        with self._lock:
+            filters = self._lookup_filters(ip_address, line_name)
+            if filters is None:
+                return {}
+            ip_code, line_code = filters
+            stats_by_code: dict[tuple[int, int], dict[int, MeasurementStats]] = {}
+
+            with self._mapped_table("hourly", HOURLY_COLUMNS) as (row_count, columns):
+                start_row = bisect_left(columns["hour"], since - 3599, 0, row_count) if since is not None else 0
+                for row in range(start_row, row_count):
+                    record_code = (columns["ip"][row], columns["line"][row])
+                    if (ip_code is not None and record_code[0] != ip_code) or (line_code is not None and record_code[1] != line_code):
+                        continue
+                    if phase is not None and columns["phase"][row] != phase:
+                        continue
+                    buckets = stats_by_code.setdefault(record_code, {})
+                    buckets.setdefault(bucket_of(columns["hour"][row]), MeasurementStats()).add(
+                        columns["samples"][row],
+                        columns["passes"][row],
+                        columns["timed_samples"][row],
+                        columns["total_time_sum"][row],
+                    )
+
+            with self._mapped_table("raw", RAW_COLUMNS) as (row_count, columns):
+                start_row = bisect_left(columns["timestamp"], since, 0, row_count) if since is not None else 0
+                for row in range(start_row, row_count):
+                    record_code = (columns["ip"][row], columns["line"][row])
+                    if (ip_code is not None and record_code[0] != ip_code) or (line_code is not None and record_code[1] != line_code):
+                        continue
+                    if phase is not None and columns["phase"][row] != phase:
+                        continue
+                    total_time = columns["total_time"][row]
+                    is_timed = not math.isnan(total_time)
+                    buckets = stats_by_code.setdefault(record_code, {})
+                    buckets.setdefault(bucket_of(columns["timestamp"][row]), MeasurementStats()).add(
+                        1,
+                        columns["passed"][row],
+                        1 if is_timed else 0,
+                        total_time if is_timed else 0.0,
+                    )
+
+            return {
+                (self._dictionaries["ip"][ip], self._dictionaries["line"][line]): buckets
+                for (ip, line), buckets in stats_by_code.items()
+            }
+
+    def query_stats(
+        self,
+        since: int | None = None,
+        ip_address: str | None = None,
+        line_name: str | None = None,
+        phase: int | None = None,
+    ) -> dict[tuple[str, str], MeasurementStats]:
+        """按 (ip, line) 汇总小时聚合与原始观测；早于原始保留期的部分以小时为粒度计入。"""
+        return {
+            record_key: buckets[0]
+            for record_key, buckets in self._collect_stats(since, ip_address, line_name, phase, lambda _: 0).items()
+        }
+
+    def query_hour_of_week_stats(
+        self,
+        since: int | None = None,
+        line_name: str | None = None,
+        phase: int | None = None,
+        utc_offset_hours: int = MEASUREMENT_PROFILE_UTC_OFFSET_HOURS,
+    ) -> dict[tuple[str, str], dict[int, MeasurementStats]]:
+        """按 (ip, line) 与本地时间的周内小时（周一 0 点为 0，共 168 桶）汇总观测。"""
+        return self._collect_stats(
+            since,
+            None,
+            line_name,
+            phase,
+            lambda timestamp: hour_of_week(timestamp, utc_offset_hours),
+        )
+
+    def summarize_by_line(self, since: int | None = None) -> dict[str, MeasurementStats]:
+        line_stats: dict[str, MeasurementStats] = {}
+        for (_, line_name), stats in self.query_stats(since=since).items():
+            line_stats.setdefault(line_name, MeasurementStats()).add(
+                stats.samples, stats.passes, stats.timed_samples, stats.total_time_sum
+            )
+        return line_stats
+
+    def compact(self, now_timestamp: int | None = None) -> int:
+        """把超过原始保留期的行滚动为小时聚合并清理过期聚合，返回被汇总的原始行数。"""
+        current_timestamp = now_timestamp if now_timestamp is not None else int(time.time())
+        raw_cutoff = (current_timestamp - self.raw_retention_hours * 3600) // 3600 * 3600
+        hourly_cutoff = current_timestamp - self.hourly_retention_days * 86400
+
+        with self._lock:
+            if not self._data_dir.exists():
+                return 0
+            aggregates: dict[tuple[int, int, int, int], list[float]] = {}
+            with self._mapped_table("raw", RAW_COLUMNS) as (raw_rows, columns):
+                raw_start = bisect_left(columns["timestamp"], raw_cutoff, 0, raw_rows)
+                for row in range(raw_start):
+                    hour = columns["timestamp"][row] // 3600 * 3600
+                    if hour < hourly_cutoff:
+                        continue
+                    total_time = columns["total_time"][row]
+                    is_timed = not math.isnan(total_time)
+                    aggregate = aggregates.setdefault(
+                        (hour, columns["ip"][row], columns["line"][row], columns["phase"][row]),
+                        [0, 0, 0, 0.0],
+                    )
+                    aggregate[0] += 1
+                    aggregate[1] += columns["passed"][row]
+                    aggregate[2] += 1 if is_timed else 0
+                    aggregate[3] += total_time if is_timed else 0.0
+            with self._mapped_table("hourly", HOURLY_COLUMNS) as (hourly_rows, columns):
+                hourly_start = bisect_left(columns["hour"], hourly_cutoff, 0, hourly_rows)
+
+            if raw_start == 0 and hourly_start == 0:
+                return 0
+            try:
+                self._write_next_generation(raw_start, hourly_start, aggregates)
+            except OSError as exc:
+                logger.warning("压缩测量数据失败: path=%s error=%s", self.path, exc)
+                return 0
+
+        logger.info(
+            "测量数据已压缩: rolled_rows=%s hourly_rows=%s expired_hourly_rows=%s",
+            raw_start,
+            len(aggregates),
+            hourly_start,
+        )
+        return raw_start
+
+    def _write_next_generation(
+        self,
+        raw_start: int,
+        hourly_start: int,
+        aggregates: dict[tuple[int, int, int, int], list[float]],
+    ) -> None:
+        previous_dir = self._data_dir
+        next_dir = self.path / f"gen-{self._generation + 1}"
+        shutil.rmtree(next_dir, ignore_errors=True)
+        next_dir.mkdir(parents=True)
+
+        # 读出保留行的编码列，只保留仍被引用的字典项，并按原顺序重新编号。
+        retained_tables = (("raw", RAW_COLUMNS, raw_start), ("hourly", HOURLY_COLUMNS, hourly_start))
+        code_columns = {
+            (table, name): self._read_column(table, name, column_types[name], start_row)
+            for table, column_types, start_row in retained_tables
+            for name in DICTIONARY_NAMES
+            if name in column_types
+        }
+        used_codes: dict[str, set[int]] = {name: set() for name in DICTIONARY_NAMES}
+        for (_, name), values in code_columns.items():
+            used_codes[name].update(values)
+        for _, ip_code, line_code, _ in aggregates:
+            used_codes["ip"].add(ip_code)
+            used_codes["line"].add(line_code)
+        code_maps = {name: {code: index for index, code in enumerate(sorted(codes))} for name, codes in used_codes.items()}
+        dictionaries = {name: [self._dictionaries[name][code] for code in sorted(codes)] for name, codes in used_codes.items()}
+
+        for table, column_types, start_row in retained_tables:
+            for column, typecode in column_types.items():
+                if (table, column) in code_columns:
+                    remapped = array(typecode, (code_maps[column][code] for code in code_columns[(table, column)]))
+                    self._append_columns(table, {column: remapped}, next_dir)
+                    continue
+                source_path = self._column_path(table, column)
+                with self._column_path(table, column, next_dir).open("wb") as target:
+                    if source_path.exists():
+                        with source_path.open("rb") as source:
+                            source.seek(start_row * array(typecode).itemsize)
+                            shutil.copyfileobj(source, target)
+
+        hourly_columns = {column: array(typecode) for column, typecode in HOURLY_COLUMNS.items()}
+        for (hour, ip_code, line_code, phase), (samples, passes, timed_samples, total_time_sum) in sorted(aggregates.items()):
+            for column, value in zip(
+                HOURLY_COLUMNS,
+                (hour, code_maps["ip"][ip_code], code_maps["line"][line_code], phase, samples, passes, timed_samples, total_time_sum),
+            ):
+                hourly_columns[column].append(value)
+        self._append_columns("hourly", hourly_columns, next_dir)
+        self._save_dictionaries(dictionaries, next_dir)
+
+        temp_path = self.path / "CURRENT.tmp"
+        temp_path.write_text(str(self._generation + 1), encoding="utf-8")
+        os.replace(temp_path, self.path / "CURRENT")
+        self._generation += 1
+        self._dictionaries = dictionaries
+        self._codes = {name: {value: code for code, value in enumerate(values)} for name, values in dictionaries.items()}
+        shutil.rmtree(previous_dir, ignore_errors=True)
+
+    def _read_column(self, table: str, column: str, typecode: str, start_row: int) -> array:
+        values = array(typecode)
+        column_path = self._column_path(table, column)
+        if column_path.exists():
+            with column_path.open("rb") as source:
+                source.seek(start_row * values.itemsize)
+                values.frombytes(source.read())
+        return values
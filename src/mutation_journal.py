@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .project_config import REPO_ROOT
+from .project_constants import MUTATION_JOURNAL_FILENAME
+
+
+logger = logging.getLogger(__name__)
+JOURNAL_FILE_PATH = REPO_ROOT / MUTATION_JOURNAL_FILENAME
+
+JournalEntry = dict[str, Any]
+
+
+class MutationJournal:
+    """DNS 变更的追加式预写日志：执行前写入 pending 条目，执行后追加完成标记。"""
+
+    def __init__(self, path: Path = JOURNAL_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: dict[int, JournalEntry] = {}
+        self._next_id = 1
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except Exception as exc:
+            logger.warning("读取变更日志失败，将从空日志开始: path=%s error=%s", self.path, exc)
+            return
+
+        for line in lines:
+            try:
+                item = json.loads(line)
+                entry_id = int(item["id"])
+            except (ValueError, KeyError, TypeError):
+                # 进程在写入中途退出时最后一行可能不完整，直接忽略。
+                continue
+            self._next_id = max(self._next_id, entry_id + 1)
+            if "status" in item:
+                self._pending.pop(entry_id, None)
+            else:
+                self._pending[entry_id] = item
+
+    def _append(self, items: list[JournalEntry]) -> None:
+        payload = "".join(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n" for item in items)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def begin(self, entries: list[JournalEntry]) -> list[int]:
+        """在执行变更前落盘一组条目，返回对应的条目编号。"""
+        with self._lock:
+            journaled = []
+            for entry in entries:
+                journaled.append({"id": self._next_id, "ts": int(time.time()), **entry})
+                self._next_id += 1
+            try:
+                self._append(journaled)
+            except Exception as exc:
+                logger.warning("写入变更日志失败: path=%s error=%s", self.path, exc)
+                return []
+            for item in journaled:
+                self._pending[item["id"]] = item
+            return [item["id"] for item in journaled]
+
+    def complete(self, entry_ids: list[int], status: str = "done") -> None:
+        with self._lock:
+            entry_ids = [entry_id for entry_id in entry_ids if entry_id in self._pending]
+            if not entry_ids:
+                return
+            try:
+                self._append([{"id": entry_id, "status": status} for entry_id in entry_ids])
+            except Exception as exc:
+                logger.warning("写入变更日志失败: path=%s error=%s", self.path, exc)
+                return
+            for entry_id in entry_ids:
+                self._pending.pop(entry_id, None)
+            if not self._pending:
+                self._truncate()
+
+    def pending_entries(self) -> list[JournalEntry]:
+        with self._lock:
+            return [dict(self._pending[entry_id]) for entry_id in sorted(self._pending)]
+
+    def _truncate(self) -> None:
+        try:
+            self.path.write_text("", encoding="utf-8")
+        except Exception as exc:
+            logger.warning("清理变更日志失败: path=%s error=%s", self.path, exc)
+
+
+def entry_matches_record(entry: JournalEntry, record: dict[str, object], value_key: str = "value") -> bool:
+    return (
+        str(record.get("RR", "")) == entry.get("rr")
+        and str(record.get("Type") or "A") == entry.get("type", "A")
+        and str(record.get("Line", "")).lower() == str(entry.get("line", "")).lower()
+        and str(record.get("Value", "")) == entry.get(value_key)
+    )
+
+
+def is_entry_applied(entry: JournalEntry, records: list[dict[str, object]]) -> bool:
+    """根据 zone 当前记录判断一条未完成的变更是否已经在服务端生效。"""
+    operation = entry.get("op")
+    if operation == "add":
+        return any(entry_matches_record(entry, record) for record in records)
+    if operation == "delete":
+        record_id = entry.get("record_id")
+        if record_id:
+            return not any(str(record.get("RecordId", "")) == record_id for record in records)
+        return not any(entry_matches_record(entry, record) for record in records)
+    if operation == "update":
+        record_id = entry.get("record_id")
+        return any(
+            str(record.get("RecordId", "")) == record_id and str(record.get("Value", "")) == entry.get("value")
+            for record in records
+        )
+    return False
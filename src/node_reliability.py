@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable
+
+from .project_constants import (
+    NODE_CONSENSUS_MIN_PEERS,
+    NODE_RELIABILITY_EWMA_ALPHA,
+    NODE_RELIABILITY_EXCLUDE_DISAGREEMENT_RATE,
+    NODE_RELIABILITY_MIN_SAMPLES,
+)
+from .runtime_state import RuntimeState, get_detection_node_reliability, set_detection_node_reliability
+from .workflow_rules import ProbeObservation
+
+
+logger = logging.getLogger(__name__)
+
+
+def _consensus_excluding(passed_count: int, total_count: int, own_passed: bool) -> bool | None:
+    """去掉自身后的多数意见；同伴不足或平票时返回 None。"""
+    peer_count = total_count - 1
+    peer_passed = passed_count - (1 if own_passed else 0)
+    if peer_count < NODE_CONSENSUS_MIN_PEERS or peer_passed * 2 == peer_count:
+        return None
+    return peer_passed * 2 > peer_count
+
+
+def find_node_disagreements(observations: Iterable[ProbeObservation]) -> dict[str, bool]:
+    """判断每个检测点本次是否与同伴共识不一致。
+
+    已解析的观测与命中同一 (ip, line) 的其他检测点比较是否通过；解析失败的观测与同线路其他检测点
+    比较是否解析成功。没有足够同伴形成共识的检测点不出现在结果中。
+    """
+    observations = list(observations)
+    record_votes: dict[tuple[str, str], list[int]] = {}
+    line_votes: dict[str, list[int]] = {}
+    for observation in observations:
+        line_vote = line_votes.setdefault(observation.line_name, [0, 0])
+        line_vote[0] += 1 if observation.ip_address else 0
+        line_vote[1] += 1
+        if observation.ip_address:
+            record_vote = record_votes.setdefault((observation.ip_address, observation.line_name), [0, 0])
+            record_vote[0] += 1 if observation.passed else 0
+            record_vote[1] += 1
+
+    disagreements: dict[str, bool] = {}
+    for observation in observations:
+        if observation.ip_address:
+            passed_count, total_count = record_votes[(observation.ip_address, observation.line_name)]
+            consensus = _consensus_excluding(passed_count, total_count, observation.passed)
+            own_verdict = observation.passed
+        else:
+            resolved_count, total_count = line_votes[observation.line_name]
+            consensus = _consensus_excluding(resolved_count, total_count, False)
+            own_verdict = False
+        if consensus is None:
+            continue
+        disagreements[observation.detection_point] = disagreements.get(observation.detection_point, False) or own_verdict != consensus
+    return disagreements
+
+
+def node_weight_from_reliability(disagreement_rate: float, samples: int) -> float:
+    """样本不足时不调权；长期与共识不一致的检测点权重归零，其余按一致率加权。"""
+    if samples < NODE_RELIABILITY_MIN_SAMPLES:
+        return 1.0
+    if disagreement_rate >= NODE_RELIABILITY_EXCLUDE_DISAGREEMENT_RATE:
+        return 0.0
+    return 1.0 - disagreement_rate
+
+
+def update_node_reliability(state: RuntimeState, observations: Iterable[ProbeObservation]) -> int:
+    """用第二次测速的共识更新各检测点的不一致率，返回本次参与更新的检测点数。"""
+    disagreements = find_node_disagreements(observations)
+    for detection_point, disagreed in disagreements.items():
+        stored = get_detection_node_reliability(state, detection_point)
+        sample = 1.0 if disagreed else 0.0
+        if stored is None:
+            disagreement_rate, samples = sample, 1
+        else:
+            disagreement_rate = stored[0] + NODE_RELIABILITY_EWMA_ALPHA * (sample - stored[0])
+            samples = int(stored[1]) + 1
+        set_detection_node_reliability(state, detection_point, [disagreement_rate, float(samples)])
+    return len(disagreements)
+
+
+def get_node_weights(state: RuntimeState) -> dict[str, float]:
+    return {
+        detection_point: node_weight_from_reliability(reliability[0], int(reliability[1]))
+        for detection_point, reliability in state.detection_node_reliability.items()
+    }
+
+
+def log_node_weights(state: RuntimeState, limit: int = 10) -> None:
+    node_weights = get_node_weights(state)
+    excluded_nodes = sorted(node for node, weight in node_weights.items() if weight <= 0)
+    down_weighted = sorted(
+        ((weight, node) for node, weight in node_weights.items() if 0 < weight < 1),
+    )[:limit]
+    logger.info(
+        "检测点可靠度: tracked=%s excluded=%s lowest=%s",
+        len(node_weights),
+        excluded_nodes,
+        [f"{node}={weight:.2f}" for weight, node in down_weighted],
+    )
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -11,8 +11,12 @@ from .project_constants import (
     DEFAULT_HEALTHCHECK_EXPECT_STATUS,
     DEFAULT_HEALTHCHECK_TIMEOUT_SECONDS,
     DEFAULT_SLEEP_SECONDS,
+    OVERSEA_TRACK_LINES,
+    RUNTIME_STATE_ENTRY_TTL_HOURS,
+    RUNTIME_STATE_MAX_ENTRIES_PER_MAP,
     TEMP_SUBDOMAIN,
 )
+from .workflow_rules import is_fine_grained_line
 
 
 _env_loaded = False
@@ -38,6 +42,12 @@ def load_runtime_env() -> None:
     _env_loaded = True
 
 
+@dataclass(frozen=True)
+class ProductionTarget:
+    domain_rr: str
+    domain_root: str
+
+
 @dataclass(frozen=True)
 class RuntimeConfig:
     domain_rr: str
@@ -48,6 +58,84 @@ class RuntimeConfig:
     healthcheck_url: str | None = None
     healthcheck_timeout_seconds: int = DEFAULT_HEALTHCHECK_TIMEOUT_SECONDS
     healthcheck_expected_status: int = DEFAULT_HEALTHCHECK_EXPECT_STATUS
+    fine_grained_lines: tuple[str, ...] = ()
+    weighted_round_robin: bool = False
+    ipv6_enabled: bool = False
+    oversea_lines: tuple[str, ...] = ()
+    extra_targets: tuple[ProductionTarget, ...] = ()
+    state_scope: str | None = None
+    state_entry_ttl_hours: int = RUNTIME_STATE_ENTRY_TTL_HOURS
+    state_max_entries_per_map: int = RUNTIME_STATE_MAX_ENTRIES_PER_MAP
+
+    @property
+    def state_key(self) -> str:
+        """运行态按该键区分生产池；主目标沿用 domain_rr 以兼容既有状态文件。"""
+        return self.state_scope or self.domain_rr
+
+    def target_configs(self) -> list[RuntimeConfig]:
+        """主目标在前，其余目标复用同一份配置，仅替换域名与运行态作用域。"""
+        configs = [self]
+        for target in self.extra_targets:
+            configs.append(
+                replace(
+                    self,
+                    domain_rr=target.domain_rr,
+                    domain_root=target.domain_root,
+                    extra_targets=(),
+                    state_scope=f"{target.domain_rr}.{target.domain_root}",
+                )
+            )
+        return configs
+
+
+def parse_fine_grained_lines(raw_value: str | None) -> tuple[str, ...]:
+    """解析逗号分隔的阿里云省份运营商线路，例如 cn_telecom_guangdong,cn_mobile_beijing。"""
+    line_names = []
+    invalid_lines = []
+    for item in (raw_value or "").split(","):
+        line_name = item.strip().lower()
+        if not line_name:
+            continue
+        if not is_fine_grained_line(line_name):
+            invalid_lines.append(line_name)
+            continue
+        if line_name not in line_names:
+            line_names.append(line_name)
+
+    if invalid_lines:
+        raise ValueError(f"无法识别的细分线路: {', '.join(invalid_lines)}")
+    return tuple(line_names)
+
+
+def parse_oversea_lines(raw_value: str | None) -> tuple[str, ...]:
+    """解析逗号分隔的海外轨道线路（oversea、default），按固定优先级返回。"""
+    line_names = {item.strip().lower() for item in (raw_value or "").split(",") if item.strip()}
+    invalid_lines = sorted(line_names - set(OVERSEA_TRACK_LINES))
+    if invalid_lines:
+        raise ValueError(f"无法识别的海外线路: {', '.join(invalid_lines)}")
+    return tuple(line_name for line_name in OVERSEA_TRACK_LINES if line_name in line_names)
+
+
+def parse_production_targets(raw_value: str | None, primary_target: ProductionTarget | None = None) -> tuple[ProductionTarget, ...]:
+    """解析逗号分隔的额外生产目标，格式为 rr@domain_root，例如 api@domain.com,www@other.com。"""
+    targets: list[ProductionTarget] = []
+    invalid_items = []
+    for item in (raw_value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        domain_rr, separator, domain_root = item.partition("@")
+        domain_rr, domain_root = domain_rr.strip(), domain_root.strip().lower()
+        if not separator or not domain_rr or not domain_root:
+            invalid_items.append(item)
+            continue
+        target = ProductionTarget(domain_rr=domain_rr, domain_root=domain_root)
+        if target != primary_target and target not in targets:
+            targets.append(target)
+
+    if invalid_items:
+        raise ValueError(f"无法识别的生产目标: {', '.join(invalid_items)}")
+    return tuple(targets)
 
 
 def load_runtime_config() -> RuntimeConfig:
@@ -63,6 +151,12 @@ def load_runtime_config() -> RuntimeConfig:
     healthcheck_expected_status = int(
         os.getenv("HEALTHCHECK_EXPECT_STATUS", str(DEFAULT_HEALTHCHECK_EXPECT_STATUS))
     )
+    fine_grained_lines = parse_fine_grained_lines(os.getenv("FINE_GRAINED_LINES"))
+    weighted_round_robin = os.getenv("WEIGHTED_RR", "false").strip().lower() in {"1", "true", "yes", "on"}
+    ipv6_enabled = os.getenv("IPV6_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
+    oversea_lines = parse_oversea_lines(os.getenv("OVERSEA_LINES"))
+    state_entry_ttl_hours = int(os.getenv("STATE_ENTRY_TTL_HOURS", str(RUNTIME_STATE_ENTRY_TTL_HOURS)))
+    state_max_entries_per_map = int(os.getenv("STATE_MAX_ENTRIES_PER_MAP", str(RUNTIME_STATE_MAX_ENTRIES_PER_MAP)))
 
     missing_values = []
     if not domain_rr:
@@ -75,6 +169,7 @@ def load_runtime_config() -> RuntimeConfig:
 
     assert domain_rr is not None
     assert domain_root is not None
+    extra_targets = parse_production_targets(os.getenv("EXTRA_TARGETS"), ProductionTarget(domain_rr, domain_root))
 
     return RuntimeConfig(
         domain_rr=domain_rr,
@@ -83,6 +178,13 @@ def load_runtime_config() -> RuntimeConfig:
         healthcheck_url=healthcheck_url,
         healthcheck_timeout_seconds=healthcheck_timeout_seconds,
         healthcheck_expected_status=healthcheck_expected_status,
+        fine_grained_lines=fine_grained_lines,
+        weighted_round_robin=weighted_round_robin,
+        ipv6_enabled=ipv6_enabled,
+        oversea_lines=oversea_lines,
+        extra_targets=extra_targets,
+        state_entry_ttl_hours=state_entry_ttl_hours,
+        state_max_entries_per_map=state_max_entries_per_map,
     )
 
 
@@ -9,28 +9,83 @@ DEFAULT_HEALTHCHECK_EXPECT_STATUS = 200
 
 FIRST_PASS_REQUIRED_STATUS = "530"
 FIRST_PASS_MAX_TOTAL_TIME_SECONDS = 1.0
+FIRST_PASS_MIN_SUCCESS_RATE = 0.5
+VALIDATION_MIN_SUCCESS_RATE = 0.5
 SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS = 2.0
+OVERSEA_FIRST_PASS_MAX_TOTAL_TIME_SECONDS = 1.5
+OVERSEA_SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS = 3.0
 
 MAX_CANDIDATE_IPS_PER_CARRIER = 20
 MAX_SELECTED_IPS_PER_CARRIER = 8
 MAX_CF090227_IPS_PER_CARRIER = 10
+MAX_OVERSEA_CANDIDATE_IPS = 10
 MAX_BAD_RECORDS_BEFORE_TRUNCATION = 10
 MAX_BAD_RECORDS_TO_DELETE = 5
 PRODUCTION_RECORD_FLOOR = 3
 PRODUCTION_RECORD_TARGET = 6
 PRODUCTION_RECORD_CEILING = 8
+PRODUCTION_RECORD_LIMITS_BY_TYPE = {
+    "A": (PRODUCTION_RECORD_FLOOR, PRODUCTION_RECORD_TARGET, PRODUCTION_RECORD_CEILING),
+    "AAAA": (2, 4, 6),
+}
 MAX_SURPLUS_PRUNE_PER_LINE_PER_CYCLE = 2
 MAX_REPLACE_PER_LINE_PER_CYCLE = 1
 MAX_REPLACE_TOTAL_PER_CYCLE = 2
 ROTATION_SOFT_AGE_HOURS = 12
 ROTATION_HARD_AGE_HOURS = 24
 ROTATION_COOLDOWN_HOURS = 24
-POLLUTION_SCORE_MAX = 6
-CONSECUTIVE_ANOMALY_DELETE_THRESHOLD = 2
+ROTATION_CHURN_PENALTY_SECONDS = 0.15
+ROTATION_HARD_AGE_BONUS_SECONDS = 0.2
+ROTATION_POLLUTION_BONUS_SECONDS = 0.1
+STANDBY_POOL_SIZE_PER_LINE = 4
+STANDBY_FIRST_PASS_MAX_AGE_HOURS = 2
+STANDBY_VALIDATION_MAX_AGE_HOURS = 6
+CHANGE_DETECTION_REFERENCE_LEVEL = 0.5
+CHANGE_DETECTION_THRESHOLD = 1.0
+CHANGE_DETECTION_MAX_LEVEL = 2.0
+CHANGE_DETECTION_MAX_SCORE = 3.0
 GLOBAL_FREEZE_MIN_LINES = 2
 GLOBAL_FREEZE_ANOMALY_RATIO = 0.8
+LAST_GOOD_SNAPSHOT_MAX_ANOMALY_RATIO = 0.2
+LAST_GOOD_SNAPSHOT_MAX_AGE_HOURS = 24
+RECORD_QUERY_PAGE_SIZE = 500
+RECORD_QUERY_MAX_WORKERS = 4
+RECORD_SNAPSHOT_TTL_SECONDS = 60
+BATCH_OPERATION_MIN_RECORDS = 10
+BATCH_RESULT_POLL_INTERVAL_SECONDS = 2
+BATCH_RESULT_POLL_TIMEOUT_SECONDS = 120
+BATCH_RESULT_DETAIL_PAGE_SIZE = 100
+DNS_WEIGHT_MIN = 1
+DNS_WEIGHT_MAX = 100
+DNS_WEIGHT_UNMEASURED = 50
+DNS_WEIGHT_HYSTERESIS = 10
+RECORD_LATENCY_HISTORY_CYCLES = 6
+LATENCY_EWMA_ALPHA = 0.3
+LATENCY_SCORE_CONFIDENCE_Z = 1.0
+LATENCY_SCORE_PRIOR_STDDEV_SECONDS = 0.3
+NODE_RELIABILITY_EWMA_ALPHA = 0.2
+NODE_RELIABILITY_MIN_SAMPLES = 5
+NODE_RELIABILITY_EXCLUDE_DISAGREEMENT_RATE = 0.5
+NODE_CONSENSUS_MIN_PEERS = 2
+BANDIT_UNKNOWN_ARM_PRIOR_RATIO = 0.5
+RUNTIME_STATE_ENTRY_TTL_HOURS = 168
+RUNTIME_STATE_MAX_ENTRIES_PER_MAP = 2000
 RUNTIME_STATE_FILENAME = ".cfsdns_state.json"
+RUNTIME_STATE_DB_FILENAME = ".cfsdns_state.db"
 PROCESS_LOCK_FILENAME = ".cfsdns.lock"
+MUTATION_JOURNAL_FILENAME = ".cfsdns_journal.jsonl"
+STAGE_CHECKPOINT_FILENAME = ".cfsdns_checkpoint.json"
+STAGE_CHECKPOINT_TTL_SECONDS = 900
+MEASUREMENT_STORE_DIRNAME = ".cfsdns_metrics"
+MEASUREMENT_RAW_RETENTION_HOURS = 48
+MEASUREMENT_HOURLY_RETENTION_DAYS = 30
+MEASUREMENT_PROFILE_UTC_OFFSET_HOURS = 8
+TIME_PROFILE_HISTORY_DAYS = 28
+TIME_PROFILE_LOOKAHEAD_HOURS = 2
+TIME_PROFILE_MIN_BUCKET_SAMPLES = 20
+TIME_PROFILE_MIN_COVERED_HOURS = 12
+TIME_PROFILE_PEAK_LATENCY_RATIO = 1.25
+TIME_PROFILE_PRIOR_SAMPLES = 10
 
 EXCLUDED_IP_PREFIXES = ("172.65.",)
 
@@ -38,6 +93,8 @@ CARRIER_DISPLAY_NAMES = {
     "mobile": "移动",
     "unicom": "联通",
     "telecom": "电信",
+    "oversea": "海外",
+    "default": "默认",
 }
 
 DETECTION_POINT_PREFIX_TO_LINE = {
@@ -46,11 +103,132 @@ DETECTION_POINT_PREFIX_TO_LINE = {
     "电信": "telecom",
 }
 
+FINE_GRAINED_LINE_PREFIX = "cn"
+OVERSEA_LINE = "oversea"
+DEFAULT_LINE = "default"
+OVERSEA_TRACK_LINES = (OVERSEA_LINE, DEFAULT_LINE)
+OVERSEA_DETECTION_POINT_KEYWORDS = (
+    "海外",
+    "香港",
+    "澳门",
+    "台湾",
+    "日本",
+    "韩国",
+    "新加坡",
+    "马来西亚",
+    "泰国",
+    "越南",
+    "菲律宾",
+    "印度",
+    "美国",
+    "加拿大",
+    "英国",
+    "德国",
+    "法国",
+    "荷兰",
+    "俄罗斯",
+    "澳大利亚",
+    "巴西",
+)
+
+PROVINCE_LINE_CODES = {
+    "北京": "beijing",
+    "天津": "tianjin",
+    "河北": "hebei",
+    "山西": "shanxi",
+    "内蒙古": "neimenggu",
+    "辽宁": "liaoning",
+    "吉林": "jilin",
+    "黑龙江": "heilongjiang",
+    "上海": "shanghai",
+    "江苏": "jiangsu",
+    "浙江": "zhejiang",
+    "安徽": "anhui",
+    "福建": "fujian",
+    "江西": "jiangxi",
+    "山东": "shandong",
+    "河南": "henan",
+    "湖北": "hubei",
+    "湖南": "hunan",
+    "广东": "guangdong",
+    "广西": "guangxi",
+    "海南": "hainan",
+    "重庆": "chongqing",
+    "四川": "sichuan",
+    "贵州": "guizhou",
+    "云南": "yunnan",
+    "西藏": "xizang",
+    "陕西": "shaanxi",
+    "甘肃": "gansu",
+    "青海": "qinghai",
+    "宁夏": "ningxia",
+    "新疆": "xinjiang",
+}
+
+DETECTION_POINT_CITY_TO_PROVINCE = {
+    "石家庄": "河北",
+    "保定": "河北",
+    "唐山": "河北",
+    "太原": "山西",
+    "呼和浩特": "内蒙古",
+    "包头": "内蒙古",
+    "沈阳": "辽宁",
+    "大连": "辽宁",
+    "长春": "吉林",
+    "哈尔滨": "黑龙江",
+    "南京": "江苏",
+    "苏州": "江苏",
+    "无锡": "江苏",
+    "常州": "江苏",
+    "徐州": "江苏",
+    "杭州": "浙江",
+    "宁波": "浙江",
+    "温州": "浙江",
+    "金华": "浙江",
+    "合肥": "安徽",
+    "芜湖": "安徽",
+    "福州": "福建",
+    "厦门": "福建",
+    "泉州": "福建",
+    "南昌": "江西",
+    "济南": "山东",
+    "青岛": "山东",
+    "烟台": "山东",
+    "郑州": "河南",
+    "洛阳": "河南",
+    "武汉": "湖北",
+    "宜昌": "湖北",
+    "长沙": "湖南",
+    "广州": "广东",
+    "深圳": "广东",
+    "东莞": "广东",
+    "佛山": "广东",
+    "珠海": "广东",
+    "汕头": "广东",
+    "南宁": "广西",
+    "桂林": "广西",
+    "柳州": "广西",
+    "海口": "海南",
+    "三亚": "海南",
+    "成都": "四川",
+    "绵阳": "四川",
+    "贵阳": "贵州",
+    "昆明": "云南",
+    "拉萨": "西藏",
+    "西安": "陕西",
+    "兰州": "甘肃",
+    "西宁": "青海",
+    "银川": "宁夏",
+    "乌鲁木齐": "新疆",
+}
+
 IP_SOURCE_URLS = {
     "uouin": "https://api.uouin.com/cloudflare.html",
     "wetest": "https://www.wetest.vip/page/cloudflare/address_v4.html",
+    "wetest_v6": "https://www.wetest.vip/page/cloudflare/address_v6.html",
     "cf090227": "https://cf.090227.xyz",
     "ip164746": "https://ip.164746.xyz/ipTop10.html",
+    "cloudflare_v4": "https://www.cloudflare.com/ips-v4",
 }
 
 PUBLIC_DOH_ENDPOINTS = (
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import statistics
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from .project_constants import (
+    ROTATION_CHURN_PENALTY_SECONDS,
+    ROTATION_HARD_AGE_BONUS_SECONDS,
+    ROTATION_HARD_AGE_HOURS,
+    ROTATION_POLLUTION_BONUS_SECONDS,
+    ROTATION_SOFT_AGE_HOURS,
+)
+
+
+@dataclass(frozen=True)
+class RotationRecord:
+    """参与轮换规划的一条生产记录；expected_latency 为 None 表示没有可用的测速数据。"""
+
+    line_name: str
+    record: dict[str, object]
+    expected_latency: float | None
+    age_hours: float
+    pollution_score: float = 0.0
+
+
+@dataclass(frozen=True)
+class PlannedSwap:
+    line_name: str
+    record: dict[str, object]
+    old_ip: str
+    new_ip: str
+    gain_seconds: float
+
+
+def rotation_bonus(age_hours: float, pollution_score: float) -> float:
+    """记录年龄与线路污染带来的额外收益：超过硬上限或在污染线路上超过软上限时倾向换掉。"""
+    bonus = 0.0
+    if age_hours >= ROTATION_HARD_AGE_HOURS:
+        bonus += ROTATION_HARD_AGE_BONUS_SECONDS
+    if pollution_score > 0 and age_hours >= ROTATION_SOFT_AGE_HOURS:
+        bonus += ROTATION_POLLUTION_BONUS_SECONDS * pollution_score
+    return bonus
+
+
+def churn_penalty(age_hours: float) -> float:
+    """每次替换都会让解析器缓存失效；刚上线不久的记录再换一次代价加倍。"""
+    if age_hours < ROTATION_SOFT_AGE_HOURS:
+        return 2 * ROTATION_CHURN_PENALTY_SECONDS
+    return ROTATION_CHURN_PENALTY_SECONDS
+
+
+def _line_swap_options(
+    line_name: str,
+    records: list[RotationRecord],
+    candidate_latencies: Mapping[str, float],
+) -> list[PlannedSwap]:
+    """在单条线路内把最差的记录依次与最快的候选配对，返回收益为正、按收益递减排列的替换方案。"""
+    if not records or not candidate_latencies:
+        return []
+
+    known_latencies = [record.expected_latency for record in records if record.expected_latency is not None]
+    # 没有测速数据的记录按同线路的典型水平估计，只依靠年龄与污染参与比较。
+    fallback_latency = statistics.median(known_latencies or list(candidate_latencies.values()))
+
+    def record_value(record: RotationRecord) -> float:
+        expected_latency = record.expected_latency if record.expected_latency is not None else fallback_latency
+        return expected_latency + rotation_bonus(record.age_hours, record.pollution_score) - churn_penalty(record.age_hours)
+
+    ranked_records = sorted(records, key=lambda record: (-record_value(record), -record.age_hours))
+    ranked_candidates = sorted(candidate_latencies.items(), key=lambda item: (item[1], item[0]))
+    options = []
+    for record, (new_ip, candidate_latency) in zip(ranked_records, ranked_candidates):
+        gain_seconds = record_value(record) - candidate_latency
+        if gain_seconds <= 0:
+            break
+        options.append(
+            PlannedSwap(
+                line_name=line_name,
+                record=record.record,
+                old_ip=str(record.record.get("Value", "")),
+                new_ip=new_ip,
+                gain_seconds=gain_seconds,
+            )
+        )
+    return options
+
+
+def plan_rotation_swaps(
+    records_by_line: Mapping[str, list[RotationRecord]],
+    candidate_latencies_by_line: Mapping[str, Mapping[str, float]],
+    line_budgets: Mapping[str, int],
+    total_budget: int,
+) -> list[PlannedSwap]:
+    """在每线路与全局替换预算内选出总收益最大的一组替换，按收益从高到低返回。
+
+    收益 = 记录预期延迟 + 年龄/污染加成 - 换入候选的预期延迟 - 换血惩罚。单条线路内
+    "最差记录配最快候选"的收益单调递减，因此逐线路截取前缀后全局按收益贪心即为最优解。
+    """
+    if total_budget <= 0:
+        return []
+
+    options = []
+    for line_name, records in records_by_line.items():
+        line_budget = line_budgets.get(line_name, 0)
+        if line_budget <= 0:
+            continue
+        line_options = _line_swap_options(line_name, records, candidate_latencies_by_line.get(line_name, {}))
+        options.extend(line_options[:line_budget])
+
+    options.sort(key=lambda option: (-option.gain_seconds, option.line_name, option.old_ip))
+    return options[:total_budget]
@@ -2,96 +2,423 @@ from __future__ import annotations
 
 import json
 import logging
+import sqlite3
 import time
+from contextlib import closing
 from dataclasses import dataclass, field
-from pathlib import Path
 
 from .project_config import REPO_ROOT
-from .project_constants import RUNTIME_STATE_FILENAME
+from .project_constants import RUNTIME_STATE_DB_FILENAME, RUNTIME_STATE_FILENAME
 
 
 logger = logging.getLogger(__name__)
 STATE_FILE_PATH = REPO_ROOT / RUNTIME_STATE_FILENAME
+STATE_DB_PATH = REPO_ROOT / RUNTIME_STATE_DB_FILENAME
+STATE_SCHEMA_VERSION = 1
+STATE_MAP_NAMES = (
+    "record_anomaly_scores",
+    "record_rotation_cooldowns",
+    "line_pollution_scores",
+    "record_latency_samples",
+    "production_snapshots",
+    "candidate_latency_estimates",
+    "detection_node_reliability",
+    "line_standby_pool",
+)
 
 
 @dataclass
 class RuntimeState:
-    record_anomaly_streaks: dict[str, int] = field(default_factory=dict)
+    record_anomaly_scores: dict[str, float] = field(default_factory=dict)
     record_rotation_cooldowns: dict[str, int] = field(default_factory=dict)
-    line_pollution_scores: dict[str, int] = field(default_factory=dict)
+    line_pollution_scores: dict[str, float] = field(default_factory=dict)
+    record_latency_samples: dict[str, list[float]] = field(default_factory=dict)
+    production_snapshots: dict[str, dict[str, object]] = field(default_factory=dict)
+    candidate_latency_estimates: dict[str, list[float]] = field(default_factory=dict)
+    detection_node_reliability: dict[str, list[float]] = field(default_factory=dict)
+    line_standby_pool: dict[str, list[int]] = field(default_factory=dict)
+    entry_touched_at: dict[str, dict[str, int]] = field(default_factory=dict, repr=False, compare=False)
+    persisted_values: dict[str, dict[str, tuple[str, int]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
 
 def make_record_key(rr: str, line: str, ip_address: str) -> str:
     return f"{rr}|{line.lower()}|{ip_address}"
 
 
-def load_runtime_state() -> RuntimeState:
-    if not STATE_FILE_PATH.exists():
-        return RuntimeState()
+def make_candidate_key(line: str, ip_address: str) -> str:
+    return f"{line.lower()}|{ip_address}"
 
-    try:
-        payload = json.loads(STATE_FILE_PATH.read_text(encoding="utf-8"))
-    except Exception as exc:
-        logger.warning("读取运行时状态失败，将使用空状态: path=%s error=%s", STATE_FILE_PATH, exc)
-        return RuntimeState()
 
-    streaks = payload.get("record_anomaly_streaks", {})
+def _touch_entry(state: RuntimeState, map_name: str, key: str, now_timestamp: int | None = None) -> None:
+    state.entry_touched_at.setdefault(map_name, {})[key] = now_timestamp if now_timestamp is not None else int(time.time())
+
+
+def _sync_entry_timestamps(state: RuntimeState, now_timestamp: int) -> None:
+    """为缺少时间戳的键补记当前时间，并丢弃已不存在的键的时间戳。"""
+    for map_name in STATE_MAP_NAMES:
+        values = getattr(state, map_name)
+        touched_at = state.entry_touched_at.get(map_name, {})
+        state.entry_touched_at[map_name] = {key: touched_at.get(key, now_timestamp) for key in values}
+
+
+def _state_from_payload(payload: dict[str, object]) -> RuntimeState:
+    # 旧版本按连续异常轮数计数，数值可直接作为变点统计量的初值。
+    anomaly_scores = payload.get("record_anomaly_scores", payload.get("record_anomaly_streaks", {}))
     cooldowns = payload.get("record_rotation_cooldowns", {})
     pollution_scores = payload.get("line_pollution_scores", {})
-    if not isinstance(streaks, dict):
+    latency_samples = payload.get("record_latency_samples", {})
+    production_snapshots = payload.get("production_snapshots", {})
+    latency_estimates = payload.get("candidate_latency_estimates", {})
+    node_reliability = payload.get("detection_node_reliability", {})
+    standby_pool = payload.get("line_standby_pool", {})
+    if not isinstance(anomaly_scores, dict):
         return RuntimeState()
     if not isinstance(cooldowns, dict):
         cooldowns = {}
     if not isinstance(pollution_scores, dict):
         pollution_scores = {}
-
-    normalized_streaks = {str(key): int(value) for key, value in streaks.items() if isinstance(value, int) and value >= 0}
+    if not isinstance(latency_samples, dict):
+        latency_samples = {}
+    if not isinstance(production_snapshots, dict):
+        production_snapshots = {}
+    if not isinstance(latency_estimates, dict):
+        latency_estimates = {}
+    if not isinstance(node_reliability, dict):
+        node_reliability = {}
+    if not isinstance(standby_pool, dict):
+        standby_pool = {}
+
+    normalized_anomaly_scores = {
+        str(key): float(value)
+        for key, value in anomaly_scores.items()
+        if isinstance(value, (int, float)) and value > 0
+    }
     normalized_cooldowns = {str(key): int(value) for key, value in cooldowns.items() if isinstance(value, int) and value > 0}
     normalized_pollution_scores = {
-        str(key): int(value)
+        str(key): float(value)
         for key, value in pollution_scores.items()
-        if isinstance(value, int) and value >= 0
+        if isinstance(value, (int, float)) and value > 0
     }
-    state = RuntimeState(
-        record_anomaly_streaks=normalized_streaks,
+    normalized_latency_samples = {
+        str(key): [float(sample) for sample in samples if isinstance(sample, (int, float)) and sample >= 0]
+        for key, samples in latency_samples.items()
+        if isinstance(samples, list)
+    }
+    return RuntimeState(
+        record_anomaly_scores=normalized_anomaly_scores,
         record_rotation_cooldowns=normalized_cooldowns,
         line_pollution_scores=normalized_pollution_scores,
+        record_latency_samples={key: samples for key, samples in normalized_latency_samples.items() if samples},
+        production_snapshots={
+            str(key): snapshot
+            for key, snapshot in production_snapshots.items()
+            if isinstance(snapshot, dict) and isinstance(snapshot.get("records"), list)
+        },
+        candidate_latency_estimates={
+            str(key): [float(value) for value in estimate]
+            for key, estimate in latency_estimates.items()
+            if isinstance(estimate, list)
+            and len(estimate) == 3
+            and all(isinstance(value, (int, float)) and value >= 0 for value in estimate)
+        },
+        detection_node_reliability={
+            str(key): [float(value) for value in reliability]
+            for key, reliability in node_reliability.items()
+            if isinstance(reliability, list)
+            and len(reliability) == 2
+            and all(isinstance(value, (int, float)) and value >= 0 for value in reliability)
+        },
+        line_standby_pool={
+            str(key): [int(value) for value in timestamps]
+            for key, timestamps in standby_pool.items()
+            if isinstance(timestamps, list)
+            and len(timestamps) == 2
+            and all(isinstance(value, int) and value >= 0 for value in timestamps)
+        },
     )
+
+
+def _connect_state_db() -> sqlite3.Connection:
+    connection = sqlite3.connect(STATE_DB_PATH, timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS state_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    row = connection.execute("SELECT value FROM state_meta WHERE key = 'schema_version'").fetchone()
+    schema_version = int(row[0]) if row else 0
+    if schema_version > STATE_SCHEMA_VERSION:
+        connection.close()
+        raise sqlite3.DatabaseError(f"运行时状态库版本过新: {schema_version} > {STATE_SCHEMA_VERSION}")
+    if schema_version < STATE_SCHEMA_VERSION:
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS state_entries ("
+                "map TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "touched_at INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (map, key))"
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO state_meta (key, value) VALUES ('schema_version', ?)",
+                (str(STATE_SCHEMA_VERSION),),
+            )
+    return connection
+
+
+def _encode_state(state: RuntimeState) -> dict[str, dict[str, tuple[str, int]]]:
+    _sync_entry_timestamps(state, int(time.time()))
+    return {
+        map_name: {
+            key: (json.dumps(value, ensure_ascii=False, separators=(",", ":")), state.entry_touched_at[map_name][key])
+            for key, value in getattr(state, map_name).items()
+        }
+        for map_name in STATE_MAP_NAMES
+    }
+
+
+def _read_state_db(connection: sqlite3.Connection) -> RuntimeState:
+    payload: dict[str, dict[str, object]] = {map_name: {} for map_name in STATE_MAP_NAMES}
+    touched_at: dict[str, dict[str, int]] = {map_name: {} for map_name in STATE_MAP_NAMES}
+    for map_name, key, value, entry_touched_at in connection.execute(
+        "SELECT map, key, value, touched_at FROM state_entries"
+    ):
+        if map_name not in payload:
+            continue
+        try:
+            payload[map_name][key] = json.loads(value)
+        except ValueError:
+            continue
+        touched_at[map_name][key] = int(entry_touched_at)
+    state = _state_from_payload(payload)
+    state.entry_touched_at = touched_at
+    return state
+
+
+def _write_state_changes(connection: sqlite3.Connection, state: RuntimeState) -> int:
+    """只写入相对上次落盘有变化的键，并删除已移除的键；整个过程在一个事务里完成。"""
+    encoded_state = _encode_state(state)
+    upserts = []
+    deletions = []
+    for map_name, encoded_values in encoded_state.items():
+        persisted_values = state.persisted_values.get(map_name, {})
+        upserts.extend(
+            (map_name, key, value, touched_at)
+            for key, (value, touched_at) in encoded_values.items()
+            if persisted_values.get(key) != (value, touched_at)
+        )
+        deletions.extend((map_name, key) for key in persisted_values.keys() - encoded_values.keys())
+
+    if upserts or deletions:
+        with connection:
+            connection.executemany(
+                "INSERT INTO state_entries (map, key, value, touched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (map, key) DO UPDATE SET value = excluded.value, touched_at = excluded.touched_at",
+                upserts,
+            )
+            connection.executemany("DELETE FROM state_entries WHERE map = ? AND key = ?", deletions)
+    state.persisted_values = encoded_state
+    return len(upserts) + len(deletions)
+
+
+def _load_legacy_json_state() -> RuntimeState | None:
+    try:
+        payload = json.loads(STATE_FILE_PATH.read_text(encoding="utf-8"))
+    except Exception as exc:
+        logger.warning("读取旧版 JSON 运行时状态失败，跳过迁移: path=%s error=%s", STATE_FILE_PATH, exc)
+        return None
+    if not isinstance(payload, dict):
+        logger.warning("旧版 JSON 运行时状态格式不正确，跳过迁移: path=%s", STATE_FILE_PATH)
+        return None
+    return _state_from_payload(payload)
+
+
+def load_runtime_state() -> RuntimeState:
+    try:
+        connection = _connect_state_db()
+    except sqlite3.Error as exc:
+        logger.warning("打开运行时状态库失败，将使用空状态: path=%s error=%s", STATE_DB_PATH, exc)
+        return RuntimeState()
+
+    with closing(connection):
+        try:
+            is_empty = connection.execute("SELECT 1 FROM state_entries LIMIT 1").fetchone() is None
+            legacy_state = _load_legacy_json_state() if is_empty and STATE_FILE_PATH.exists() else None
+            if legacy_state is not None:
+                # 只有导入成功才把旧文件改名；读取失败时保留原文件，下次启动重试迁移。
+                state = legacy_state
+                _write_state_changes(connection, state)
+                STATE_FILE_PATH.replace(STATE_FILE_PATH.with_name(f"{STATE_FILE_PATH.name}.migrated"))
+                logger.info("已将 JSON 运行时状态迁移到 SQLite: %s -> %s", STATE_FILE_PATH, STATE_DB_PATH)
+            else:
+                state = _read_state_db(connection)
+                state.persisted_values = _encode_state(state)
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("读取运行时状态失败，将使用空状态: path=%s error=%s", STATE_DB_PATH, exc)
+            return RuntimeState()
+
     prune_expired_runtime_state(state)
     return state
 
 
 def save_runtime_state(state: RuntimeState) -> None:
     prune_expired_runtime_state(state)
-    payload = {
-        "record_anomaly_streaks": state.record_anomaly_streaks,
-        "record_rotation_cooldowns": state.record_rotation_cooldowns,
-        "line_pollution_scores": state.line_pollution_scores,
-    }
 
     try:
-        STATE_FILE_PATH.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception as exc:
-        logger.warning("保存运行时状态失败: path=%s error=%s", STATE_FILE_PATH, exc)
+        with closing(_connect_state_db()) as connection:
+            _write_state_changes(connection, state)
+    except sqlite3.Error as exc:
+        logger.warning("保存运行时状态失败: path=%s error=%s", STATE_DB_PATH, exc)
 
 
-def get_record_anomaly_streak(state: RuntimeState, rr: str, line: str, ip_address: str) -> int:
-    return state.record_anomaly_streaks.get(make_record_key(rr, line, ip_address), 0)
+def get_record_anomaly_score(state: RuntimeState, rr: str, line: str, ip_address: str) -> float:
+    return state.record_anomaly_scores.get(make_record_key(rr, line, ip_address), 0.0)
 
 
-def mark_record_healthy(state: RuntimeState, rr: str, line: str, ip_address: str) -> None:
-    state.record_anomaly_streaks.pop(make_record_key(rr, line, ip_address), None)
+def set_record_anomaly_score(state: RuntimeState, rr: str, line: str, ip_address: str, score: float) -> None:
+    """保存记录的异常变点统计量；归零时删除键。"""
+    record_key = make_record_key(rr, line, ip_address)
+    if score <= 0:
+        state.record_anomaly_scores.pop(record_key, None)
+        return
+    state.record_anomaly_scores[record_key] = score
+    _touch_entry(state, "record_anomaly_scores", record_key)
 
 
-def increment_record_anomaly_streak(state: RuntimeState, rr: str, line: str, ip_address: str) -> int:
+def clear_record_state(state: RuntimeState, rr: str, line: str, ip_address: str) -> None:
     record_key = make_record_key(rr, line, ip_address)
-    next_value = state.record_anomaly_streaks.get(record_key, 0) + 1
-    state.record_anomaly_streaks[record_key] = next_value
-    return next_value
+    state.record_anomaly_scores.pop(record_key, None)
+    state.record_latency_samples.pop(record_key, None)
+
+
+def append_record_latency_samples(
+    state: RuntimeState,
+    rr: str,
+    line: str,
+    ip_address: str,
+    samples: list[float],
+    history_size: int,
+) -> list[float]:
+    record_key = make_record_key(rr, line, ip_address)
+    history = (state.record_latency_samples.get(record_key, []) + list(samples))[-history_size:]
+    state.record_latency_samples[record_key] = history
+    _touch_entry(state, "record_latency_samples", record_key)
+    return history
 
 
-def clear_record_state(state: RuntimeState, rr: str, line: str, ip_address: str) -> None:
-    state.record_anomaly_streaks.pop(make_record_key(rr, line, ip_address), None)
+def get_record_latency_samples(state: RuntimeState, rr: str, line: str, ip_address: str) -> list[float]:
+    return list(state.record_latency_samples.get(make_record_key(rr, line, ip_address), []))
+
+
+def get_candidate_latency_estimate(state: RuntimeState, line: str, ip_address: str) -> list[float] | None:
+    estimate = state.candidate_latency_estimates.get(make_candidate_key(line, ip_address))
+    return list(estimate) if estimate is not None else None
+
+
+def set_candidate_latency_estimate(state: RuntimeState, line: str, ip_address: str, estimate: list[float]) -> None:
+    """保存候选 IP 在线路上的延迟估计 [均值, 方差, 样本数]。"""
+    candidate_key = make_candidate_key(line, ip_address)
+    state.candidate_latency_estimates[candidate_key] = list(estimate)
+    _touch_entry(state, "candidate_latency_estimates", candidate_key)
+
+
+def get_detection_node_reliability(state: RuntimeState, detection_point: str) -> list[float] | None:
+    reliability = state.detection_node_reliability.get(detection_point)
+    return list(reliability) if reliability is not None else None
+
+
+def set_detection_node_reliability(state: RuntimeState, detection_point: str, reliability: list[float]) -> None:
+    """保存检测点的 [与共识不一致的 EWMA 比例, 样本数]。"""
+    state.detection_node_reliability[detection_point] = list(reliability)
+    _touch_entry(state, "detection_node_reliability", detection_point)
+
+
+def mark_standby_validated(state: RuntimeState, line: str, ip_address: str, now_timestamp: int | None = None) -> None:
+    """记录 IP 在该线路上通过第二次测速的时间；备用池条目以此为准创建。"""
+    candidate_key = make_candidate_key(line, ip_address)
+    timestamps = state.line_standby_pool.get(candidate_key, [0, 0])
+    state.line_standby_pool[candidate_key] = [timestamps[0], now_timestamp if now_timestamp is not None else int(time.time())]
+    _touch_entry(state, "line_standby_pool", candidate_key)
+
+
+def mark_standby_first_pass(state: RuntimeState, line: str, ip_address: str, now_timestamp: int | None = None) -> None:
+    """刷新备用池条目通过第一次测速的时间；从未通过第二次测速的 IP 不入池。"""
+    candidate_key = make_candidate_key(line, ip_address)
+    timestamps = state.line_standby_pool.get(candidate_key)
+    if timestamps is None:
+        return
+    state.line_standby_pool[candidate_key] = [now_timestamp if now_timestamp is not None else int(time.time()), timestamps[1]]
+    _touch_entry(state, "line_standby_pool", candidate_key)
+
+
+def discard_standby_entry(state: RuntimeState, line: str, ip_address: str) -> None:
+    state.line_standby_pool.pop(make_candidate_key(line, ip_address), None)
+
+
+def get_standby_ips(
+    state: RuntimeState,
+    line: str,
+    first_pass_max_age_hours: float,
+    validation_max_age_hours: float,
+    now_timestamp: int | None = None,
+) -> list[str]:
+    """返回该线路上两次测速都在有效期内通过的备用 IP，最近通过第二次测速的在前。"""
+    current_timestamp = now_timestamp if now_timestamp is not None else int(time.time())
+    line_prefix = f"{line.lower()}|"
+    fresh_entries = [
+        (validated_at, candidate_key[len(line_prefix):])
+        for candidate_key, (first_pass_at, validated_at) in state.line_standby_pool.items()
+        if candidate_key.startswith(line_prefix)
+        and current_timestamp - first_pass_at <= first_pass_max_age_hours * 3600
+        and current_timestamp - validated_at <= validation_max_age_hours * 3600
+    ]
+    return [ip_address for _, ip_address in sorted(fresh_entries, key=lambda entry: (-entry[0], entry[1]))]
+
+
+def prune_standby_pool(state: RuntimeState, validation_max_age_hours: float, now_timestamp: int | None = None) -> int:
+    """丢弃第二次测速已过有效期的备用池条目，返回丢弃数量。"""
+    current_timestamp = now_timestamp if now_timestamp is not None else int(time.time())
+    expired_keys = [
+        candidate_key
+        for candidate_key, (_, validated_at) in state.line_standby_pool.items()
+        if current_timestamp - validated_at > validation_max_age_hours * 3600
+    ]
+    for candidate_key in expired_keys:
+        state.line_standby_pool.pop(candidate_key, None)
+    return len(expired_keys)
+
+
+def _make_snapshot_key(rr: str, record_type: str) -> str:
+    return f"{rr}|{record_type}"
+
+
+def save_production_snapshot(state: RuntimeState, rr: str, record_type: str, records: set[tuple[str, str]]) -> None:
+    """保存一份通过验证的生产池 (ip, line) 集合，作为最近一次已知良好快照。"""
+    snapshot_key = _make_snapshot_key(rr, record_type)
+    state.production_snapshots[snapshot_key] = {
+        "saved_at": int(time.time()),
+        "records": [[ip_address, line.lower()] for ip_address, line in sorted(records)],
+    }
+    _touch_entry(state, "production_snapshots", snapshot_key)
+
+
+def get_production_snapshot(
+    state: RuntimeState,
+    rr: str,
+    record_type: str,
+    max_age_hours: int,
+) -> set[tuple[str, str]] | None:
+    """返回未过期且尚未用于回滚的已知良好快照。"""
+    snapshot = state.production_snapshots.get(_make_snapshot_key(rr, record_type))
+    if not snapshot or snapshot.get("rolled_back"):
+        return None
+    if int(time.time()) - int(snapshot.get("saved_at", 0)) > max_age_hours * 3600:
+        return None
+    return {(str(ip_address), str(line)) for ip_address, line in snapshot.get("records", [])}
+
+
+def mark_production_snapshot_rolled_back(state: RuntimeState, rr: str, record_type: str) -> None:
+    snapshot = state.production_snapshots.get(_make_snapshot_key(rr, record_type))
+    if snapshot is not None:
+        snapshot["rolled_back"] = True
 
 
 def prune_expired_runtime_state(state: RuntimeState, now_timestamp: int | None = None) -> None:
@@ -105,9 +432,83 @@ def prune_expired_runtime_state(state: RuntimeState, now_timestamp: int | None =
         state.record_rotation_cooldowns.pop(record_key, None)
 
 
+def evict_stale_runtime_state(
+    state: RuntimeState,
+    ttl_hours: int,
+    max_entries_per_map: int,
+    now_timestamp: int | None = None,
+) -> int:
+    """按最近访问时间淘汰超过 TTL 的键，并把每张表裁剪到 max_entries_per_map 个最近访问的键。"""
+    current_timestamp = now_timestamp if now_timestamp is not None else int(time.time())
+    _sync_entry_timestamps(state, current_timestamp)
+    evicted_count = 0
+    for map_name in STATE_MAP_NAMES:
+        values = getattr(state, map_name)
+        touched_at = state.entry_touched_at[map_name]
+        # 轮换冷却自带到期时间，只参与数量裁剪，不按 TTL 提前淘汰。
+        expired_keys = (
+            []
+            if map_name == "record_rotation_cooldowns"
+            else [key for key, touched in touched_at.items() if current_timestamp - touched > ttl_hours * 3600]
+        )
+        expired_key_set = set(expired_keys)
+        remaining_keys = sorted((key for key in touched_at if key not in expired_key_set), key=lambda key: touched_at[key])
+        overflow_keys = remaining_keys[: max(len(remaining_keys) - max_entries_per_map, 0)]
+        for key in [*expired_keys, *overflow_keys]:
+            values.pop(key, None)
+            touched_at.pop(key, None)
+        if expired_keys or overflow_keys:
+            logger.info(
+                "淘汰过期运行态: map=%s expired=%s overflow=%s remaining=%s",
+                map_name,
+                len(expired_keys),
+                len(overflow_keys),
+                len(values),
+            )
+        evicted_count += len(expired_keys) + len(overflow_keys)
+    return evicted_count
+
+
+def compact_record_state(
+    state: RuntimeState,
+    live_records_by_scope: dict[str, set[tuple[str, str]] | None],
+) -> int:
+    """按 zone 快照压缩记录级运行态。
+
+    live_records_by_scope 的键是仍在管理的运行态作用域（RuntimeConfig.state_key），值是该 RR 当前的
+    (ip, line) 集合；值为 None 表示本轮未拿到快照，只保留该作用域下的键而不做比对。
+    不再管理的作用域下的所有键都会被丢弃；轮换冷却针对已删除的记录，只按作用域清理。
+    """
+    dropped_count = 0
+    for map_name in ("record_anomaly_scores", "record_latency_samples", "record_rotation_cooldowns"):
+        values = getattr(state, map_name)
+        for record_key in list(values):
+            rr, _, remainder = record_key.partition("|")
+            line_key, _, ip_address = remainder.partition("|")
+            if rr not in live_records_by_scope:
+                stale = True
+            elif map_name == "record_rotation_cooldowns" or live_records_by_scope[rr] is None:
+                stale = False
+            else:
+                stale = (ip_address, line_key) not in live_records_by_scope[rr]
+            if stale:
+                values.pop(record_key, None)
+                dropped_count += 1
+
+    for snapshot_key in list(state.production_snapshots):
+        if snapshot_key.partition("|")[0] not in live_records_by_scope:
+            state.production_snapshots.pop(snapshot_key, None)
+            dropped_count += 1
+
+    if dropped_count:
+        logger.info("已按 zone 快照压缩运行态: dropped=%s", dropped_count)
+    return dropped_count
+
+
 def set_record_rotation_cooldown(state: RuntimeState, rr: str, line: str, ip_address: str, duration_hours: int) -> None:
-    expires_at = int(time.time()) + duration_hours * 3600
-    state.record_rotation_cooldowns[make_record_key(rr, line, ip_address)] = expires_at
+    record_key = make_record_key(rr, line, ip_address)
+    state.record_rotation_cooldowns[record_key] = int(time.time()) + duration_hours * 3600
+    _touch_entry(state, "record_rotation_cooldowns", record_key)
 
 
 def is_record_in_rotation_cooldown(state: RuntimeState, rr: str, line: str, ip_address: str) -> bool:
@@ -115,24 +516,15 @@ def is_record_in_rotation_cooldown(state: RuntimeState, rr: str, line: str, ip_a
     return make_record_key(rr, line, ip_address) in state.record_rotation_cooldowns
 
 
-def increment_line_pollution_score(state: RuntimeState, line: str, score_cap: int) -> int:
+def set_line_pollution_score(state: RuntimeState, line: str, score: float) -> None:
+    """保存线路的污染变点统计量；归零时删除键。"""
     line_key = line.lower()
-    next_score = min(state.line_pollution_scores.get(line_key, 0) + 1, score_cap)
-    state.line_pollution_scores[line_key] = next_score
-    return next_score
-
-
-def decay_line_pollution_scores(state: RuntimeState, active_lines: set[str]) -> None:
-    normalized_active_lines = {line.lower() for line in active_lines}
-    for line_key, score in list(state.line_pollution_scores.items()):
-        if line_key in normalized_active_lines:
-            continue
-        next_score = max(score - 1, 0)
-        if next_score == 0:
-            state.line_pollution_scores.pop(line_key, None)
-        else:
-            state.line_pollution_scores[line_key] = next_score
+    if score <= 0:
+        state.line_pollution_scores.pop(line_key, None)
+        return
+    state.line_pollution_scores[line_key] = score
+    _touch_entry(state, "line_pollution_scores", line_key)
 
 
-def get_line_pollution_score(state: RuntimeState, line: str) -> int:
-    return state.line_pollution_scores.get(line.lower(), 0)
+def get_line_pollution_score(state: RuntimeState, line: str) -> float:
+    return state.line_pollution_scores.get(line.lower(), 0.0)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from .project_config import REPO_ROOT
+from .project_constants import STAGE_CHECKPOINT_FILENAME, STAGE_CHECKPOINT_TTL_SECONDS
+
+
+logger = logging.getLogger(__name__)
+CHECKPOINT_FILE_PATH = REPO_ROOT / STAGE_CHECKPOINT_FILENAME
+
+
+def config_fingerprint(config: object) -> str:
+    return hashlib.sha1(repr(config).encode("utf-8")).hexdigest()
+
+
+class StageCheckpoint:
+    """按阶段缓存本轮中间结果；重启后在 TTL 内且配置未变时从最后完成的阶段继续。"""
+
+    def __init__(
+        self,
+        path: Path = CHECKPOINT_FILE_PATH,
+        fingerprint: str = "",
+        ttl_seconds: int = STAGE_CHECKPOINT_TTL_SECONDS,
+    ):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.ttl_seconds = ttl_seconds
+        self._stages: dict[str, dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as exc:
+            logger.warning("读取阶段检查点失败，将从头执行: path=%s error=%s", self.path, exc)
+            return
+
+        if not isinstance(payload, dict) or payload.get("fingerprint") != self.fingerprint:
+            return
+        stages = payload.get("stages", {})
+        if isinstance(stages, dict):
+            self._stages = {str(key): value for key, value in stages.items() if isinstance(value, dict)}
+
+    def _save(self) -> None:
+        payload = {"fingerprint": self.fingerprint, "stages": self._stages}
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            temp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(temp_path, self.path)
+        except Exception as exc:
+            logger.warning("保存阶段检查点失败: path=%s error=%s", self.path, exc)
+
+    def get(self, stage: str) -> Any | None:
+        entry = self._stages.get(stage)
+        if entry is None:
+            return None
+        if time.time() - float(entry.get("saved_at", 0)) > self.ttl_seconds:
+            return None
+        logger.info("复用阶段检查点: stage=%s", stage)
+        return entry.get("payload")
+
+    def put(self, stage: str, payload: Any) -> None:
+        self._stages[stage] = {"saved_at": int(time.time()), "payload": payload}
+        self._save()
+
+    def clear(self) -> None:
+        self._stages = {}
+        try:
+            self.path.unlink(missing_ok=True)
+        except Exception as exc:
+            logger.warning("清理阶段检查点失败: path=%s error=%s", self.path, exc)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import logging
+import statistics
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from .measurement_store import MeasurementStats, MeasurementStore, hour_of_week
+from .project_constants import (
+    TIME_PROFILE_HISTORY_DAYS,
+    TIME_PROFILE_LOOKAHEAD_HOURS,
+    TIME_PROFILE_MIN_BUCKET_SAMPLES,
+    TIME_PROFILE_MIN_COVERED_HOURS,
+    TIME_PROFILE_PEAK_LATENCY_RATIO,
+    TIME_PROFILE_PRIOR_SAMPLES,
+)
+from .workflow_rules import get_probe_profile
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeakOutlook:
+    """未来几小时内按历史规律将进入高峰的线路，以及各 IP 在这些高峰时段的预期延迟。"""
+
+    peak_hours_by_line: dict[str, list[int]] = field(default_factory=dict)
+    baseline_latency_by_line: dict[str, float] = field(default_factory=dict)
+    line_peak_latency: dict[str, float] = field(default_factory=dict)
+    ip_peak_latency: dict[tuple[str, str], float] = field(default_factory=dict)
+
+    def peak_latency(self, ip_address: str, line_name: str) -> float | None:
+        """线路即将进入高峰时返回该 IP 的高峰预期延迟；没有该 IP 的历史时按线路高峰水平估计。"""
+        line_key = line_name.lower()
+        if line_key not in self.peak_hours_by_line:
+            return None
+        return self.ip_peak_latency.get((ip_address, line_key), self.line_peak_latency[line_key])
+
+    def adjust_latency(self, ip_address: str, line_name: str, latency: float) -> float:
+        """高峰将至时，把预期延迟提高到该 IP 的高峰水平；扛得住高峰的 IP 基本不受影响。"""
+        peak_latency = self.peak_latency(ip_address, line_name)
+        return latency if peak_latency is None else max(latency, peak_latency)
+
+    def adjust_scores(self, scores: Mapping[tuple[str, str], float]) -> dict[tuple[str, str], float]:
+        return {
+            (ip_address, line_name): self.adjust_latency(ip_address, line_name, score)
+            for (ip_address, line_name), score in scores.items()
+        }
+
+
+def effective_latency(stats: MeasurementStats, line_name: str) -> float | None:
+    """把一组观测折算为单个预期延迟：失败按删除阈值计，与跨轮评分的口径一致。"""
+    if stats.samples == 0:
+        return None
+    failure_latency = get_probe_profile(line_name).second_pass_delete_min_total_time_seconds
+    mean_total_time = stats.mean_total_time
+    if mean_total_time is None:
+        return failure_latency
+    return stats.pass_rate * min(mean_total_time, failure_latency) + (1 - stats.pass_rate) * failure_latency
+
+
+def _merge_stats(target: dict[int, MeasurementStats], bucket: int, stats: MeasurementStats) -> None:
+    target.setdefault(bucket, MeasurementStats()).add(stats.samples, stats.passes, stats.timed_samples, stats.total_time_sum)
+
+
+def _bucket_latency(
+    line_name: str,
+    week_stats: dict[int, MeasurementStats],
+    day_stats: dict[int, MeasurementStats],
+    week_hour: int,
+) -> float | None:
+    """优先使用同一周内小时的历史；样本不足时退回到跨星期合并的同一时刻。"""
+    for stats in (week_stats.get(week_hour), day_stats.get(week_hour % 24)):
+        if stats is not None and stats.samples >= TIME_PROFILE_MIN_BUCKET_SAMPLES:
+            return effective_latency(stats, line_name)
+    return None
+
+
+def build_peak_outlook(
+    store: MeasurementStore,
+    now_timestamp: int | None = None,
+    lookahead_hours: int = TIME_PROFILE_LOOKAHEAD_HOURS,
+    history_days: int = TIME_PROFILE_HISTORY_DAYS,
+) -> PeakOutlook:
+    """从测量历史预测未来 lookahead_hours 小时内的高峰时段。
+
+    每条线路先按本地时刻汇总出 24 小时的典型延迟并取中位数作为基线；未来某小时的历史延迟达到基线的
+    TIME_PROFILE_PEAK_LATENCY_RATIO 倍即视为高峰。各 IP 的高峰延迟取其在这些时刻的历史，按样本数向
+    线路高峰水平收缩，避免少量样本决定结果。
+    """
+    current_timestamp = now_timestamp if now_timestamp is not None else int(time.time())
+    stats_by_record = store.query_hour_of_week_stats(since=current_timestamp - history_days * 86400)
+    upcoming_hours = [hour_of_week(current_timestamp + offset * 3600) for offset in range(1, lookahead_hours + 1)]
+
+    week_stats_by_line: dict[str, dict[int, MeasurementStats]] = {}
+    records_by_line: dict[str, list[tuple[str, dict[int, MeasurementStats]]]] = {}
+    for (ip_address, line_name), buckets in stats_by_record.items():
+        records_by_line.setdefault(line_name, []).append((ip_address, buckets))
+        line_buckets = week_stats_by_line.setdefault(line_name, {})
+        for week_hour, stats in buckets.items():
+            _merge_stats(line_buckets, week_hour, stats)
+
+    outlook = PeakOutlook()
+    for line_name, week_stats in week_stats_by_line.items():
+        day_stats: dict[int, MeasurementStats] = {}
+        for week_hour, stats in week_stats.items():
+            _merge_stats(day_stats, week_hour % 24, stats)
+        hourly_latencies = [
+            effective_latency(stats, line_name)
+            for stats in day_stats.values()
+            if stats.samples >= TIME_PROFILE_MIN_BUCKET_SAMPLES
+        ]
+        if len(hourly_latencies) < TIME_PROFILE_MIN_COVERED_HOURS:
+            continue
+
+        baseline_latency = statistics.median(hourly_latencies)
+        peak_latencies = {}
+        for week_hour in upcoming_hours:
+            latency = _bucket_latency(line_name, week_stats, day_stats, week_hour)
+            if latency is not None and latency >= baseline_latency * TIME_PROFILE_PEAK_LATENCY_RATIO:
+                peak_latencies[week_hour] = latency
+        if not peak_latencies:
+            continue
+
+        line_peak_latency = statistics.fmean(peak_latencies.values())
+        outlook.peak_hours_by_line[line_name] = sorted(peak_latencies)
+        outlook.baseline_latency_by_line[line_name] = baseline_latency
+        outlook.line_peak_latency[line_name] = line_peak_latency
+        peak_hours_of_day = {week_hour % 24 for week_hour in peak_latencies}
+        for ip_address, buckets in records_by_line[line_name]:
+            ip_stats = MeasurementStats()
+            for week_hour, stats in buckets.items():
+                if week_hour % 24 in peak_hours_of_day:
+                    ip_stats.add(stats.samples, stats.passes, stats.timed_samples, stats.total_time_sum)
+            ip_latency = effective_latency(ip_stats, line_name)
+            if ip_latency is None:
+                continue
+            outlook.ip_peak_latency[(ip_address, line_name)] = (
+                ip_stats.samples * ip_latency + TIME_PROFILE_PRIOR_SAMPLES * line_peak_latency
+            ) / (ip_stats.samples + TIME_PROFILE_PRIOR_SAMPLES)
+    return outlook
+
+
+def log_peak_outlook(outlook: PeakOutlook) -> None:
+    for line_name, peak_hours in sorted(outlook.peak_hours_by_line.items()):
+        logger.info(
+            "预计线路即将进入高峰，生产池提前偏向高峰表现好的 IP: line=%s hours=%s baseline=%.3fs peak=%.3fs",
+            line_name,
+            [f"周{'一二三四五六日'[week_hour // 24]}{week_hour % 24:02d}时" for week_hour in peak_hours],
+            outlook.baseline_latency_by_line[line_name],
+            outlook.line_peak_latency[line_name],
+        )
@@ -15,6 +15,8 @@ from .logging_utils import configure_logging
 
 logger = logging.getLogger(__name__)
 ITDOG_URL = "https://www.itdog.cn/http/"
+ITDOG_IPV6_URL = "https://www.itdog.cn/http_ipv6/"
+ITDOG_URLS_BY_RECORD_TYPE = {"A": ITDOG_URL, "AAAA": ITDOG_IPV6_URL}
 CESU_URL = "https://www.cesu.ai/http_batch"
 PLAYWRIGHT_LAUNCH_ARGS = [
     "--disable-blink-features=AutomationControlled",
@@ -146,14 +148,14 @@ async def _create_itdog_page(context, test_finished_event: asyncio.Event):
     return page
 
 
-async def _open_itdog_page(context, test_finished_event: asyncio.Event):
+async def _open_itdog_page(context, test_finished_event: asyncio.Event, itdog_url: str = ITDOG_URL):
     last_exception = None
 
     for attempt_index in range(1, ITDOG_PAGE_OPEN_ATTEMPTS + 1):
         page = await _create_itdog_page(context, test_finished_event)
         try:
-            logger.info("打开 IT-Dog 页面: attempt=%s/%s", attempt_index, ITDOG_PAGE_OPEN_ATTEMPTS)
-            await page.goto(ITDOG_URL, timeout=60000, wait_until="domcontentloaded")
+            logger.info("打开 IT-Dog 页面: url=%s attempt=%s/%s", itdog_url, attempt_index, ITDOG_PAGE_OPEN_ATTEMPTS)
+            await page.goto(itdog_url, timeout=60000, wait_until="domcontentloaded")
             return page
         except Exception as exc:
             last_exception = exc
@@ -261,9 +263,10 @@ async def _run_itdog_workflow(page, test_finished_event: asyncio.Event, target_h
     return await _extract_itdog_results(page)
 
 
-async def run_itdog_test(target_host: str, custom_dns: str):
-    """执行 IT-Dog 自动测速。"""
+async def run_itdog_test(target_host: str, custom_dns: str, record_type: str = "A"):
+    """执行 IT-Dog 自动测速；record_type=AAAA 时使用 IPv6 节点测速页。"""
     base_user_data_dir = _get_user_data_dir("itdog_userdata")
+    itdog_url = ITDOG_URLS_BY_RECORD_TYPE.get(record_type, ITDOG_URL)
 
     async with async_playwright() as playwright:
         for attempt_index in range(1, ITDOG_MAX_ATTEMPTS + 1):
@@ -276,7 +279,7 @@ async def run_itdog_test(target_host: str, custom_dns: str):
                 _cleanup_chromium_singleton_files(user_data_dir)
                 context = await _launch_persistent_context(playwright, user_data_dir)
                 await context.add_init_script(ANTI_BOT_INIT_SCRIPT)
-                page = await _open_itdog_page(context, test_finished_event)
+                page = await _open_itdog_page(context, test_finished_event, itdog_url)
                 final_results = await _run_itdog_workflow(page, test_finished_event, target_host, custom_dns)
                 if final_results:
                     return final_results
@@ -2,36 +2,258 @@ from __future__ import annotations
 
 import json
 import logging
-import random
+import math
+import statistics
+from collections.abc import Collection, Mapping
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 from .project_constants import (
+    DNS_WEIGHT_MAX,
+    DNS_WEIGHT_MIN,
+    DNS_WEIGHT_UNMEASURED,
     GLOBAL_FREEZE_ANOMALY_RATIO,
     GLOBAL_FREEZE_MIN_LINES,
+    DEFAULT_LINE,
+    DETECTION_POINT_CITY_TO_PROVINCE,
     DETECTION_POINT_PREFIX_TO_LINE,
+    FINE_GRAINED_LINE_PREFIX,
     FIRST_PASS_MAX_TOTAL_TIME_SECONDS,
+    FIRST_PASS_MIN_SUCCESS_RATE,
     FIRST_PASS_REQUIRED_STATUS,
     MAX_BAD_RECORDS_BEFORE_TRUNCATION,
     MAX_BAD_RECORDS_TO_DELETE,
     MAX_SELECTED_IPS_PER_CARRIER,
+    OVERSEA_DETECTION_POINT_KEYWORDS,
+    OVERSEA_FIRST_PASS_MAX_TOTAL_TIME_SECONDS,
+    OVERSEA_LINE,
+    OVERSEA_SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS,
+    OVERSEA_TRACK_LINES,
+    PROVINCE_LINE_CODES,
     SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS,
+    VALIDATION_MIN_SUCCESS_RATE,
 )
 
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class RecordAggregate:
+    node_count: int
+    success_count: int
+    p50_total_time: float | None
+    p90_total_time: float | None
+    node_weight: float = 0.0
+    success_weight: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        """按检测点可靠度加权的成功率；未提供权重时等同于成功检测点占比。"""
+        return self.success_weight / self.node_weight if self.node_weight > 0 else 0.0
+
+
 @dataclass
 class ValidationSummary:
     healthy_records: set[tuple[str, str]] = field(default_factory=set)
     anomalous_records: set[tuple[str, str]] = field(default_factory=set)
-    unresolved_anomaly_points: int = 0
-    total_points: int = 0
-    healthy_points: int = 0
-    anomalous_points: int = 0
+    unresolved_anomaly_points: float = 0
+    total_points: float = 0
+    healthy_points: float = 0
+    anomalous_points: float = 0
     lines_seen: set[str] = field(default_factory=set)
     lines_with_healthy: set[str] = field(default_factory=set)
     lines_with_anomaly: set[str] = field(default_factory=set)
+    record_total_times: dict[tuple[str, str], list[float]] = field(default_factory=dict)
+    record_aggregates: dict[tuple[str, str], RecordAggregate] = field(default_factory=dict)
+    line_aggregates: dict[str, RecordAggregate] = field(default_factory=dict)
+    excluded_points: int = 0
+
+
+@dataclass(frozen=True)
+class ProbeObservation:
+    ip_address: str
+    line_name: str
+    detection_point: str
+    status: str
+    total_time_seconds: float | None
+    passed: bool
+
+
+@dataclass(frozen=True)
+class ProbeProfile:
+    first_pass_max_total_time_seconds: float
+    second_pass_delete_min_total_time_seconds: float
+
+
+MAINLAND_PROBE_PROFILE = ProbeProfile(FIRST_PASS_MAX_TOTAL_TIME_SECONDS, SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS)
+OVERSEA_PROBE_PROFILE = ProbeProfile(OVERSEA_FIRST_PASS_MAX_TOTAL_TIME_SECONDS, OVERSEA_SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS)
+
+
+def get_probe_profile(line_name: str) -> ProbeProfile:
+    """海外/默认线路的检测点离 Cloudflare 节点更远，使用更宽松的延迟阈值。"""
+    if line_name.lower() in OVERSEA_TRACK_LINES:
+        return OVERSEA_PROBE_PROFILE
+    return MAINLAND_PROBE_PROFILE
+
+
+def get_parent_line(line_name: str) -> str:
+    """细分线路（如 cn_telecom_guangdong）返回所属运营商线路，海外线路返回默认线路，其余线路原样返回。"""
+    parts = line_name.lower().split("_", 2)
+    if len(parts) == 3 and parts[0] == FINE_GRAINED_LINE_PREFIX and parts[1] in DETECTION_POINT_PREFIX_TO_LINE.values():
+        return parts[1]
+    if line_name.lower() == OVERSEA_LINE:
+        return DEFAULT_LINE
+    return line_name.lower()
+
+
+def is_fine_grained_line(line_name: str) -> bool:
+    parts = line_name.lower().split("_", 2)
+    return (
+        len(parts) == 3
+        and parts[0] == FINE_GRAINED_LINE_PREFIX
+        and parts[1] in DETECTION_POINT_PREFIX_TO_LINE.values()
+        and parts[2] in PROVINCE_LINE_CODES.values()
+    )
+
+
+@lru_cache(maxsize=1024)
+def _resolve_detection_point_province(location: str) -> str | None:
+    for province_name, province_code in PROVINCE_LINE_CODES.items():
+        if province_name in location:
+            return province_code
+    for city_name, province_name in DETECTION_POINT_CITY_TO_PROVINCE.items():
+        if city_name in location:
+            return PROVINCE_LINE_CODES[province_name]
+    return None
+
+
+def classify_detection_point(
+    detection_point: str,
+    fine_grained_lines: Collection[str] = (),
+    oversea_lines: Collection[str] = (),
+) -> tuple[str | None, str | None]:
+    """返回检测点对应的 (运营商线路, 已启用的细分线路)；未启用对应省份线路时第二项为 None。
+
+    启用海外线路时，境外检测点归入海外轨道的首选线路（优先 oversea，其次 default）。
+    """
+    for carrier_prefix, line_name in DETECTION_POINT_PREFIX_TO_LINE.items():
+        if not detection_point.startswith(carrier_prefix):
+            continue
+        if not fine_grained_lines:
+            return line_name, None
+
+        province_code = _resolve_detection_point_province(detection_point[len(carrier_prefix):])
+        if province_code is None:
+            return line_name, None
+        fine_line = f"{FINE_GRAINED_LINE_PREFIX}_{line_name}_{province_code}"
+        return line_name, fine_line if fine_line in fine_grained_lines else None
+
+    if oversea_lines and any(keyword in detection_point for keyword in OVERSEA_DETECTION_POINT_KEYWORDS):
+        return _primary_oversea_line(oversea_lines), None
+    return None, None
+
+
+def _primary_oversea_line(oversea_lines: Collection[str]) -> str:
+    return next(line_name for line_name in OVERSEA_TRACK_LINES if line_name in oversea_lines)
+
+
+def _empty_line_selection(fine_grained_lines: Collection[str], oversea_lines: Collection[str] = ()) -> dict[str, list[str]]:
+    selection: dict[str, list[str]] = {"mobile": [], "unicom": [], "telecom": []}
+    selection.update({line_name: [] for line_name in sorted(fine_grained_lines)})
+    selection.update({line_name: [] for line_name in OVERSEA_TRACK_LINES if line_name in oversea_lines})
+    return selection
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float | None:
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower_index = math.floor(position)
+    upper_index = min(lower_index + 1, len(sorted_values) - 1)
+    return sorted_values[lower_index] + (sorted_values[upper_index] - sorted_values[lower_index]) * (position - lower_index)
+
+
+def _build_record_aggregate(
+    node_count: int,
+    success_times: list[float],
+    node_weight: float | None = None,
+    success_weight: float | None = None,
+) -> RecordAggregate:
+    sorted_times = sorted(success_times)
+    return RecordAggregate(
+        node_count=node_count,
+        success_count=len(sorted_times),
+        p50_total_time=_percentile(sorted_times, 0.5),
+        p90_total_time=_percentile(sorted_times, 0.9),
+        node_weight=float(node_count) if node_weight is None else node_weight,
+        success_weight=float(len(sorted_times)) if success_weight is None else success_weight,
+    )
+
+
+def _is_successful_probe(status: str, total_time_seconds: float | None, validation: bool) -> bool:
+    """第一次测速以 530 视为连通，第二次验证只要不失败即视为连通；两者都要求有可解析的耗时。"""
+    if total_time_seconds is None:
+        return False
+    if validation:
+        return status != "失败"
+    return status == FIRST_PASS_REQUIRED_STATUS
+
+
+def aggregate_probe_observations(
+    observations: list[ProbeObservation],
+    validation: bool = False,
+    include_parent_lines: bool = False,
+    node_weights: Mapping[str, float] | None = None,
+) -> dict[tuple[str, str], RecordAggregate]:
+    """一次遍历汇总每个 (ip, line) 的检测点数、成功率与 p50/p90 总耗时。
+
+    include_parent_lines 为 True 时，细分线路的观测同时计入所属运营商线路。node_weights 中权重为 0
+    的检测点被排除，其余检测点按权重计入成功率。
+    """
+    node_weights = node_weights or {}
+    node_counts: dict[tuple[str, str], int] = {}
+    weight_totals: dict[tuple[str, str], list[float]] = {}
+    success_times: dict[tuple[str, str], list[float]] = {}
+    for observation in observations:
+        node_weight = node_weights.get(observation.detection_point, 1.0)
+        if node_weight <= 0:
+            continue
+        line_names = [observation.line_name]
+        if include_parent_lines and is_fine_grained_line(observation.line_name):
+            line_names.append(get_parent_line(observation.line_name))
+        is_successful = _is_successful_probe(observation.status, observation.total_time_seconds, validation)
+        for line_name in line_names:
+            record_key = (observation.ip_address, line_name)
+            node_counts[record_key] = node_counts.get(record_key, 0) + 1
+            weight_total = weight_totals.setdefault(record_key, [0.0, 0.0])
+            weight_total[0] += node_weight
+            if is_successful:
+                weight_total[1] += node_weight
+                success_times.setdefault(record_key, []).append(observation.total_time_seconds)
+    return {
+        record_key: _build_record_aggregate(node_count, success_times.get(record_key, []), *weight_totals[record_key])
+        for record_key, node_count in node_counts.items()
+    }
+
+
+def is_first_pass_qualified(aggregate: RecordAggregate, profile: ProbeProfile = MAINLAND_PROBE_PROFILE) -> bool:
+    """多数检测点连通、中位耗时低于筛选阈值，且 p90 不超过删除阈值，才算达标。"""
+    return (
+        aggregate.success_rate >= FIRST_PASS_MIN_SUCCESS_RATE
+        and aggregate.p50_total_time is not None
+        and aggregate.p50_total_time < profile.first_pass_max_total_time_seconds
+        and aggregate.p90_total_time is not None
+        and aggregate.p90_total_time < profile.second_pass_delete_min_total_time_seconds
+    )
+
+
+def is_validation_aggregate_healthy(aggregate: RecordAggregate, profile: ProbeProfile = MAINLAND_PROBE_PROFILE) -> bool:
+    return (
+        aggregate.success_rate >= VALIDATION_MIN_SUCCESS_RATE
+        and aggregate.p50_total_time is not None
+        and aggregate.p50_total_time < profile.second_pass_delete_min_total_time_seconds
+    )
 
 
 def parse_total_time_seconds(total_time_value: str) -> float | None:
@@ -44,63 +266,83 @@ def parse_total_time_seconds(total_time_value: str) -> float | None:
         return None
 
 
-def filter_and_select_ips(json_string: str, count_per_carrier: int = MAX_SELECTED_IPS_PER_CARRIER) -> dict[str, list[str]]:
-    """从 IT-Dog 的 JSON 测试结果中为每个运营商筛选 IP。"""
+def filter_and_select_ips(
+    json_string: str,
+    count_per_carrier: int = MAX_SELECTED_IPS_PER_CARRIER,
+    fine_grained_lines: Collection[str] = (),
+    oversea_lines: Collection[str] = (),
+    latency_scores: Mapping[tuple[str, str], float] | None = None,
+    node_weights: Mapping[str, float] | None = None,
+) -> dict[str, list[str]]:
+    """从 IT-Dog 的 JSON 测试结果中为每个运营商筛选 IP；启用细分线路时同时为对应省份线路筛选。
+
+    每个 (ip, line) 按全部检测点的汇总判定是否达标（见 is_first_pass_qualified），单个快节点不足以
+    让慢 IP 入选。达标 IP 按 latency_scores 中的跨轮评分从低到高取前 count_per_carrier 个；没有评分的
+    IP 按本次测速的 p50 耗时排序。node_weights 为检测点可靠度权重，权重为 0 的检测点不参与判定。
+    启用海外线路时，境外检测点按海外探测阈值筛选，结果同时提供给所有已启用的海外轨道线路。
+    """
+    fine_grained_lines = frozenset(fine_grained_lines)
+    oversea_lines = frozenset(oversea_lines)
     if not json_string:
-        return {"mobile": [], "unicom": [], "telecom": []}
+        return _empty_line_selection(fine_grained_lines, oversea_lines)
 
     try:
         results = json.loads(json_string)
     except json.JSONDecodeError:
         logger.error("解析测速结果 JSON 时出错。")
-        return {"mobile": [], "unicom": [], "telecom": []}
+        return _empty_line_selection(fine_grained_lines, oversea_lines)
 
-    qualified_ips = {"mobile": [], "unicom": [], "telecom": []}
-    for item in results:
-        detection_point = item.get("检测点", "")
-        status = item.get("状态", "")
-        total_time_seconds = parse_total_time_seconds(item.get("总耗时", ""))
-        ip_address = item.get("响应IP", "")
-
-        if not ip_address or ip_address == "解析失败" or status != FIRST_PASS_REQUIRED_STATUS:
-            continue
-        if total_time_seconds is None or total_time_seconds >= FIRST_PASS_MAX_TOTAL_TIME_SECONDS:
-            continue
-
-        for carrier_prefix, line_name in DETECTION_POINT_PREFIX_TO_LINE.items():
-            if detection_point.startswith(carrier_prefix):
-                qualified_ips[line_name].append(ip_address)
-                break
+    observations = _observations_from_results(results, False, fine_grained_lines, oversea_lines)
+    qualified_ips = _empty_line_selection(fine_grained_lines, oversea_lines)
+    aggregates = aggregate_probe_observations(observations, include_parent_lines=True, node_weights=node_weights)
+    for (ip_address, line_name), aggregate in sorted(aggregates.items()):
+        if line_name in qualified_ips and is_first_pass_qualified(aggregate, get_probe_profile(line_name)):
+            qualified_ips[line_name].append(ip_address)
 
+    latency_scores = latency_scores or {}
     final_selection = {}
     for carrier, ips in qualified_ips.items():
-        unique_ips = sorted(set(ips))
-        if len(unique_ips) > count_per_carrier:
-            final_selection[carrier] = random.sample(unique_ips, count_per_carrier)
-        else:
-            final_selection[carrier] = unique_ips
-
-    return final_selection
+        ranked_ips = sorted(
+            ips,
+            key=lambda ip_address: (
+                latency_scores.get((ip_address, carrier), aggregates[(ip_address, carrier)].p50_total_time),
+                ip_address,
+            ),
+        )
+        final_selection[carrier] = ranked_ips[:count_per_carrier]
 
+    if oversea_lines:
+        primary_oversea_line = _primary_oversea_line(oversea_lines)
+        for line_name in oversea_lines:
+            final_selection[line_name] = list(final_selection[primary_oversea_line])
 
-def _classify_validation_line(detection_point: str) -> str | None:
-    for carrier_prefix, line_name in DETECTION_POINT_PREFIX_TO_LINE.items():
-        if detection_point.startswith(carrier_prefix):
-            return line_name
-    return None
+    return final_selection
 
 
-def _is_validation_observation_anomalous(status: str, total_time_seconds: float | None) -> bool:
+def _is_validation_observation_anomalous(
+    status: str,
+    total_time_seconds: float | None,
+    profile: ProbeProfile = MAINLAND_PROBE_PROFILE,
+) -> bool:
     if status == "失败":
         return True
     if total_time_seconds is None:
         return True
-    if total_time_seconds is not None and total_time_seconds >= SECOND_PASS_DELETE_MIN_TOTAL_TIME_SECONDS:
+    if total_time_seconds is not None and total_time_seconds >= profile.second_pass_delete_min_total_time_seconds:
         return True
     return False
 
 
-def summarize_validation_results(json_string: str) -> ValidationSummary | None:
+def summarize_validation_results(
+    json_string: str,
+    fine_grained_lines: Collection[str] = (),
+    oversea_lines: Collection[str] = (),
+    node_weights: Mapping[str, float] | None = None,
+) -> ValidationSummary | None:
+    """汇总第二次测速结果；检测点计数按 node_weights 加权，权重为 0 的检测点计入 excluded_points 后忽略。"""
+    node_weights = node_weights or {}
+    fine_grained_lines = frozenset(fine_grained_lines)
+    oversea_lines = frozenset(oversea_lines)
     try:
         results = json.loads(json_string)
     except json.JSONDecodeError:
@@ -108,48 +350,122 @@ def summarize_validation_results(json_string: str) -> ValidationSummary | None:
         return None
 
     summary = ValidationSummary()
-    record_observations: dict[tuple[str, str], dict[str, int]] = {}
-
-    for item in results:
-        line_name = _classify_validation_line(item.get("检测点", ""))
-        if line_name is None:
+    observations = _observations_from_results(results, True, fine_grained_lines, oversea_lines, include_unresolved=True)
+    # 线路级汇总把解析失败的检测点也计为失败，供线路变点检测使用。
+    line_node_counts: dict[str, int] = {}
+    line_weight_totals: dict[str, list[float]] = {}
+    line_success_times: dict[str, list[float]] = {}
+    for observation in observations:
+        node_weight = node_weights.get(observation.detection_point, 1.0)
+        if node_weight <= 0:
+            summary.excluded_points += 1
             continue
 
-        ip_address = item.get("响应IP")
-        status = item.get("状态", "")
-        total_time_seconds = parse_total_time_seconds(item.get("总耗时", ""))
-        is_anomalous = _is_validation_observation_anomalous(status, total_time_seconds)
-
-        summary.total_points += 1
+        line_name = observation.line_name
+        summary.total_points += node_weight
         summary.lines_seen.add(line_name)
-
-        if not ip_address or ip_address == "解析失败":
-            summary.anomalous_points += 1
-            summary.unresolved_anomaly_points += 1
+        line_node_counts[line_name] = line_node_counts.get(line_name, 0) + 1
+        line_weight_total = line_weight_totals.setdefault(line_name, [0.0, 0.0])
+        line_weight_total[0] += node_weight
+        if observation.ip_address and _is_successful_probe(observation.status, observation.total_time_seconds, True):
+            line_weight_total[1] += node_weight
+            line_success_times.setdefault(line_name, []).append(observation.total_time_seconds)
+        if not observation.ip_address:
+            summary.anomalous_points += node_weight
+            summary.unresolved_anomaly_points += node_weight
             summary.lines_with_anomaly.add(line_name)
             continue
 
-        record_key = (ip_address, line_name)
-        observation = record_observations.setdefault(record_key, {"healthy": 0, "anomalous": 0})
-
-        if is_anomalous:
-            summary.anomalous_points += 1
-            summary.lines_with_anomaly.add(line_name)
-            observation["anomalous"] += 1
-        else:
-            summary.healthy_points += 1
+        if observation.total_time_seconds is not None:
+            summary.record_total_times.setdefault((observation.ip_address, line_name), []).append(observation.total_time_seconds)
+        if observation.passed:
+            summary.healthy_points += node_weight
             summary.lines_with_healthy.add(line_name)
-            observation["healthy"] += 1
+        else:
+            summary.anomalous_points += node_weight
+            summary.lines_with_anomaly.add(line_name)
 
-    for record_key, observation in record_observations.items():
-        if observation["healthy"] > 0:
+    # 记录的健康与否由全部检测点的汇总决定，单个健康节点不足以挽回多数失败或偏慢的记录。
+    summary.record_aggregates = aggregate_probe_observations(
+        [observation for observation in observations if observation.ip_address],
+        validation=True,
+        node_weights=node_weights,
+    )
+    for record_key, aggregate in summary.record_aggregates.items():
+        if is_validation_aggregate_healthy(aggregate, get_probe_profile(record_key[1])):
             summary.healthy_records.add(record_key)
-        elif observation["anomalous"] > 0:
+        else:
             summary.anomalous_records.add(record_key)
+    summary.line_aggregates = {
+        line_name: _build_record_aggregate(node_count, line_success_times.get(line_name, []), *line_weight_totals[line_name])
+        for line_name, node_count in line_node_counts.items()
+    }
 
     return summary
 
 
+def extract_probe_observations(
+    json_string: str,
+    validation: bool = False,
+    fine_grained_lines: Collection[str] = (),
+    oversea_lines: Collection[str] = (),
+    include_unresolved: bool = False,
+) -> list[ProbeObservation]:
+    """把一次 IT-Dog 结果拆成逐检测点的观测；passed 按第一次筛选或第二次验证的判定口径计算。
+
+    include_unresolved 为 True 时保留解析失败的检测点，其 ip_address 为空字符串、passed 为 False。
+    """
+    try:
+        results = json.loads(json_string)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return _observations_from_results(
+        results,
+        validation,
+        frozenset(fine_grained_lines),
+        frozenset(oversea_lines),
+        include_unresolved,
+    )
+
+
+def _observations_from_results(
+    results: list[dict[str, str]],
+    validation: bool,
+    fine_grained_lines: Collection[str],
+    oversea_lines: Collection[str],
+    include_unresolved: bool = False,
+) -> list[ProbeObservation]:
+    observations = []
+    for item in results:
+        ip_address = item.get("响应IP", "")
+        is_unresolved = not ip_address or ip_address == "解析失败"
+        if is_unresolved and not include_unresolved:
+            continue
+        detection_point = item.get("检测点", "")
+        carrier_line, fine_line = classify_detection_point(detection_point, fine_grained_lines, oversea_lines)
+        if carrier_line is None:
+            continue
+
+        line_name = fine_line or carrier_line
+        status = item.get("状态", "")
+        total_time_seconds = parse_total_time_seconds(item.get("总耗时", ""))
+        if is_unresolved:
+            observations.append(ProbeObservation("", line_name, detection_point, status, total_time_seconds, False))
+            continue
+        if validation:
+            passed = not _is_validation_observation_anomalous(status, total_time_seconds, get_probe_profile(line_name))
+        else:
+            passed = (
+                status == FIRST_PASS_REQUIRED_STATUS
+                and total_time_seconds is not None
+                and total_time_seconds < get_probe_profile(carrier_line).first_pass_max_total_time_seconds
+            )
+        observations.append(
+            ProbeObservation(ip_address, line_name, detection_point, status, total_time_seconds, passed)
+        )
+    return observations
+
+
 def should_freeze_production_deletions(summary: ValidationSummary | None) -> bool:
     if summary is None or summary.total_points == 0:
         return True
@@ -168,6 +484,35 @@ def should_freeze_production_deletions(summary: ValidationSummary | None) -> boo
     return False
 
 
+def compute_record_weights(
+    latency_by_record: dict[tuple[str, str], list[float]],
+    anomalous_records: set[tuple[str, str]] = frozenset(),
+) -> dict[tuple[str, str], int]:
+    """按线路内延迟的中位数计算轮询权重：最快记录拿满权重，其余按延迟反比缩放，本轮异常记录降到最低。"""
+    median_by_record = {
+        record_key: statistics.median(samples) if samples else None
+        for record_key, samples in latency_by_record.items()
+    }
+    best_latency_by_line: dict[str, float] = {}
+    for record_key, median_latency in median_by_record.items():
+        if median_latency is None or median_latency <= 0 or record_key in anomalous_records:
+            continue
+        line_name = record_key[1]
+        best_latency_by_line[line_name] = min(best_latency_by_line.get(line_name, median_latency), median_latency)
+
+    weights = {}
+    for record_key, median_latency in median_by_record.items():
+        best_latency = best_latency_by_line.get(record_key[1])
+        if record_key in anomalous_records:
+            weights[record_key] = DNS_WEIGHT_MIN
+        elif median_latency is None or median_latency <= 0 or best_latency is None:
+            weights[record_key] = DNS_WEIGHT_UNMEASURED
+        else:
+            scaled_weight = round(DNS_WEIGHT_MAX * best_latency / median_latency)
+            weights[record_key] = min(max(scaled_weight, DNS_WEIGHT_MIN), DNS_WEIGHT_MAX)
+    return weights
+
+
 def collect_bad_records(json_string: str) -> list[dict[str, str]]:
     summary = summarize_validation_results(json_string)
     if summary is None:
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+aiohttp_module = types.ModuleType("aiohttp")
+setattr(aiohttp_module, "ClientSession", object)
+sys.modules.setdefault("aiohttp", aiohttp_module)
+
+from src.alidns_async import AlidnsSyncClient, flatten_params, sign_rpc_params
+
+
+class FakeAsyncClient:
+    timeout_seconds = 5
+
+    def __init__(self):
+        self.calls = []
+        self.loops = set()
+
+    async def call(self, action, params=None):
+        self.loops.add(asyncio.get_running_loop())
+        self.calls.append((action, params))
+        return {"RecordId": params.get("RecordId", "new"), "Action": action}
+
+    async def close(self):
+        return None
+
+
+class FakeSdkRequest:
+    def __init__(self, action, params):
+        self.action = action
+        self.params = params
+
+    def get_action_name(self):
+        return self.action
+
+    def get_query_params(self):
+        return self.params
+
+
+class AlidnsAsyncTests(unittest.TestCase):
+    def test_sign_rpc_params_matches_documented_signature(self):
+        params = sign_rpc_params(
+            "DescribeRegions",
+            {"Format": "XML", "Version": "2014-05-26"},
+            "testid",
+            "testsecret",
+            timestamp="2016-02-23T12:46:24Z",
+            nonce="3ee8c1b8-83d3-44af-a94f-4e0ad82fd6cf",
+        )
+
+        self.assertEqual(params["Signature"], "OLeaidS1JvxuMvnyHOwuJ+uX5qY=")
+
+    def test_flatten_params_expands_record_info_lists(self):
+        params = flatten_params(
+            {
+                "Type": "RR_ADD",
+                "DomainRecordInfos": [{"Domain": "example.com", "Rr": "temp", "Value": "1.1.1.1", "Line": None}],
+                "Line": None,
+            }
+        )
+
+        self.assertEqual(
+            params,
+            {
+                "Type": "RR_ADD",
+                "DomainRecordInfo.1.Domain": "example.com",
+                "DomainRecordInfo.1.Rr": "temp",
+                "DomainRecordInfo.1.Value": "1.1.1.1",
+            },
+        )
+
+    def test_sync_client_runs_sdk_requests_on_background_loop(self):
+        fake_async_client = FakeAsyncClient()
+        sync_client = AlidnsSyncClient(fake_async_client)
+
+        async def call_from_running_loop():
+            return sync_client.do_action_with_exception(FakeSdkRequest("DeleteDomainRecord", {"RecordId": "r-2"}))
+
+        try:
+            first = json.loads(sync_client.do_action_with_exception(FakeSdkRequest("UpdateDomainRecord", {"RecordId": "r-1", "Format": "JSON"})))
+            second = json.loads(asyncio.run(call_from_running_loop()))
+        finally:
+            sync_client.close()
+
+        self.assertEqual(first["RecordId"], "r-1")
+        self.assertEqual(second["Action"], "DeleteDomainRecord")
+        self.assertEqual(fake_async_client.calls[0], ("UpdateDomainRecord", {"RecordId": "r-1"}))
+        self.assertEqual(len(fake_async_client.loops), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
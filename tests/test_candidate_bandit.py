@@ -0,0 +1,53 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.candidate_bandit import ThompsonCandidateSampler
+from src.runtime_state import RuntimeState, set_candidate_latency_estimate
+
+
+class ThompsonCandidateSamplerTests(unittest.TestCase):
+    def test_proven_fast_ip_is_exploited_while_unknown_ips_still_get_explored(self):
+        state = RuntimeState()
+        set_candidate_latency_estimate(state, "mobile", "1.1.1.1", [0.15, 0.0001, 20])
+        set_candidate_latency_estimate(state, "mobile", "2.2.2.2", [0.90, 0.0001, 20])
+        sampler = ThompsonCandidateSampler(state, random.Random(7))
+
+        picks = [sampler("mobile", ["1.1.1.1", "2.2.2.2", "3.3.3.3"], 1)[0] for _ in range(200)]
+
+        self.assertGreater(picks.count("1.1.1.1"), 100)
+        self.assertGreater(picks.count("3.3.3.3"), 0)
+        self.assertLess(picks.count("2.2.2.2"), picks.count("3.3.3.3"))
+        explored = [decision for decision in sampler.decisions if decision.explored]
+        self.assertTrue(explored)
+        self.assertTrue(all(decision.regret_seconds >= 0 for decision in sampler.decisions))
+
+    def test_small_pools_are_returned_as_is(self):
+        sampler = ThompsonCandidateSampler(RuntimeState(), random.Random(1))
+
+        self.assertEqual(sampler("unicom", ["2.2.2.2", "1.1.1.1"], 5), ["1.1.1.1", "2.2.2.2"])
+        self.assertEqual(sampler("unicom", [], 1), [])
+        self.assertEqual(sampler.decisions, [])
+
+    def test_note_decision_records_regret_against_greedy_choice(self):
+        state = RuntimeState()
+        set_candidate_latency_estimate(state, "mobile", "1.1.1.1", [0.15, 0.0, 10])
+        set_candidate_latency_estimate(state, "mobile", "2.2.2.2", [0.45, 0.0, 10])
+        sampler = ThompsonCandidateSampler(state, random.Random(1))
+
+        draws = sampler.draw_latencies("mobile", ["2.2.2.2", "1.1.1.1"])
+        sampler.note_decision("mobile", ["1.1.1.1", "2.2.2.2"], ["2.2.2.2"])
+
+        self.assertEqual(sorted(draws), ["1.1.1.1", "2.2.2.2"])
+        self.assertEqual(sampler.decisions[0].explored, ["2.2.2.2"])
+        self.assertAlmostEqual(sampler.decisions[0].regret_seconds, 0.30)
+
+
+if __name__ == "__main__":
+    unittest.main()
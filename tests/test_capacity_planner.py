@@ -0,0 +1,65 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.capacity_planner import ZoneCapacity
+
+
+class ZoneCapacityTests(unittest.TestCase):
+    def test_unmet_reservations_of_other_rrs_are_protected(self):
+        capacity = ZoneCapacity.from_records(
+            "example.com",
+            6,
+            [
+                {"RR": "temp", "Line": "mobile", "Value": "1.1.1.1"},
+                {"RR": "www", "Line": "mobile", "Value": "2.2.2.2"},
+                {"RR": "www", "Line": "Unicom", "Value": "3.3.3.3"},
+            ],
+        )
+        capacity.reserve("www", "mobile", 3)
+        capacity.reserve("api", "mobile", 2)
+
+        self.assertEqual(capacity.line_used("mobile"), 2)
+        self.assertEqual(capacity.available("temp", "mobile"), 0)
+        self.assertEqual(capacity.available("www", "mobile"), 2)
+        self.assertEqual(capacity.available("temp", "unicom"), 5)
+
+    def test_plan_additions_reshapes_instead_of_evicting(self):
+        capacity = ZoneCapacity(domain_root="example.com", package_num=3)
+        capacity.record_added("www", "mobile", 2)
+
+        allowed, refused = capacity.plan_additions(
+            "temp",
+            [("mobile", "1.1.1.1"), ("mobile", "2.2.2.2"), ("unicom", "3.3.3.3")],
+        )
+
+        self.assertEqual(allowed, [("mobile", "1.1.1.1"), ("unicom", "3.3.3.3")])
+        self.assertEqual(refused, [("mobile", "2.2.2.2")])
+
+        capacity.record_removed("www", "mobile")
+        self.assertEqual(capacity.available("temp", "mobile"), 2)
+
+
+    def test_from_records_shares_address_slots_across_rrs_and_ignores_other_types(self):
+        capacity = ZoneCapacity.from_records(
+            "example.com",
+            4,
+            [
+                {"RR": "www", "Type": "A", "Line": "default", "Value": "1.1.1.1"},
+                {"RR": "api", "Type": "AAAA", "Line": "default", "Value": "2606:4700::1"},
+                {"RR": "@", "Type": "MX", "Line": "default", "Value": "mx.example.com"},
+                {"RR": "@", "Type": "TXT", "Line": "default", "Value": "v=spf1 -all"},
+            ],
+        )
+
+        self.assertEqual(capacity.line_used("default"), 2)
+        self.assertEqual(capacity.available("temp", "default"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,10 @@
 import importlib
+import json
 import sys
 import types
 import unittest
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -39,6 +40,38 @@ class DummyDescribeRequest:
         self.record_type = value
 
 
+class DummySubDomainRequest:
+    def __init__(self):
+        self.accept_format = None
+        self.domain_name = None
+        self.subdomain = None
+        self.page_number = None
+        self.page_size = None
+        self.record_type = None
+        self.line = None
+
+    def set_accept_format(self, value):
+        self.accept_format = value
+
+    def set_DomainName(self, value):
+        self.domain_name = value
+
+    def set_SubDomain(self, value):
+        self.subdomain = value
+
+    def set_PageNumber(self, value):
+        self.page_number = value
+
+    def set_PageSize(self, value):
+        self.page_size = value
+
+    def set_Type(self, value):
+        self.record_type = value
+
+    def set_Line(self, value):
+        self.line = value
+
+
 class DummyAddRequest:
     def __init__(self):
         self.accept_format = None
@@ -67,6 +100,34 @@ class DummyAddRequest:
         self.line = value
 
 
+class DummyUpdateRequest:
+    def __init__(self):
+        self.accept_format = None
+        self.record_id = None
+        self.rr = None
+        self.record_type = None
+        self.value = None
+        self.line = None
+
+    def set_accept_format(self, value):
+        self.accept_format = value
+
+    def set_RecordId(self, value):
+        self.record_id = value
+
+    def set_RR(self, value):
+        self.rr = value
+
+    def set_Type(self, value):
+        self.record_type = value
+
+    def set_Value(self, value):
+        self.value = value
+
+    def set_Line(self, value):
+        self.line = value
+
+
 class DummyDeleteRequest:
     def __init__(self):
         self.record_id = None
@@ -75,6 +136,98 @@ class DummyDeleteRequest:
         self.record_id = value
 
 
+class DummyBatchRequest:
+    def __init__(self):
+        self.accept_format = None
+        self.operation_type = None
+        self.record_infos = None
+
+    def set_accept_format(self, value):
+        self.accept_format = value
+
+    def set_Type(self, value):
+        self.operation_type = value
+
+    def set_DomainRecordInfos(self, value):
+        self.record_infos = value
+
+
+class DummyBatchResultRequest:
+    def __init__(self):
+        self.accept_format = None
+        self.task_id = None
+        self.batch_type = None
+        self.page_number = None
+        self.page_size = None
+
+    def set_accept_format(self, value):
+        self.accept_format = value
+
+    def set_TaskId(self, value):
+        self.task_id = value
+
+    def set_BatchType(self, value):
+        self.batch_type = value
+
+    def set_PageNumber(self, value):
+        self.page_number = value
+
+    def set_PageSize(self, value):
+        self.page_size = value
+
+
+class DummyBatchCountRequest(DummyBatchResultRequest):
+    pass
+
+
+class DummyBatchDetailRequest(DummyBatchResultRequest):
+    pass
+
+
+class DummySLBStatusRequest:
+    def __init__(self):
+        self.accept_format = None
+        self.domain_name = None
+        self.subdomain = None
+        self.open = None
+        self.record_type = None
+        self.line = None
+
+    def set_accept_format(self, value):
+        self.accept_format = value
+
+    def set_DomainName(self, value):
+        self.domain_name = value
+
+    def set_SubDomain(self, value):
+        self.subdomain = value
+
+    def set_Open(self, value):
+        self.open = value
+
+    def set_Type(self, value):
+        self.record_type = value
+
+    def set_Line(self, value):
+        self.line = value
+
+
+class DummySLBWeightRequest:
+    def __init__(self):
+        self.accept_format = None
+        self.record_id = None
+        self.weight = None
+
+    def set_accept_format(self, value):
+        self.accept_format = value
+
+    def set_RecordId(self, value):
+        self.record_id = value
+
+    def set_Weight(self, value):
+        self.weight = value
+
+
 class DummyAcsClient:
     def __init__(self, *args, **kwargs):
         pass
@@ -97,12 +250,40 @@ def install_aliyun_stubs() -> None:
     describe_module = types.ModuleType("aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest")
     setattr(describe_module, "DescribeDomainRecordsRequest", DummyDescribeRequest)
 
+    update_module = types.ModuleType("aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest")
+    setattr(update_module, "UpdateDomainRecordRequest", DummyUpdateRequest)
+
+    batch_module = types.ModuleType("aliyunsdkalidns.request.v20150109.OperateBatchDomainRequest")
+    setattr(batch_module, "OperateBatchDomainRequest", DummyBatchRequest)
+    batch_count_module = types.ModuleType("aliyunsdkalidns.request.v20150109.DescribeBatchResultCountRequest")
+    setattr(batch_count_module, "DescribeBatchResultCountRequest", DummyBatchCountRequest)
+    batch_detail_module = types.ModuleType("aliyunsdkalidns.request.v20150109.DescribeBatchResultDetailRequest")
+    setattr(batch_detail_module, "DescribeBatchResultDetailRequest", DummyBatchDetailRequest)
+
+    slb_status_module = types.ModuleType("aliyunsdkalidns.request.v20150109.SetDNSSLBStatusRequest")
+    setattr(slb_status_module, "SetDNSSLBStatusRequest", DummySLBStatusRequest)
+    slb_weight_module = types.ModuleType("aliyunsdkalidns.request.v20150109.UpdateDNSSLBWeightRequest")
+    setattr(slb_weight_module, "UpdateDNSSLBWeightRequest", DummySLBWeightRequest)
+
+    subdomain_module = types.ModuleType("aliyunsdkalidns.request.v20150109.DescribeSubDomainRecordsRequest")
+    setattr(subdomain_module, "DescribeSubDomainRecordsRequest", DummySubDomainRequest)
+
     sys.modules[add_module.__name__] = add_module
+    sys.modules[subdomain_module.__name__] = subdomain_module
+    sys.modules[batch_module.__name__] = batch_module
+    sys.modules[batch_count_module.__name__] = batch_count_module
+    sys.modules[batch_detail_module.__name__] = batch_detail_module
+    sys.modules[update_module.__name__] = update_module
+    sys.modules[slb_status_module.__name__] = slb_status_module
+    sys.modules[slb_weight_module.__name__] = slb_weight_module
     sys.modules[delete_module.__name__] = delete_module
     sys.modules[describe_module.__name__] = describe_module
 
 
 install_aliyun_stubs()
+aiohttp_module = types.ModuleType("aiohttp")
+setattr(aiohttp_module, "ClientSession", object)
+sys.modules.setdefault("aiohttp", aiohttp_module)
 cf2alidns = importlib.import_module("src.cf2alidns")
 
 
@@ -115,7 +296,108 @@ class FakeClient:
         return b"{}"
 
 
+class FakeFailingClient(FakeClient):
+    def do_action_with_exception(self, request):
+        self.calls.append(request)
+        raise RuntimeError("request failed")
+
+
+class FakeUpdateFailingClient(FakeClient):
+    def do_action_with_exception(self, request):
+        self.calls.append(request)
+        if isinstance(request, DummyUpdateRequest):
+            raise RuntimeError("update failed")
+        return b"{}"
+
+
+class FakeBatchClient(FakeClient):
+    def __init__(self, success_values):
+        super().__init__()
+        self.success_values = success_values
+        self.submitted_infos = []
+
+    def do_action_with_exception(self, request):
+        self.calls.append(request)
+        if isinstance(request, DummyBatchRequest):
+            self.submitted_infos = request.record_infos
+            return b'{"TaskId": "task-1"}'
+        if isinstance(request, DummyBatchCountRequest):
+            return b'{"Status": 1, "SuccessCount": 1, "FailedCount": 0}'
+        if isinstance(request, DummyBatchDetailRequest):
+            details = [
+                dict(info, Status=info["Value"] in self.success_values, RecordId=f"new-{info['Value']}")
+                for info in self.submitted_infos
+            ]
+            return json.dumps({"BatchResultDetails": {"BatchResultDetail": details}}).encode("utf-8")
+        return b"{}"
+
+
+class FakePagedClient(FakeClient):
+    def __init__(self, total_count, page_size):
+        super().__init__()
+        self.total_count = total_count
+        self.page_size = page_size
+
+    def do_action_with_exception(self, request):
+        self.calls.append(request)
+        start = (request.page_number - 1) * self.page_size
+        end = min(start + self.page_size, self.total_count)
+        records = [
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": f"10.0.{index // 256}.{index % 256}", "RecordId": f"r-{index}"}
+            for index in range(start, end)
+        ]
+        return json.dumps({"TotalCount": self.total_count, "DomainRecords": {"Record": records}}).encode("utf-8")
+
+
 class Cf2AliDnsTests(unittest.TestCase):
+    def setUp(self):
+        cf2alidns.invalidate_record_snapshots()
+
+    def test_query_all_domain_records_fetches_remaining_pages_and_caches_snapshot(self):
+        fake_client = FakePagedClient(total_count=1201, page_size=500)
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client), \
+             patch.object(cf2alidns, "RECORD_QUERY_PAGE_SIZE", 500):
+            records = cf2alidns.query_all_domain_records("example.com", subdomain="www", record_type="A")
+            cached_records = cf2alidns.query_all_domain_records("example.com", subdomain="www", record_type="A")
+
+        self.assertEqual(len(records), 1201)
+        self.assertEqual(len({record["RecordId"] for record in records}), 1201)
+        self.assertEqual(sorted(call.page_number for call in fake_client.calls), [1, 2, 3])
+        self.assertTrue(all(isinstance(call, DummySubDomainRequest) for call in fake_client.calls))
+        self.assertEqual(fake_client.calls[0].subdomain, "www.example.com")
+        self.assertEqual(fake_client.calls[0].record_type, "A")
+        self.assertEqual(len(cached_records), 1201)
+
+    def test_try_query_all_domain_records_reports_failure_as_none(self):
+        fake_client = FakeFailingClient()
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client):
+            self.assertIsNone(cf2alidns.try_query_all_domain_records("example.com", subdomain="www"))
+            self.assertEqual(cf2alidns.query_all_domain_records("example.com", subdomain="www"), [])
+
+    def test_close_client_closes_background_loop_and_resets_clients(self):
+        fake_client = MagicMock()
+        with patch.object(cf2alidns, "_client", fake_client), patch.object(cf2alidns, "_async_client", object()):
+            cf2alidns.close_client()
+
+            fake_client.close.assert_called_once_with()
+            self.assertIsNone(cf2alidns._client)
+            self.assertIsNone(cf2alidns._async_client)
+
+    def test_record_snapshot_is_invalidated_by_mutations(self):
+        fake_client = FakePagedClient(total_count=2, page_size=500)
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client):
+            records = cf2alidns.query_all_domain_records("example.com", subdomain="www")
+            cf2alidns.delete_record_by_value("example.com", "www", records[0]["Value"], "mobile")
+            cf2alidns.query_all_domain_records("example.com", subdomain="www")
+
+        describe_calls = [call for call in fake_client.calls if isinstance(call, DummySubDomainRequest)]
+        delete_calls = [call for call in fake_client.calls if isinstance(call, DummyDeleteRequest)]
+        self.assertEqual(len(describe_calls), 2)
+        self.assertEqual(len(delete_calls), 1)
+
     def test_update_aliyun_dns_records_deletes_oldest_before_add_when_line_full(self):
         fake_client = FakeClient()
         existing_records = [
@@ -166,7 +448,7 @@ class Cf2AliDnsTests(unittest.TestCase):
         self.assertIsInstance(fake_client.calls[0], DummyDeleteRequest)
         self.assertEqual(fake_client.calls[0].record_id, "record-target")
 
-    def test_sync_aliyun_dns_records_exact_replaces_stale_temp_records(self):
+    def test_sync_aliyun_dns_records_exact_rewrites_stale_temp_records_in_place(self):
         fake_client = FakeClient()
         existing_records = [
             {"RR": "temp", "Line": "mobile", "Type": "A", "Value": "1.1.1.1", "RecordId": "record-old"}
@@ -180,11 +462,107 @@ class Cf2AliDnsTests(unittest.TestCase):
                 ips_by_carrier={"mobile": ["2.2.2.2"]},
             )
 
-        self.assertEqual(len(fake_client.calls), 2)
-        self.assertIsInstance(fake_client.calls[0], DummyDeleteRequest)
-        self.assertIsInstance(fake_client.calls[1], DummyAddRequest)
-        self.assertEqual(fake_client.calls[1].rr, "temp")
-        self.assertEqual(fake_client.calls[1].value, "2.2.2.2")
+        self.assertEqual(len(fake_client.calls), 1)
+        self.assertIsInstance(fake_client.calls[0], DummyUpdateRequest)
+        self.assertEqual(fake_client.calls[0].record_id, "record-old")
+        self.assertEqual(fake_client.calls[0].rr, "temp")
+        self.assertEqual(fake_client.calls[0].value, "2.2.2.2")
+        self.assertEqual(existing_records[0]["Value"], "2.2.2.2")
+
+    def test_sync_aliyun_dns_records_exact_deletes_and_adds_leftovers(self):
+        fake_client = FakeClient()
+        existing_records = [
+            {"RR": "temp", "Line": "mobile", "Type": "A", "Value": "1.1.1.1", "RecordId": "record-1"},
+            {"RR": "temp", "Line": "mobile", "Type": "A", "Value": "1.1.1.2", "RecordId": "record-2"},
+            {"RR": "temp", "Line": "unicom", "Type": "A", "Value": "3.3.3.3", "RecordId": "record-3"},
+        ]
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client), \
+             patch.object(cf2alidns, "query_all_domain_records", return_value=existing_records):
+            cf2alidns.sync_aliyun_dns_records_exact(
+                domain_rr="temp",
+                domain_root="example.com",
+                ips_by_carrier={"mobile": ["2.2.2.2"], "unicom": ["3.3.3.3", "4.4.4.4"]},
+            )
+
+        self.assertEqual([type(call) for call in fake_client.calls], [DummyUpdateRequest, DummyDeleteRequest, DummyAddRequest])
+        self.assertEqual(fake_client.calls[1].record_id, "record-2")
+        self.assertEqual(fake_client.calls[2].value, "4.4.4.4")
+
+    def test_sync_aliyun_dns_records_exact_falls_back_to_delete_and_add_when_rewrite_fails(self):
+        fake_client = FakeUpdateFailingClient()
+        existing_records = [
+            {"RR": "temp", "Line": "mobile", "Type": "A", "Value": "1.1.1.1", "RecordId": "record-old"}
+        ]
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client), \
+             patch.object(cf2alidns, "query_all_domain_records", return_value=existing_records):
+            snapshot = cf2alidns.sync_aliyun_dns_records_exact(
+                domain_rr="temp",
+                domain_root="example.com",
+                ips_by_carrier={"mobile": ["2.2.2.2"]},
+            )
+
+        self.assertEqual([type(call) for call in fake_client.calls], [DummyUpdateRequest, DummyDeleteRequest, DummyAddRequest])
+        self.assertEqual(fake_client.calls[1].record_id, "record-old")
+        self.assertEqual(fake_client.calls[2].value, "2.2.2.2")
+        self.assertEqual([record["Value"] for record in snapshot], ["2.2.2.2"])
+
+    def test_sync_aliyun_dns_records_exact_for_aaaa_leaves_a_records_alone(self):
+        fake_client = FakeClient()
+        existing_records = [
+            {"RR": "temp", "Line": "mobile", "Type": "A", "Value": "1.1.1.1", "RecordId": "record-1"},
+            {"RR": "temp", "Line": "mobile", "Type": "AAAA", "Value": "2606:4700::1", "RecordId": "record-2"},
+        ]
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client), \
+             patch.object(cf2alidns, "query_all_domain_records", return_value=existing_records):
+            cf2alidns.sync_aliyun_dns_records_exact(
+                domain_rr="temp",
+                domain_root="example.com",
+                ips_by_carrier={"mobile": ["2606:4700::2", "2606:4700::3"]},
+                record_type="AAAA",
+            )
+
+        self.assertEqual([type(call) for call in fake_client.calls], [DummyUpdateRequest, DummyAddRequest])
+        self.assertEqual(fake_client.calls[0].record_id, "record-2")
+        self.assertEqual(fake_client.calls[0].record_type, "AAAA")
+        self.assertEqual((fake_client.calls[1].record_type, fake_client.calls[1].value), ("AAAA", "2606:4700::3"))
+
+    def test_update_record_value_rewrites_record_and_snapshot(self):
+        fake_client = FakeClient()
+        record = {"RR": "www", "Line": "mobile", "Type": "A", "Value": "1.1.1.1", "RecordId": "record-1", "CreateTimestamp": 1}
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client):
+            updated = cf2alidns.update_record_value("example.com", record, "2.2.2.2")
+
+        self.assertTrue(updated)
+        self.assertEqual(len(fake_client.calls), 1)
+        self.assertIsInstance(fake_client.calls[0], DummyUpdateRequest)
+        self.assertEqual(fake_client.calls[0].record_id, "record-1")
+        self.assertEqual(record["Value"], "2.2.2.2")
+        self.assertIn("UpdateTimestamp", record)
+
+    def test_sync_aliyun_dns_records_exact_uses_batch_add_for_large_sets(self):
+        desired_ips = [f"2.2.2.{index}" for index in range(1, 13)]
+        fake_client = FakeBatchClient(success_values=set(desired_ips[:-1]))
+        existing_records = []
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client), \
+             patch.object(cf2alidns, "query_all_domain_records", return_value=existing_records):
+            snapshot = cf2alidns.sync_aliyun_dns_records_exact(
+                domain_rr="temp",
+                domain_root="example.com",
+                ips_by_carrier={"mobile": desired_ips},
+            )
+
+        self.assertIsInstance(fake_client.calls[0], DummyBatchRequest)
+        self.assertEqual(fake_client.calls[0].operation_type, "RR_ADD")
+        self.assertEqual(len(fake_client.calls[0].record_infos), 12)
+        self.assertFalse(any(isinstance(call, DummyAddRequest) for call in fake_client.calls))
+        self.assertEqual(len(snapshot), 11)
+        self.assertNotIn(desired_ips[-1], {record["Value"] for record in snapshot})
+        self.assertTrue(all(record["RecordId"].startswith("new-") for record in snapshot))
 
     def test_ensure_production_dns_records_adds_only_until_target(self):
         fake_client = FakeClient()
@@ -231,6 +609,30 @@ class Cf2AliDnsTests(unittest.TestCase):
         delete_calls = [call for call in fake_client.calls if isinstance(call, DummyDeleteRequest)]
         self.assertEqual([call.record_id for call in delete_calls], ["record-1", "record-2"])
 
+    def test_apply_production_record_weights_skips_changes_within_hysteresis(self):
+        fake_client = FakeClient()
+        existing_records = [
+            {"RR": "www", "Line": "mobile", "Type": "A", "Value": "1.1.1.1", "RecordId": "record-1", "Weight": 95},
+            {"RR": "www", "Line": "mobile", "Type": "A", "Value": "2.2.2.2", "RecordId": "record-2", "Weight": 50},
+        ]
+        cf2alidns.set_provider(None)
+
+        with patch.object(cf2alidns, "get_client", return_value=fake_client), \
+             patch.object(cf2alidns, "query_all_domain_records", return_value=existing_records):
+            updated_count = cf2alidns.apply_production_record_weights(
+                domain_rr="www",
+                domain_root="example.com",
+                weights_by_record={("1.1.1.1", "mobile"): 100, ("2.2.2.2", "mobile"): 20},
+                hysteresis=10,
+            )
+
+        self.assertEqual(updated_count, 1)
+        status_calls = [call for call in fake_client.calls if isinstance(call, DummySLBStatusRequest)]
+        weight_calls = [call for call in fake_client.calls if isinstance(call, DummySLBWeightRequest)]
+        self.assertEqual([(call.subdomain, call.open, call.line) for call in status_calls], [("www.example.com", True, "mobile")])
+        self.assertEqual([(call.record_id, call.weight) for call in weight_calls], [("record-2", 20)])
+        self.assertEqual(existing_records[1]["Weight"], 20)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,52 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.change_detection import cusum_step, is_change_detected, record_degradation_level, update_line_pollution_scores
+from src.runtime_state import RuntimeState, get_line_pollution_score
+from src.workflow_rules import RecordAggregate
+
+
+class ChangeDetectionTests(unittest.TestCase):
+    def test_cusum_needs_two_borderline_anomalies_but_one_severe(self):
+        self.assertFalse(is_change_detected(cusum_step(0.0, 1.0)))
+        self.assertTrue(is_change_detected(cusum_step(cusum_step(0.0, 1.0), 1.0)))
+        self.assertTrue(is_change_detected(cusum_step(0.0, 1.6)))
+        self.assertEqual(cusum_step(0.3, 0.1), 0.0)
+        self.assertEqual(cusum_step(2.9, 9.0), 3.0)
+
+    def test_record_degradation_level_combines_latency_and_failures(self):
+        slow = RecordAggregate(4, 4, 3.0, 3.2, node_weight=4.0, success_weight=4.0)
+        flaky = RecordAggregate(4, 1, 0.3, 0.3, node_weight=4.0, success_weight=1.0)
+        healthy_but_slowish = RecordAggregate(4, 4, 1.8, 1.9, node_weight=4.0, success_weight=4.0)
+
+        self.assertAlmostEqual(record_degradation_level(slow, "mobile"), 1.5)
+        self.assertAlmostEqual(record_degradation_level(flaky, "mobile"), 1.5)
+        self.assertAlmostEqual(record_degradation_level(healthy_but_slowish, "mobile"), 0.0)
+
+    def test_line_pollution_follows_line_latency_and_failures_and_decays_without_signal(self):
+        state = RuntimeState()
+        line_aggregates = {
+            "mobile": RecordAggregate(4, 1, 0.3, 0.3, node_weight=4.0, success_weight=1.0),
+            "unicom": RecordAggregate(4, 4, 2.2, 2.4, node_weight=4.0, success_weight=4.0),
+            "telecom": RecordAggregate(4, 4, 0.4, 0.5, node_weight=4.0, success_weight=4.0),
+        }
+
+        polluted_lines = update_line_pollution_scores(state, line_aggregates)
+        self.assertEqual(polluted_lines, {"mobile"})
+        self.assertAlmostEqual(get_line_pollution_score(state, "unicom"), 0.6)
+        self.assertEqual(get_line_pollution_score(state, "telecom"), 0.0)
+
+        polluted_lines = update_line_pollution_scores(state, {})
+        self.assertEqual(polluted_lines, set())
+        self.assertEqual(get_line_pollution_score(state, "mobile"), 0.5)
+        self.assertAlmostEqual(get_line_pollution_score(state, "unicom"), 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
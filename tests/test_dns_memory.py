@@ -0,0 +1,213 @@
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+aiohttp_module = types.ModuleType("aiohttp")
+setattr(aiohttp_module, "ClientSession", object)
+sys.modules.setdefault("aiohttp", aiohttp_module)
+
+sys.modules.setdefault("aliyunsdkalidns", types.ModuleType("aliyunsdkalidns"))
+sys.modules.setdefault("aliyunsdkalidns.request", types.ModuleType("aliyunsdkalidns.request"))
+sys.modules.setdefault("aliyunsdkalidns.request.v20150109", types.ModuleType("aliyunsdkalidns.request.v20150109"))
+for module_name, class_name in (
+    ("aliyunsdkalidns.request.v20150109.AddDomainRecordRequest", "AddDomainRecordRequest"),
+    ("aliyunsdkalidns.request.v20150109.DeleteDomainRecordRequest", "DeleteDomainRecordRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest", "DescribeDomainRecordsRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeSubDomainRecordsRequest", "DescribeSubDomainRecordsRequest"),
+    ("aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest", "UpdateDomainRecordRequest"),
+    ("aliyunsdkalidns.request.v20150109.OperateBatchDomainRequest", "OperateBatchDomainRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeBatchResultCountRequest", "DescribeBatchResultCountRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeBatchResultDetailRequest", "DescribeBatchResultDetailRequest"),
+    ("aliyunsdkalidns.request.v20150109.SetDNSSLBStatusRequest", "SetDNSSLBStatusRequest"),
+    ("aliyunsdkalidns.request.v20150109.UpdateDNSSLBWeightRequest", "UpdateDNSSLBWeightRequest"),
+):
+    module = types.ModuleType(module_name)
+    setattr(module, class_name, type(class_name, (), {}))
+    sys.modules.setdefault(module_name, module)
+
+
+from src import cf2alidns
+from src.dns_memory import InMemoryDnsProvider, run_cycle_benchmark
+from src.dns_provider import DnsProviderError, DnsRecord, DnsThrottledError
+from src.mutation_journal import MutationJournal
+
+
+class InMemoryDnsProviderTests(unittest.TestCase):
+    def tearDown(self):
+        cf2alidns.set_provider(None)
+        cf2alidns.set_mutation_journal(None)
+
+    def test_add_enforces_line_quota_and_assigns_record_ids(self):
+        provider = InMemoryDnsProvider(max_records_per_line=1)
+        first = provider.add_record("example.com", DnsRecord(rr="www", record_type="A", value="1.1.1.1", line="mobile"))
+
+        with self.assertRaises(DnsProviderError):
+            provider.add_record("example.com", DnsRecord(rr="www", record_type="A", value="2.2.2.2", line="mobile"))
+
+        self.assertEqual(first.record_id, "1")
+        self.assertEqual(provider.call_counts["add"], 2)
+
+    def test_throttling_and_failure_injection_raise_provider_errors(self):
+        throttled = InMemoryDnsProvider(max_calls_per_second=1)
+        throttled.query_records("example.com")
+        with self.assertRaises(DnsThrottledError):
+            throttled.query_records("example.com")
+
+        failing = InMemoryDnsProvider(failure_rate=1.0, seed=1)
+        with self.assertRaises(DnsProviderError):
+            failing.query_records("example.com")
+
+    def test_temp_sync_respects_zone_capacity_reserved_for_production_floor(self):
+        provider = InMemoryDnsProvider(max_records_per_line=4)
+        provider.seed_records("example.com", [DnsRecord(rr="www", record_type="A", value="9.9.9.9", line="mobile")])
+        cf2alidns.set_provider(provider)
+        capacity = cf2alidns.load_zone_capacity("example.com")
+        assert capacity is not None
+        capacity.reserve("www", "mobile", 2)
+
+        cf2alidns.sync_aliyun_dns_records_exact(
+            "temp",
+            "example.com",
+            {"mobile": ["1.1.1.1", "2.2.2.2", "3.3.3.3"]},
+            capacity=capacity,
+        )
+
+        self.assertEqual(len(provider.query_records("example.com", rr="temp")), 2)
+        self.assertEqual(capacity.available("www", "mobile"), 1)
+        self.assertEqual(provider.call_counts["delete"], 0)
+
+    def test_production_deletions_release_zone_capacity(self):
+        provider = InMemoryDnsProvider(max_records_per_line=6)
+        provider.seed_records(
+            "example.com",
+            [DnsRecord(rr="www", record_type="A", value=f"1.1.1.{index}", line="mobile") for index in range(1, 6)],
+        )
+        cf2alidns.set_provider(provider)
+        capacity = cf2alidns.load_zone_capacity("example.com")
+        assert capacity is not None
+
+        cf2alidns.delete_record_by_value("example.com", "www", "1.1.1.1", "mobile", capacity=capacity)
+        cf2alidns.prune_production_dns_records(
+            "www",
+            "example.com",
+            {"mobile": []},
+            floor_count=2,
+            ceiling_count=3,
+            max_prune_per_line=2,
+            capacity=capacity,
+        )
+
+        self.assertEqual(len(provider.query_records("example.com", rr="www")), 3)
+        self.assertEqual(capacity.available("temp", "mobile"), 3)
+
+    def test_interrupted_mutations_are_reconciled_against_zone(self):
+        provider = InMemoryDnsProvider()
+        provider.seed_records("example.com", [DnsRecord(rr="temp", record_type="A", value="1.1.1.1", line="mobile")])
+        cf2alidns.set_provider(provider)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            journal = MutationJournal(Path(temp_dir) / "journal.jsonl")
+            cf2alidns.set_mutation_journal(journal)
+            cf2alidns.sync_aliyun_dns_records_exact("temp", "example.com", {"mobile": ["1.1.1.1", "2.2.2.2"]})
+            self.assertEqual(journal.pending_entries(), [])
+
+            journal.begin(
+                [
+                    {"op": "add", "domain": "example.com", "rr": "temp", "type": "A", "line": "mobile", "value": "2.2.2.2"},
+                    {"op": "add", "domain": "example.com", "rr": "temp", "type": "A", "line": "unicom", "value": "3.3.3.3"},
+                ]
+            )
+            query_count = provider.call_counts["query"]
+
+            applied_entries = cf2alidns.reconcile_pending_mutations()
+
+            self.assertEqual([entry["value"] for entry in applied_entries], ["2.2.2.2"])
+            self.assertEqual(journal.pending_entries(), [])
+            self.assertEqual(provider.call_counts["query"] - query_count, 1)
+
+    def test_ambiguous_write_failures_stay_pending_until_reconciled(self):
+        class TimeoutAfterAddProvider(InMemoryDnsProvider):
+            def add_record(self, domain_name, record):
+                if record.value == "2.2.2.2":
+                    super().add_record(domain_name, record)
+                    raise TimeoutError("connection reset")
+                raise DnsProviderError("rejected")
+
+        provider = TimeoutAfterAddProvider()
+        cf2alidns.set_provider(provider)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            journal = MutationJournal(Path(temp_dir) / "journal.jsonl")
+            cf2alidns.set_mutation_journal(journal)
+            cf2alidns.sync_aliyun_dns_records_exact("temp", "example.com", {"mobile": ["2.2.2.2"], "unicom": ["3.3.3.3"]})
+
+            self.assertEqual([entry["value"] for entry in journal.pending_entries()], ["2.2.2.2"])
+            applied_entries = cf2alidns.reconcile_pending_mutations()
+
+            self.assertEqual([entry["value"] for entry in applied_entries], ["2.2.2.2"])
+            self.assertEqual(journal.pending_entries(), [])
+
+    def test_restore_production_snapshot_applies_minimal_diff(self):
+        provider = InMemoryDnsProvider()
+        provider.seed_records(
+            "example.com",
+            [
+                DnsRecord(rr="www", record_type="A", value="1.1.1.1", line="mobile"),
+                DnsRecord(rr="www", record_type="A", value="9.9.9.9", line="mobile"),
+                DnsRecord(rr="www", record_type="A", value="8.8.8.8", line="unicom"),
+                DnsRecord(rr="www", record_type="A", value="7.7.7.7", line="telecom"),
+            ],
+        )
+        cf2alidns.set_provider(provider)
+
+        removed, restored = cf2alidns.restore_production_snapshot(
+            "www",
+            "example.com",
+            {("1.1.1.1", "mobile"), ("2.2.2.2", "mobile"), ("3.3.3.3", "unicom"), ("4.4.4.4", "unicom")},
+        )
+
+        self.assertEqual(sorted(removed), [("8.8.8.8", "unicom"), ("9.9.9.9", "mobile")])
+        self.assertEqual(sorted(restored), [("2.2.2.2", "mobile"), ("3.3.3.3", "unicom"), ("4.4.4.4", "unicom")])
+        self.assertEqual(
+            sorted((record.line, record.value) for record in provider.query_records("example.com", rr="www")),
+            [("mobile", "1.1.1.1"), ("mobile", "2.2.2.2"), ("telecom", "7.7.7.7"), ("unicom", "3.3.3.3"), ("unicom", "4.4.4.4")],
+        )
+        self.assertEqual((provider.call_counts["update"], provider.call_counts["add"], provider.call_counts["delete"]), (2, 1, 0))
+
+    def test_exact_sync_runs_against_memory_provider(self):
+        provider = InMemoryDnsProvider()
+        provider.seed_records(
+            "example.com",
+            [
+                DnsRecord(rr="temp", record_type="A", value="1.1.1.1", line="mobile"),
+                DnsRecord(rr="temp", record_type="A", value="2.2.2.2", line="mobile"),
+            ],
+        )
+        cf2alidns.set_provider(provider)
+
+        snapshot = cf2alidns.sync_aliyun_dns_records_exact("temp", "example.com", {"mobile": ["1.1.1.1", "3.3.3.3"]})
+
+        self.assertEqual(sorted(record["Value"] for record in snapshot), ["1.1.1.1", "3.3.3.3"])
+        self.assertEqual(sorted(record.value for record in provider.query_records("example.com", rr="temp")), ["1.1.1.1", "3.3.3.3"])
+        self.assertEqual(provider.call_counts["update"], 1)
+        self.assertEqual(provider.call_counts["add"], 0)
+        self.assertEqual(provider.call_counts["delete"], 0)
+
+    def test_cycle_benchmark_reports_call_counts(self):
+        provider = InMemoryDnsProvider()
+
+        result = run_cycle_benchmark(provider, cycles=3, candidates_per_line=4)
+
+        self.assertEqual(result["cycles"], 3)
+        self.assertEqual(result["api_calls"], sum(provider.call_counts.values()))
+        self.assertGreater(provider.call_counts["query"], 0)
+        self.assertIsNone(cf2alidns._provider_override)
+
+
+if __name__ == "__main__":
+    unittest.main()
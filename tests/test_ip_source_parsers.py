@@ -1,3 +1,5 @@
+import ipaddress
+import random
 import sys
 import types
 import unittest
@@ -19,8 +21,10 @@ sys.modules.setdefault("src.getv3data", getv3data_stub)
 from src.getIPFromW3 import (
     classify_api_ip_data,
     parse_cf090227_domain_cards,
+    parse_cidr_ranges,
     parse_table_ips_from_html,
     parse_text_ips,
+    sample_hosts_from_ranges,
 )
 
 sys.modules.pop("src.getv3data", None)
@@ -71,6 +75,21 @@ class HtmlParserTests(unittest.TestCase):
         self.assertEqual(unicom, ["104.16.1.2"])
         self.assertEqual(telecom, ["104.16.1.3"])
 
+    def test_parse_table_ips_from_html_keeps_only_public_ipv6_for_aaaa(self):
+        html = """
+        <table>
+            <tr><td>移动优选</td><td>2606:4700::6810:1</td></tr>
+            <tr><td>联通优选</td><td>104.16.1.2</td></tr>
+            <tr><td>电信优选</td><td>fd00::1</td></tr>
+        </table>
+        """
+
+        mobile, unicom, telecom = parse_table_ips_from_html(html, "AAAA")
+
+        self.assertEqual(mobile, ["2606:4700::6810:1"])
+        self.assertEqual(unicom, [])
+        self.assertEqual(telecom, [])
+
     def test_parse_text_ips_filters_invalid_entries(self):
         text = "104.16.1.1, invalid, 172.16.0.1,104.16.1.2"
 
@@ -78,6 +97,18 @@ class HtmlParserTests(unittest.TestCase):
 
         self.assertEqual(result, ["104.16.1.1", "104.16.1.2"])
 
+    def test_sample_hosts_from_ranges_stays_inside_official_ipv4_ranges(self):
+        networks = parse_cidr_ranges("104.16.0.0/13\n2606:4700::/32\ninvalid\n162.158.0.0/15\n")
+
+        result = sample_hosts_from_ranges(networks, 10, random.Random(1))
+
+        self.assertEqual(len(networks), 2)
+        self.assertEqual(len(result), 10)
+        for ip_address in result:
+            parsed_ip = ipaddress.ip_address(ip_address)
+            self.assertTrue(any(parsed_ip in network for network in networks))
+            self.assertNotIn(parsed_ip, {network.network_address for network in networks})
+
     def test_parse_cf090227_domain_cards_extracts_hosts_and_carriers(self):
         html = """
         <div class="domain-card">
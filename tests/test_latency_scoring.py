@@ -0,0 +1,61 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.latency_scoring import (
+    LatencyEstimate,
+    collect_cycle_latency_samples,
+    get_candidate_latency_scores,
+    score_latency_estimate,
+    update_candidate_latency_scores,
+    update_latency_estimate,
+)
+from src.runtime_state import RuntimeState
+from src.workflow_rules import ProbeObservation
+
+
+class LatencyScoringTests(unittest.TestCase):
+    def test_ewma_tracks_mean_and_variance(self):
+        estimate = update_latency_estimate(None, 0.4)
+        estimate = update_latency_estimate(estimate, 0.2, alpha=0.5)
+
+        self.assertAlmostEqual(estimate.mean, 0.3)
+        self.assertAlmostEqual(estimate.variance, 0.01)
+        self.assertEqual(estimate.samples, 2)
+
+    def test_few_samples_are_penalised_over_a_proven_ip(self):
+        proven = LatencyEstimate(mean=0.30, variance=0.0004, samples=12)
+        lucky = LatencyEstimate(mean=0.20, variance=0.0, samples=1)
+
+        self.assertLess(score_latency_estimate(proven), score_latency_estimate(lucky))
+
+    def test_cycle_samples_use_median_and_feed_parent_line(self):
+        observations = [
+            ProbeObservation("1.1.1.1", "cn_telecom_guangdong", "电信广州", "530", 0.2, True),
+            ProbeObservation("1.1.1.1", "telecom", "电信北京", "530", 0.6, True),
+            ProbeObservation("1.1.1.1", "telecom", "电信上海", "失败", None, False),
+        ]
+
+        samples = collect_cycle_latency_samples(observations)
+
+        self.assertEqual(samples[("1.1.1.1", "cn_telecom_guangdong")], 0.2)
+        self.assertEqual(samples[("1.1.1.1", "telecom")], 0.6)
+
+    def test_scores_persist_across_cycles_in_runtime_state(self):
+        state = RuntimeState()
+        observation = ProbeObservation("1.1.1.1", "mobile", "移动上海", "530", 0.3, True)
+
+        update_candidate_latency_scores(state, [observation])
+        scores = update_candidate_latency_scores(state, [observation])
+
+        self.assertEqual(state.candidate_latency_estimates["mobile|1.1.1.1"][2], 2.0)
+        self.assertEqual(get_candidate_latency_scores(state, [("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")]), scores)
+
+
+if __name__ == "__main__":
+    unittest.main()
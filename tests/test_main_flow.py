@@ -1,4 +1,6 @@
+import json
 import sys
+import tempfile
 import types
 import unittest
 from pathlib import Path
@@ -50,6 +52,10 @@ sys.modules.setdefault("Crypto.Cipher", cipher_module)
 sys.modules.setdefault("Crypto.Util", types.ModuleType("Crypto.Util"))
 sys.modules.setdefault("Crypto.Util.Padding", padding_module)
 
+aiohttp_module = types.ModuleType("aiohttp")
+setattr(aiohttp_module, "ClientSession", object)
+sys.modules.setdefault("aiohttp", aiohttp_module)
+
 aliyun_core_module = types.ModuleType("aliyunsdkcore")
 aliyun_client_module = types.ModuleType("aliyunsdkcore.client")
 setattr(aliyun_client_module, "AcsClient", type("AcsClient", (), {}))
@@ -62,34 +68,200 @@ for module_name, class_name in (
     ("aliyunsdkalidns.request.v20150109.AddDomainRecordRequest", "AddDomainRecordRequest"),
     ("aliyunsdkalidns.request.v20150109.DeleteDomainRecordRequest", "DeleteDomainRecordRequest"),
     ("aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest", "DescribeDomainRecordsRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeSubDomainRecordsRequest", "DescribeSubDomainRecordsRequest"),
+    ("aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest", "UpdateDomainRecordRequest"),
+    ("aliyunsdkalidns.request.v20150109.OperateBatchDomainRequest", "OperateBatchDomainRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeBatchResultCountRequest", "DescribeBatchResultCountRequest"),
+    ("aliyunsdkalidns.request.v20150109.DescribeBatchResultDetailRequest", "DescribeBatchResultDetailRequest"),
+    ("aliyunsdkalidns.request.v20150109.SetDNSSLBStatusRequest", "SetDNSSLBStatusRequest"),
+    ("aliyunsdkalidns.request.v20150109.UpdateDNSSLBWeightRequest", "UpdateDNSSLBWeightRequest"),
 ):
     module = types.ModuleType(module_name)
     setattr(module, class_name, type(class_name, (), {}))
     sys.modules.setdefault(module_name, module)
 
 
-from src.main import _apply_validation_state, _rotate_aged_production_records
-from src.project_config import RuntimeConfig
-from src.runtime_state import RuntimeState, get_line_pollution_score, get_record_anomaly_streak, is_record_in_rotation_cooldown
-from src.workflow_rules import ValidationSummary
+from src.main import (
+    _add_standby_reprobes,
+    _apply_validation_state,
+    _compact_runtime_state,
+    _maintain_production_target,
+    _replace_with_standby,
+    _rollback_recent_changes,
+    _rotate_aged_production_records,
+    _run_first_pass,
+    _run_production_track,
+)
+from src.project_config import ProductionTarget, RuntimeConfig, parse_production_targets
+from src.runtime_state import (
+    RuntimeState,
+    append_record_latency_samples,
+    get_line_pollution_score,
+    get_production_snapshot,
+    get_record_anomaly_score,
+    get_record_latency_samples,
+    get_standby_ips,
+    is_record_in_rotation_cooldown,
+    mark_standby_first_pass,
+    mark_standby_validated,
+    save_production_snapshot,
+    set_record_anomaly_score,
+)
+from src.stage_checkpoint import StageCheckpoint
+from src.workflow_rules import RecordAggregate, ValidationSummary
 
 
 class MainFlowTests(unittest.TestCase):
-    def test_apply_validation_state_treats_non_production_ip_as_pollution(self):
+    def test_apply_validation_state_scores_line_pollution_from_line_aggregates(self):
         config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
         state = RuntimeState()
         summary = ValidationSummary(
             healthy_records={("1.1.1.1", "mobile")},
             anomalous_records={("2.2.2.2", "mobile")},
+            line_aggregates={"mobile": RecordAggregate(4, 2, 2.2, 2.4, node_weight=4.0, success_weight=2.0)},
         )
         production_record_set = {("1.1.1.1", "mobile")}
 
         deletion_candidates, polluted_lines = _apply_validation_state(config, state, summary, production_record_set)
 
         self.assertEqual(deletion_candidates, [])
+        self.assertEqual(polluted_lines, set())
+        self.assertAlmostEqual(get_line_pollution_score(state, "mobile"), 0.6)
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "2.2.2.2"), 0.0)
+
+        _, polluted_lines = _apply_validation_state(config, state, summary, production_record_set)
         self.assertEqual(polluted_lines, {"mobile"})
-        self.assertEqual(get_line_pollution_score(state, "mobile"), 1)
-        self.assertEqual(get_record_anomaly_streak(state, "www", "mobile", "2.2.2.2"), 0)
+
+        _apply_validation_state(config, state, ValidationSummary(healthy_records={("1.1.1.1", "mobile")}), production_record_set)
+        self.assertAlmostEqual(get_line_pollution_score(state, "mobile"), 0.7)
+
+    def test_apply_validation_state_attributes_province_fallback_to_parent_line(self):
+        config = RuntimeConfig(
+            domain_rr="www",
+            domain_root="example.com",
+            sleep_time=1800,
+            fine_grained_lines=("cn_telecom_guangdong",),
+        )
+        state = RuntimeState()
+        summary = ValidationSummary(anomalous_records={("3.3.3.3", "cn_telecom_guangdong")})
+        production_record_set = {("3.3.3.3", "telecom")}
+
+        deletion_candidates, polluted_lines = _apply_validation_state(config, state, summary, production_record_set)
+
+        self.assertEqual(deletion_candidates, [])
+        self.assertEqual(polluted_lines, set())
+        self.assertEqual(get_record_anomaly_score(state, "www", "telecom", "3.3.3.3"), 0.5)
+
+    def test_apply_validation_state_deletes_severe_degradation_at_once_and_ignores_one_off_noise(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        production_record_set = {("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")}
+        degraded = ValidationSummary(
+            anomalous_records={("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")},
+            record_aggregates={
+                ("1.1.1.1", "mobile"): RecordAggregate(4, 0, None, None, node_weight=4.0, success_weight=0.0),
+                ("2.2.2.2", "mobile"): RecordAggregate(4, 4, 2.1, 2.3, node_weight=4.0, success_weight=4.0),
+            },
+        )
+        recovered = ValidationSummary(
+            healthy_records={("2.2.2.2", "mobile")},
+            record_aggregates={("2.2.2.2", "mobile"): RecordAggregate(4, 4, 0.3, 0.4, node_weight=4.0, success_weight=4.0)},
+        )
+
+        deletion_candidates, _ = _apply_validation_state(config, state, degraded, production_record_set)
+        self.assertEqual(deletion_candidates, [{"ip": "1.1.1.1", "line": "mobile"}])
+        _apply_validation_state(config, state, recovered, production_record_set)
+        deletion_candidates, _ = _apply_validation_state(config, state, degraded, production_record_set)
+
+        self.assertEqual(deletion_candidates, [{"ip": "1.1.1.1", "line": "mobile"}])
+        self.assertAlmostEqual(get_record_anomaly_score(state, "www", "mobile", "2.2.2.2"), 0.6)
+
+    def test_apply_validation_state_lets_moderate_healthy_latency_recover_the_score(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        production_record_set = {("2.2.2.2", "mobile")}
+        degraded = ValidationSummary(
+            anomalous_records={("2.2.2.2", "mobile")},
+            record_aggregates={("2.2.2.2", "mobile"): RecordAggregate(4, 4, 2.4, 2.6, node_weight=4.0, success_weight=4.0)},
+        )
+        blip = ValidationSummary(
+            anomalous_records={("2.2.2.2", "mobile")},
+            record_aggregates={("2.2.2.2", "mobile"): RecordAggregate(4, 4, 2.1, 2.3, node_weight=4.0, success_weight=4.0)},
+        )
+        healthy = ValidationSummary(
+            healthy_records={("2.2.2.2", "mobile")},
+            record_aggregates={("2.2.2.2", "mobile"): RecordAggregate(4, 4, 1.2, 1.3, node_weight=4.0, success_weight=4.0)},
+        )
+
+        _apply_validation_state(config, state, degraded, production_record_set)
+        _apply_validation_state(config, state, degraded, production_record_set)
+        for _ in range(3):
+            _apply_validation_state(config, state, healthy, production_record_set)
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "2.2.2.2"), 0.0)
+
+        deletion_candidates, _ = _apply_validation_state(config, state, blip, production_record_set)
+        self.assertEqual(deletion_candidates, [])
+
+    def test_apply_validation_state_keeps_one_latency_p50_per_cycle_without_weighted_round_robin(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        summary = ValidationSummary(
+            healthy_records={("1.1.1.1", "mobile")},
+            record_total_times={("1.1.1.1", "mobile"): [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]},
+        )
+
+        for _ in range(7):
+            _apply_validation_state(config, state, summary, {("1.1.1.1", "mobile")})
+
+        self.assertFalse(config.weighted_round_robin)
+        self.assertEqual(get_record_latency_samples(state, "www", "mobile", "1.1.1.1"), [0.55] * 6)
+
+    def test_apply_validation_state_does_not_flag_records_that_are_healthy_this_round(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        set_record_anomaly_score(state, "www", "mobile", "2.2.2.2", 3.0)
+
+        deletion_candidates, _ = _apply_validation_state(
+            config,
+            state,
+            ValidationSummary(healthy_records={("2.2.2.2", "mobile")}),
+            {("2.2.2.2", "mobile")},
+        )
+
+        self.assertEqual(deletion_candidates, [])
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "2.2.2.2"), 2.5)
+
+    def test_standby_swap_respects_production_floor(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        set_record_anomaly_score(state, "www", "mobile", "1.1.1.1", 3.0)
+        mark_standby_validated(state, "mobile", "7.7.7.7")
+        existing_records = [
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": ip_address, "RecordId": f"r-{index}"}
+            for index, ip_address in enumerate(("1.1.1.1", "2.2.2.2", "3.3.3.3"))
+        ]
+        summary = ValidationSummary(
+            healthy_records={("2.2.2.2", "mobile"), ("3.3.3.3", "mobile")},
+            anomalous_records={("1.1.1.1", "mobile")},
+        )
+
+        with patch("src.main.cf2alidns.ensure_production_dns_records"), \
+             patch("src.main.run_itdog_test", return_value="[]"), \
+             patch("src.main._record_measurements"), \
+             patch("src.main.summarize_validation_results", return_value=summary), \
+             patch("src.main.should_freeze_production_deletions", return_value=False), \
+             patch("src.main._should_freeze_for_source_healthcheck", return_value=False), \
+             patch("src.main._get_current_production_records", return_value=existing_records), \
+             patch("src.main._save_last_good_snapshot"), \
+             patch("src.main._rotate_aged_production_records"), \
+             patch("src.main._prune_surplus_production_records"), \
+             patch("src.main._rebalance_production_weights"), \
+             patch("src.main._replace_with_standby") as replace_mock, \
+             patch("src.main.cf2alidns.delete_record_by_value") as delete_mock:
+            _maintain_production_target(config, state, "A", {"mobile": []}, [])
+
+        replace_mock.assert_not_called()
+        delete_mock.assert_not_called()
 
     def test_rotate_aged_production_records_respects_budgets_and_sets_cooldown(self):
         config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
@@ -100,30 +272,20 @@ class MainFlowTests(unittest.TestCase):
             "telecom": ["5.5.5.5"],
         }
         existing_records = [
-            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "unicom", "Value": "2.2.2.2", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "telecom", "Value": "6.6.6.6", "CreateTimestamp": 1},
-        ]
-        after_mobile_records = [
-            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "3.3.3.3", "CreateTimestamp": 2},
-            {"RR": "www", "Type": "A", "Line": "unicom", "Value": "2.2.2.2", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "telecom", "Value": "6.6.6.6", "CreateTimestamp": 1},
-        ]
-        after_telecom_records = [
-            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "3.3.3.3", "CreateTimestamp": 2},
-            {"RR": "www", "Type": "A", "Line": "unicom", "Value": "2.2.2.2", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "telecom", "Value": "6.6.6.6", "CreateTimestamp": 1},
-            {"RR": "www", "Type": "A", "Line": "telecom", "Value": "5.5.5.5", "CreateTimestamp": 2},
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "RecordId": "r-1", "CreateTimestamp": 1},
+            {"RR": "www", "Type": "A", "Line": "unicom", "Value": "2.2.2.2", "RecordId": "r-2", "CreateTimestamp": 1},
+            {"RR": "www", "Type": "A", "Line": "telecom", "Value": "6.6.6.6", "RecordId": "r-3", "CreateTimestamp": 1},
         ]
 
+        def fake_update(domain_name, record, value):
+            record["Value"] = value
+            return True
+
         fake_now = 2_000_000_000
         with patch("src.main.time.time", return_value=fake_now), \
              patch("src.runtime_state.time.time", return_value=fake_now), \
-             patch("src.main._get_current_production_records", side_effect=[existing_records, after_mobile_records, after_telecom_records]), \
-             patch("src.main.cf2alidns.add_record") as add_record_mock, \
-             patch("src.main.cf2alidns.delete_record_by_value") as delete_record_mock:
+             patch("src.main._get_current_production_records", return_value=existing_records) as query_mock, \
+             patch("src.main.cf2alidns.update_record_value", side_effect=fake_update) as update_mock:
             _rotate_aged_production_records(
                 config,
                 state,
@@ -132,12 +294,185 @@ class MainFlowTests(unittest.TestCase):
                 polluted_lines={"mobile", "telecom"},
             )
 
-        self.assertEqual(add_record_mock.call_count, 2)
-        self.assertEqual(delete_record_mock.call_count, 2)
+        self.assertEqual(query_mock.call_count, 1)
+        self.assertEqual(update_mock.call_count, 2)
+        self.assertEqual(sorted(record["Value"] for record in existing_records), ["2.2.2.2", "3.3.3.3", "5.5.5.5"])
         with patch("src.runtime_state.time.time", return_value=fake_now):
             self.assertTrue(is_record_in_rotation_cooldown(state, "www", "mobile", "1.1.1.1"))
             self.assertTrue(is_record_in_rotation_cooldown(state, "www", "telecom", "6.6.6.6"))
 
+    def test_run_production_track_shares_first_pass_across_targets(self):
+        config = RuntimeConfig(
+            domain_rr="www",
+            domain_root="example.com",
+            sleep_time=1800,
+            extra_targets=parse_production_targets("api@example.com, www@other.com,www@example.com", ProductionTarget("www", "example.com")),
+        )
+        selected_ips = {"mobile": ["1.1.1.1"], "unicom": [], "telecom": []}
+        maintained_targets = []
+
+        def fake_maintain(target_config, state, record_type, selected_ips_by_carrier, oversea_lines, capacity=None, checkpoint=None):
+            maintained_targets.append((target_config.domain_rr, target_config.domain_root, target_config.state_key))
+            self.assertIs(selected_ips_by_carrier, selected_ips)
+
+        with patch("src.main._plan_zone_capacity", return_value={}), \
+             patch("src.main._run_first_pass", return_value=selected_ips) as first_pass_mock, \
+             patch("src.main._maintain_production_target", side_effect=fake_maintain):
+            _run_production_track(config, RuntimeState(), "A", {"mobile": ["1.1.1.1"], "unicom": [], "telecom": []})
+
+        self.assertEqual(first_pass_mock.call_count, 1)
+        self.assertEqual(
+            maintained_targets,
+            [
+                ("www", "example.com", "www"),
+                ("api", "example.com", "api.example.com"),
+                ("www", "other.com", "www.other.com"),
+            ],
+        )
+        with self.assertRaises(ValueError):
+            parse_production_targets("api.example.com")
+
+    def test_run_first_pass_resumes_from_checkpointed_first_pass_result(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        json_temp = json.dumps([{"检测点": "移动北京", "状态": "530", "总耗时": "0.20s", "响应IP": "1.1.1.1"}], ensure_ascii=False)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            checkpoint = StageCheckpoint(Path(temp_dir) / "checkpoint.json", fingerprint="cfg")
+            checkpoint.put("first_pass:A", json_temp)
+
+            with patch("src.main.cf2alidns.sync_aliyun_dns_records_exact") as sync_mock, \
+                 patch("src.main.run_itdog_test") as itdog_mock:
+                selected_ips = _run_first_pass(config, "A", {"mobile": ["1.1.1.1"]}, [], checkpoint=checkpoint)
+
+            self.assertEqual(selected_ips["mobile"], ["1.1.1.1"])
+            self.assertEqual(checkpoint.get("selection:A"), selected_ips)
+            sync_mock.assert_not_called()
+            itdog_mock.assert_not_called()
+
+    def test_rollback_restores_snapshot_only_when_anomalies_hit_recent_records(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        existing_records = [
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "RecordId": "r-1"},
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "5.5.5.5", "RecordId": "r-5"},
+        ]
+        global_outage = ValidationSummary(
+            healthy_records={("5.5.5.5", "mobile")},
+            anomalous_records={("1.1.1.1", "mobile")},
+        )
+        bad_rotation = ValidationSummary(
+            healthy_records={("1.1.1.1", "mobile")},
+            anomalous_records={("5.5.5.5", "mobile")},
+        )
+
+        state = RuntimeState()
+        save_production_snapshot(state, "www", "A", {("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")})
+        with patch("src.main._get_current_production_records", return_value=existing_records), \
+             patch("src.main.cf2alidns.restore_production_snapshot", return_value=([("5.5.5.5", "mobile")], [("2.2.2.2", "mobile")])) as restore_mock:
+            self.assertFalse(_rollback_recent_changes(config, state, global_outage, "A"))
+            self.assertTrue(_rollback_recent_changes(config, state, bad_rotation, "A"))
+            self.assertFalse(_rollback_recent_changes(config, state, bad_rotation, "A"))
+
+        self.assertEqual(restore_mock.call_count, 1)
+        self.assertIsNone(get_production_snapshot(state, "www", "A", max_age_hours=24))
+        self.assertTrue(is_record_in_rotation_cooldown(state, "www", "mobile", "5.5.5.5"))
+
+
+    def test_rollback_keeps_snapshot_when_restore_does_not_converge(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        existing_records = [
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "RecordId": "r-1"},
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "5.5.5.5", "RecordId": "r-5"},
+        ]
+        bad_rotation = ValidationSummary(
+            healthy_records={("1.1.1.1", "mobile")},
+            anomalous_records={("5.5.5.5", "mobile")},
+        )
+        state = RuntimeState()
+        save_production_snapshot(state, "www", "A", {("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")})
+
+        with patch("src.main._get_current_production_records", return_value=existing_records), \
+             patch("src.main.cf2alidns.restore_production_snapshot", side_effect=[([], []), ([("5.5.5.5", "mobile")], [])]):
+            self.assertFalse(_rollback_recent_changes(config, state, bad_rotation, "A"))
+            self.assertFalse(_rollback_recent_changes(config, state, bad_rotation, "A"))
+
+        self.assertEqual(get_production_snapshot(state, "www", "A", max_age_hours=24), {("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")})
+        self.assertTrue(is_record_in_rotation_cooldown(state, "www", "mobile", "5.5.5.5"))
+
+    def test_healthy_production_records_enter_standby_pool_and_replace_failed_records_at_once(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        _apply_validation_state(
+            config,
+            state,
+            ValidationSummary(healthy_records={("7.7.7.7", "mobile")}),
+            {("7.7.7.7", "mobile")},
+        )
+        mark_standby_first_pass(state, "mobile", "7.7.7.7")
+        existing_records = [
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "RecordId": "r-1"},
+            {"RR": "www", "Type": "A", "Line": "mobile", "Value": "2.2.2.2", "RecordId": "r-2"},
+        ]
+        production_record_set = {("1.1.1.1", "mobile"), ("2.2.2.2", "mobile")}
+
+        def fake_update(domain_name, record, value):
+            record["Value"] = value
+            return True
+
+        with patch("src.main.cf2alidns.update_record_value", side_effect=fake_update) as update_mock:
+            replaced = _replace_with_standby(
+                config,
+                state,
+                {"ip": "1.1.1.1", "line": "mobile"},
+                existing_records,
+                production_record_set,
+            )
+            replaced_again = _replace_with_standby(
+                config,
+                state,
+                {"ip": "2.2.2.2", "line": "mobile"},
+                existing_records,
+                production_record_set,
+            )
+
+        self.assertTrue(replaced)
+        self.assertFalse(replaced_again)
+        self.assertEqual(update_mock.call_count, 1)
+        self.assertEqual(existing_records[0]["Value"], "7.7.7.7")
+        self.assertEqual(production_record_set, {("7.7.7.7", "mobile"), ("2.2.2.2", "mobile")})
+
+    def test_compaction_keeps_record_state_when_zone_query_fails(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        set_record_anomaly_score(state, "www", "mobile", "1.1.1.1", 0.5)
+        append_record_latency_samples(state, "www", "mobile", "1.1.1.1", [0.3], history_size=6)
+
+        with patch("src.main.cf2alidns.try_query_all_domain_records", return_value=None):
+            _compact_runtime_state(config, state)
+
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "1.1.1.1"), 0.5)
+        self.assertEqual(get_record_latency_samples(state, "www", "mobile", "1.1.1.1"), [0.3])
+
+        with patch("src.main.cf2alidns.try_query_all_domain_records", return_value=[]):
+            _compact_runtime_state(config, state)
+
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "1.1.1.1"), 0.0)
+
+    def test_standby_ips_are_reprobed_in_temp_unless_already_in_production(self):
+        config = RuntimeConfig(domain_rr="www", domain_root="example.com", sleep_time=1800)
+        state = RuntimeState()
+        for ip_address in ("7.7.7.7", "8.8.8.8", "2001:db8::1"):
+            mark_standby_validated(state, "mobile", ip_address)
+        production_records = [{"RR": "www", "Type": "A", "Line": "mobile", "Value": "8.8.8.8", "RecordId": "r-1"}]
+        initial_ips = {"mobile": [f"10.0.0.{index}" for index in range(20)], "unicom": ["11.0.0.1"]}
+
+        with patch("src.main._try_get_current_production_records", return_value=production_records):
+            merged = _add_standby_reprobes(config, state, initial_ips, "A")
+
+        self.assertEqual(merged["mobile"][0], "7.7.7.7")
+        self.assertEqual(len(merged["mobile"]), 20)
+        self.assertNotIn("8.8.8.8", merged["mobile"])
+        self.assertEqual(merged["unicom"], ["11.0.0.1"])
+        self.assertEqual(get_standby_ips(state, "mobile", 2, 6), [])
+
 
 if __name__ == "__main__":
     unittest.main()
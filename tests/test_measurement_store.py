@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.measurement_store import PHASE_FIRST_PASS, PHASE_VALIDATION, MeasurementStore
+from src.workflow_rules import ProbeObservation
+
+
+def _observation(ip_address, line_name, total_time_seconds, passed=True, detection_point="移动上海"):
+    return ProbeObservation(ip_address, line_name, detection_point, "530", total_time_seconds, passed)
+
+
+class MeasurementStoreTests(unittest.TestCase):
+    def test_observations_roundtrip_and_are_queryable_after_reopen(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MeasurementStore(Path(temp_dir) / "metrics")
+            store.append_observations(
+                [_observation("1.1.1.1", "mobile", 0.2), _observation("1.1.1.1", "mobile", None, passed=False)],
+                PHASE_FIRST_PASS,
+                timestamp=1_000,
+            )
+            store.append_observations([_observation("2.2.2.2", "unicom", 0.4)], PHASE_VALIDATION, timestamp=2_000)
+
+            reopened_store = MeasurementStore(Path(temp_dir) / "metrics")
+            rows = reopened_store.iter_observations(ip_address="1.1.1.1")
+            stats = reopened_store.query_stats(line_name="mobile")
+            recent_stats = reopened_store.query_stats(since=1_500)
+
+        self.assertEqual([row.total_time_seconds for row in rows], [0.2, None])
+        self.assertEqual(rows[0].detection_point, "移动上海")
+        self.assertEqual(stats[("1.1.1.1", "mobile")].samples, 2)
+        self.assertEqual(stats[("1.1.1.1", "mobile")].pass_rate, 0.5)
+        self.assertAlmostEqual(stats[("1.1.1.1", "mobile")].mean_total_time, 0.2, places=5)
+        self.assertEqual(list(recent_stats), [("2.2.2.2", "unicom")])
+
+    def test_compact_rolls_old_rows_into_hourly_aggregates_and_applies_retention(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MeasurementStore(Path(temp_dir) / "metrics", raw_retention_hours=1, hourly_retention_days=1)
+            store.append_observations([_observation("1.1.1.1", "mobile", 0.5)], PHASE_FIRST_PASS, timestamp=3_600)
+            store.append_observations(
+                [_observation("1.1.1.1", "mobile", 0.3), _observation("1.1.1.1", "mobile", 0.1)],
+                PHASE_FIRST_PASS,
+                timestamp=2 * 86_400,
+            )
+            store.append_observations([_observation("1.1.1.1", "mobile", 0.2)], PHASE_FIRST_PASS, timestamp=2 * 86_400 + 7_200)
+
+            rolled_rows = store.compact(now_timestamp=2 * 86_400 + 7_300)
+            stats = MeasurementStore(Path(temp_dir) / "metrics").query_stats()[("1.1.1.1", "mobile")]
+            raw_rows = store.iter_observations()
+            generations = sorted(path.name for path in (Path(temp_dir) / "metrics").glob("gen-*"))
+
+        self.assertEqual(rolled_rows, 3)
+        self.assertEqual(stats.samples, 3)
+        self.assertAlmostEqual(stats.mean_total_time, 0.2, places=5)
+        self.assertEqual([row.timestamp for row in raw_rows], [2 * 86_400 + 7_200])
+        self.assertEqual(generations, ["gen-1"])
+
+    def test_torn_append_is_truncated_to_complete_rows(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store_path = Path(temp_dir) / "metrics"
+            store = MeasurementStore(store_path)
+            store.append_observations([_observation("1.1.1.1", "mobile", 0.2)], PHASE_FIRST_PASS, timestamp=1_000)
+            with (store_path / "gen-0" / "raw.timestamp.col").open("ab") as handle:
+                handle.write(os.urandom(6))
+
+            rows = MeasurementStore(store_path).iter_observations()
+
+        self.assertEqual(len(rows), 1)
+
+
+    def test_compact_drops_dictionary_entries_no_longer_referenced(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store_path = Path(temp_dir) / "metrics"
+            store = MeasurementStore(store_path, raw_retention_hours=1, hourly_retention_days=1)
+            store.append_observations([_observation("9.9.9.9", "unicom", 0.5, detection_point="联通北京")], PHASE_FIRST_PASS, timestamp=3_600)
+            store.append_observations([_observation("1.1.1.1", "mobile", 0.2)], PHASE_FIRST_PASS, timestamp=2 * 86_400)
+
+            store.compact(now_timestamp=2 * 86_400 + 600)
+            dictionary = json.loads((store_path / "gen-1" / "dictionary.json").read_text(encoding="utf-8"))
+            rows = MeasurementStore(store_path).iter_observations()
+
+        self.assertEqual(dictionary["ip"], ["1.1.1.1"])
+        self.assertEqual(dictionary["node"], ["移动上海"])
+        self.assertEqual([(row.ip_address, row.line_name) for row in rows], [("1.1.1.1", "mobile")])
+
+    def test_rows_with_codes_missing_from_dictionary_are_dropped_on_load(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store_path = Path(temp_dir) / "metrics"
+            store = MeasurementStore(store_path)
+            store.append_observations([_observation("1.1.1.1", "mobile", 0.2)], PHASE_FIRST_PASS, timestamp=1_000)
+            saved_dictionary = (store_path / "gen-0" / "dictionary.json").read_text(encoding="utf-8")
+            store.append_observations([_observation("2.2.2.2", "mobile", 0.3)], PHASE_FIRST_PASS, timestamp=2_000)
+            (store_path / "gen-0" / "dictionary.json").write_text(saved_dictionary, encoding="utf-8")
+
+            rows = MeasurementStore(store_path).iter_observations()
+
+        self.assertEqual([row.ip_address for row in rows], ["1.1.1.1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
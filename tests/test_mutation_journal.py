@@ -0,0 +1,49 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.mutation_journal import MutationJournal, is_entry_applied
+
+
+class MutationJournalTests(unittest.TestCase):
+    def test_pending_entries_survive_reload_and_ignore_torn_tail(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            journal_path = Path(temp_dir) / "journal.jsonl"
+            journal = MutationJournal(journal_path)
+            first_id, second_id = journal.begin(
+                [
+                    {"op": "add", "domain": "example.com", "rr": "temp", "type": "A", "line": "mobile", "value": "1.1.1.1"},
+                    {"op": "delete", "domain": "example.com", "rr": "www", "type": "A", "line": "mobile", "value": "2.2.2.2"},
+                ]
+            )
+            journal.complete([first_id])
+            with journal_path.open("a", encoding="utf-8") as handle:
+                handle.write('{"id": 9, "op": "ad')
+
+            reloaded = MutationJournal(journal_path)
+
+            self.assertEqual([entry["id"] for entry in reloaded.pending_entries()], [second_id])
+            self.assertEqual(reloaded.begin([{"op": "add"}]), [second_id + 1])
+
+            reloaded.complete([second_id, second_id + 1], "abandoned")
+            self.assertEqual(journal_path.read_text(encoding="utf-8"), "")
+
+    def test_is_entry_applied_checks_zone_records(self):
+        records = [{"RR": "www", "Type": "A", "Line": "mobile", "Value": "1.1.1.1", "RecordId": "r-1"}]
+        add_entry = {"op": "add", "rr": "www", "type": "A", "line": "mobile", "value": "1.1.1.1"}
+        delete_entry = {"op": "delete", "rr": "www", "type": "A", "line": "mobile", "value": "3.3.3.3", "record_id": "r-3"}
+        update_entry = {"op": "update", "rr": "www", "type": "A", "line": "mobile", "value": "4.4.4.4", "record_id": "r-1"}
+
+        self.assertTrue(is_entry_applied(add_entry, records))
+        self.assertTrue(is_entry_applied(delete_entry, records))
+        self.assertFalse(is_entry_applied(update_entry, records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.node_reliability import find_node_disagreements, get_node_weights, update_node_reliability
+from src.runtime_state import RuntimeState
+from src.workflow_rules import extract_probe_observations, summarize_validation_results
+
+
+VALIDATION_RESULTS = [
+    {"检测点": "移动上海", "状态": "530", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
+    {"检测点": "移动北京", "状态": "530", "总耗时": "0.40s", "响应IP": "1.1.1.1"},
+    {"检测点": "移动广州", "状态": "530", "总耗时": "0.35s", "响应IP": "1.1.1.1"},
+    {"检测点": "移动坏点", "状态": "失败", "总耗时": "9.00s", "响应IP": "1.1.1.1"},
+    {"检测点": "移动深圳", "状态": "530", "总耗时": "0.30s", "响应IP": "解析失败"},
+]
+
+
+class NodeReliabilityTests(unittest.TestCase):
+    def test_disagreement_is_judged_against_peer_consensus(self):
+        observations = extract_probe_observations(
+            json.dumps(VALIDATION_RESULTS, ensure_ascii=False),
+            validation=True,
+            include_unresolved=True,
+        )
+
+        disagreements = find_node_disagreements(observations)
+
+        self.assertEqual(
+            disagreements,
+            {"移动上海": False, "移动北京": False, "移动广州": False, "移动坏点": True, "移动深圳": True},
+        )
+
+    def test_chronically_disagreeing_node_is_excluded_from_validation(self):
+        state = RuntimeState()
+        json_string = json.dumps(VALIDATION_RESULTS, ensure_ascii=False)
+        observations = extract_probe_observations(json_string, validation=True, include_unresolved=True)
+        for _ in range(5):
+            update_node_reliability(state, observations)
+
+        node_weights = get_node_weights(state)
+        summary = summarize_validation_results(json_string, node_weights=node_weights)
+
+        self.assertEqual(node_weights["移动坏点"], 0.0)
+        self.assertEqual(node_weights["移动上海"], 1.0)
+        self.assertIsNotNone(summary)
+        assert summary is not None
+        self.assertEqual(summary.excluded_points, 2)
+        self.assertEqual(summary.anomalous_points, 0)
+        self.assertEqual(summary.record_aggregates[("1.1.1.1", "mobile")].success_rate, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
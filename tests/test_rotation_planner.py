@@ -0,0 +1,66 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.rotation_planner import RotationRecord, plan_rotation_swaps
+
+
+def _rotation_record(line_name, ip_address, expected_latency, age_hours=13.0, pollution_score=0):
+    return RotationRecord(
+        line_name=line_name,
+        record={"Line": line_name, "Value": ip_address},
+        expected_latency=expected_latency,
+        age_hours=age_hours,
+        pollution_score=pollution_score,
+    )
+
+
+class RotationPlannerTests(unittest.TestCase):
+    def test_pairs_slowest_records_with_fastest_candidates_within_budgets(self):
+        records_by_line = {
+            "mobile": [_rotation_record("mobile", "1.1.1.1", 0.9), _rotation_record("mobile", "1.1.1.2", 0.3)],
+            "unicom": [_rotation_record("unicom", "2.2.2.1", 0.6)],
+            "telecom": [_rotation_record("telecom", "3.3.3.1", 1.5)],
+        }
+        candidates = {
+            "mobile": {"9.9.9.1": 0.5, "9.9.9.2": 0.2},
+            "unicom": {"9.9.9.3": 0.2},
+            "telecom": {"9.9.9.4": 1.4},
+        }
+
+        swaps = plan_rotation_swaps(records_by_line, candidates, {"mobile": 1, "unicom": 1, "telecom": 1}, total_budget=2)
+
+        self.assertEqual([(swap.old_ip, swap.new_ip) for swap in swaps], [("1.1.1.1", "9.9.9.2"), ("2.2.2.1", "9.9.9.3")])
+        self.assertAlmostEqual(swaps[0].gain_seconds, 0.9 - 0.2 - 0.15)
+
+    def test_churn_penalty_keeps_marginal_and_fresh_records(self):
+        records_by_line = {
+            "mobile": [_rotation_record("mobile", "1.1.1.1", 0.40)],
+            "unicom": [_rotation_record("unicom", "2.2.2.1", 0.60, age_hours=1.0)],
+        }
+        candidates = {"mobile": {"9.9.9.1": 0.30}, "unicom": {"9.9.9.2": 0.35}}
+
+        swaps = plan_rotation_swaps(records_by_line, candidates, {"mobile": 1, "unicom": 1}, total_budget=2)
+
+        self.assertEqual(swaps, [])
+
+    def test_aged_and_polluted_records_rotate_without_latency_data(self):
+        records_by_line = {
+            "mobile": [_rotation_record("mobile", "1.1.1.1", None, age_hours=30.0)],
+            "unicom": [_rotation_record("unicom", "2.2.2.1", None, age_hours=13.0, pollution_score=2)],
+            "telecom": [_rotation_record("telecom", "3.3.3.1", None, age_hours=13.0)],
+        }
+        candidates = {"mobile": {"9.9.9.1": 0.3}, "unicom": {"9.9.9.2": 0.3}, "telecom": {"9.9.9.3": 0.3}}
+
+        swaps = plan_rotation_swaps(records_by_line, candidates, {"mobile": 1, "unicom": 0, "telecom": 1}, total_budget=3)
+
+        self.assertEqual([swap.old_ip for swap in swaps], ["1.1.1.1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
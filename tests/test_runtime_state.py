@@ -1,8 +1,10 @@
+import json
 import sys
 import tempfile
 import time
 import unittest
 from pathlib import Path
+from contextlib import closing
 from unittest.mock import patch
 
 
@@ -12,51 +14,147 @@ if str(REPO_ROOT) not in sys.path:
 
 from src.runtime_state import (
     RuntimeState,
+    _connect_state_db,
+    _write_state_changes,
+    append_record_latency_samples,
     clear_record_state,
-    decay_line_pollution_scores,
-    get_record_anomaly_streak,
+    compact_record_state,
+    evict_stale_runtime_state,
+    get_record_anomaly_score,
+    get_record_latency_samples,
     get_line_pollution_score,
-    increment_record_anomaly_streak,
-    increment_line_pollution_score,
     is_record_in_rotation_cooldown,
     load_runtime_state,
-    mark_record_healthy,
     prune_expired_runtime_state,
     save_runtime_state,
+    discard_standby_entry,
+    get_standby_ips,
+    mark_standby_first_pass,
+    mark_standby_validated,
+    prune_standby_pool,
+    set_line_pollution_score,
+    set_record_anomaly_score,
     set_record_rotation_cooldown,
 )
 
 
 class RuntimeStateTests(unittest.TestCase):
-    def test_increment_and_clear_record_streak(self):
+    def test_set_and_clear_record_anomaly_score(self):
         state = RuntimeState()
 
-        streak = increment_record_anomaly_streak(state, "www", "mobile", "1.1.1.1")
-        self.assertEqual(streak, 1)
-        self.assertEqual(get_record_anomaly_streak(state, "www", "mobile", "1.1.1.1"), 1)
+        set_record_anomaly_score(state, "www", "mobile", "1.1.1.1", 0.5)
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "1.1.1.1"), 0.5)
 
-        mark_record_healthy(state, "www", "mobile", "1.1.1.1")
-        self.assertEqual(get_record_anomaly_streak(state, "www", "mobile", "1.1.1.1"), 0)
+        set_record_anomaly_score(state, "www", "mobile", "1.1.1.1", 0.0)
+        self.assertEqual(state.record_anomaly_scores, {})
 
-        increment_record_anomaly_streak(state, "www", "mobile", "1.1.1.1")
+        set_record_anomaly_score(state, "www", "mobile", "1.1.1.1", 1.5)
         clear_record_state(state, "www", "mobile", "1.1.1.1")
-        self.assertEqual(get_record_anomaly_streak(state, "www", "mobile", "1.1.1.1"), 0)
+        self.assertEqual(get_record_anomaly_score(state, "www", "mobile", "1.1.1.1"), 0.0)
 
     def test_load_and_save_runtime_state_roundtrip(self):
         state = RuntimeState(
-            record_anomaly_streaks={"www|mobile|1.1.1.1": 2},
+            record_anomaly_scores={"www|mobile|1.1.1.1": 1.5},
             record_rotation_cooldowns={"www|mobile|2.2.2.2": int(time.time()) + 3600},
-            line_pollution_scores={"telecom": 2},
+            line_pollution_scores={"telecom": 0.5},
+            record_latency_samples={"www|mobile|1.1.1.1": [0.2, 0.3]},
+            production_snapshots={"www|A": {"saved_at": int(time.time()), "records": [["1.1.1.1", "mobile"]]}},
         )
 
         with tempfile.TemporaryDirectory() as temp_dir:
-            fake_path = Path(temp_dir) / ".cfsdns_state.json"
-            with patch("src.runtime_state.STATE_FILE_PATH", fake_path):
+            with patch("src.runtime_state.STATE_FILE_PATH", Path(temp_dir) / ".cfsdns_state.json"), \
+                 patch("src.runtime_state.STATE_DB_PATH", Path(temp_dir) / ".cfsdns_state.db"):
                 save_runtime_state(state)
                 loaded_state = load_runtime_state()
 
-        self.assertEqual(loaded_state.record_anomaly_streaks, state.record_anomaly_streaks)
+        self.assertEqual(loaded_state.record_anomaly_scores, state.record_anomaly_scores)
         self.assertEqual(loaded_state.line_pollution_scores, state.line_pollution_scores)
+        self.assertEqual(loaded_state.record_latency_samples, state.record_latency_samples)
+        self.assertEqual(loaded_state.production_snapshots, state.production_snapshots)
+
+    def test_legacy_json_state_is_migrated_and_later_saves_are_incremental(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            json_path = Path(temp_dir) / ".cfsdns_state.json"
+            db_path = Path(temp_dir) / ".cfsdns_state.db"
+            json_path.write_text(
+                json.dumps({"record_anomaly_streaks": {"www|mobile|1.1.1.1": 1}, "line_pollution_scores": {"mobile": 2}}),
+                encoding="utf-8",
+            )
+            with patch("src.runtime_state.STATE_FILE_PATH", json_path), patch("src.runtime_state.STATE_DB_PATH", db_path):
+                migrated_state = load_runtime_state()
+                self.assertFalse(json_path.exists())
+                self.assertTrue(json_path.with_name(".cfsdns_state.json.migrated").exists())
+
+                set_record_anomaly_score(migrated_state, "www", "mobile", "1.1.1.1", 2.0)
+                set_record_anomaly_score(migrated_state, "www", "mobile", "9.9.9.9", 0.0)
+                migrated_state.line_pollution_scores.pop("mobile")
+                with closing(_connect_state_db()) as connection:
+                    written_rows = _write_state_changes(connection, migrated_state)
+                reloaded_state = load_runtime_state()
+
+        self.assertEqual(written_rows, 2)
+        self.assertEqual(reloaded_state.record_anomaly_scores, {"www|mobile|1.1.1.1": 2.0})
+        self.assertEqual(reloaded_state.line_pollution_scores, {})
+
+    def test_unreadable_legacy_json_is_kept_for_a_later_migration(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            json_path = Path(temp_dir) / ".cfsdns_state.json"
+            db_path = Path(temp_dir) / ".cfsdns_state.db"
+            json_path.write_text('{"record_anomaly_streaks": {', encoding="utf-8")
+            with patch("src.runtime_state.STATE_FILE_PATH", json_path), patch("src.runtime_state.STATE_DB_PATH", db_path):
+                empty_state = load_runtime_state()
+                self.assertTrue(json_path.exists())
+                self.assertFalse(json_path.with_name(".cfsdns_state.json.migrated").exists())
+
+                json_path.write_text(json.dumps({"record_anomaly_streaks": {"www|mobile|1.1.1.1": 1}}), encoding="utf-8")
+                migrated_state = load_runtime_state()
+                self.assertFalse(json_path.exists())
+
+        self.assertEqual(empty_state.record_anomaly_scores, {})
+        self.assertEqual(migrated_state.record_anomaly_scores, {"www|mobile|1.1.1.1": 1.0})
+
+    def test_stale_entries_are_evicted_by_ttl_and_lru(self):
+        state = RuntimeState()
+        with patch("src.runtime_state.time.time", return_value=1000):
+            set_record_anomaly_score(state, "www", "mobile", "1.1.1.1", 0.5)
+            set_line_pollution_score(state, "mobile", 0.5)
+        for offset, ip_address in enumerate(("2.2.2.2", "3.3.3.3", "4.4.4.4")):
+            with patch("src.runtime_state.time.time", return_value=1000 + 3 * 3600 + offset):
+                set_record_anomaly_score(state, "www", "unicom", ip_address, 0.5)
+        with patch("src.runtime_state.time.time", return_value=1000 + 3 * 3600):
+            set_line_pollution_score(state, "mobile", 1.0)
+
+        evicted_count = evict_stale_runtime_state(state, ttl_hours=2, max_entries_per_map=2, now_timestamp=1000 + 3 * 3600 + 3)
+
+        self.assertEqual(evicted_count, 2)
+        self.assertEqual(set(state.record_anomaly_scores), {"www|unicom|3.3.3.3", "www|unicom|4.4.4.4"})
+        self.assertEqual(get_line_pollution_score(state, "mobile"), 1.0)
+
+    def test_compaction_drops_records_missing_from_zone_and_unmanaged_rrs(self):
+        state = RuntimeState(
+            record_anomaly_scores={"www|mobile|1.1.1.1": 0.5, "www|mobile|2.2.2.2": 0.5, "old|mobile|1.1.1.1": 0.5},
+            record_rotation_cooldowns={"www|mobile|9.9.9.9": int(time.time()) + 3600, "old|mobile|8.8.8.8": int(time.time()) + 3600},
+            record_latency_samples={"api.b.com|telecom|3.3.3.3": [0.2]},
+            production_snapshots={"www|A": {"records": []}, "old|A": {"records": []}},
+        )
+
+        dropped_count = compact_record_state(state, {"www": {("1.1.1.1", "mobile")}, "api.b.com": None})
+
+        self.assertEqual(dropped_count, 4)
+        self.assertEqual(state.record_anomaly_scores, {"www|mobile|1.1.1.1": 0.5})
+        self.assertEqual(set(state.record_rotation_cooldowns), {"www|mobile|9.9.9.9"})
+        self.assertEqual(state.record_latency_samples, {"api.b.com|telecom|3.3.3.3": [0.2]})
+        self.assertEqual(set(state.production_snapshots), {"www|A"})
+
+    def test_latency_history_is_capped_and_cleared_with_record_state(self):
+        state = RuntimeState()
+
+        append_record_latency_samples(state, "www", "mobile", "1.1.1.1", [0.1, 0.2], history_size=3)
+        history = append_record_latency_samples(state, "www", "mobile", "1.1.1.1", [0.3, 0.4], history_size=3)
+        self.assertEqual(history, [0.2, 0.3, 0.4])
+
+        clear_record_state(state, "www", "mobile", "1.1.1.1")
+        self.assertEqual(get_record_latency_samples(state, "www", "mobile", "1.1.1.1"), [])
 
     def test_rotation_cooldown_expires(self):
         state = RuntimeState()
@@ -68,17 +166,31 @@ class RuntimeStateTests(unittest.TestCase):
         prune_expired_runtime_state(state, now_timestamp=1000 + 3601)
         self.assertFalse(is_record_in_rotation_cooldown(state, "www", "mobile", "1.1.1.1"))
 
-    def test_pollution_score_increment_and_decay(self):
+    def test_pollution_score_is_dropped_when_it_returns_to_zero(self):
         state = RuntimeState()
 
-        score = increment_line_pollution_score(state, "telecom", score_cap=6)
-        self.assertEqual(score, 1)
-        score = increment_line_pollution_score(state, "telecom", score_cap=6)
-        self.assertEqual(score, 2)
-        self.assertEqual(get_line_pollution_score(state, "telecom"), 2)
+        set_line_pollution_score(state, "Telecom", 1.5)
+        self.assertEqual(get_line_pollution_score(state, "telecom"), 1.5)
+
+        set_line_pollution_score(state, "telecom", 0.0)
+        self.assertEqual(state.line_pollution_scores, {})
+
+    def test_standby_pool_requires_both_passes_to_be_fresh(self):
+        state = RuntimeState()
+
+        mark_standby_first_pass(state, "mobile", "9.9.9.9", now_timestamp=1_001_000)
+        self.assertEqual(state.line_standby_pool, {})
+
+        mark_standby_validated(state, "mobile", "1.1.1.1", now_timestamp=1_001_000)
+        mark_standby_validated(state, "mobile", "2.2.2.2", now_timestamp=1_002_000)
+        mark_standby_validated(state, "unicom", "3.3.3.3", now_timestamp=1_002_000)
+        self.assertEqual(get_standby_ips(state, "mobile", 2, 6, now_timestamp=1_002_000), [])
 
-        decay_line_pollution_scores(state, active_lines={"mobile"})
-        self.assertEqual(get_line_pollution_score(state, "telecom"), 1)
+        for ip_address in ("1.1.1.1", "2.2.2.2"):
+            mark_standby_first_pass(state, "mobile", ip_address, now_timestamp=1_003_000)
+        self.assertEqual(get_standby_ips(state, "mobile", 2, 6, now_timestamp=1_003_000), ["2.2.2.2", "1.1.1.1"])
+        self.assertEqual(get_standby_ips(state, "mobile", 2, 6, now_timestamp=1_003_000 + 3 * 3600), [])
 
-        decay_line_pollution_scores(state, active_lines={"mobile"})
-        self.assertEqual(get_line_pollution_score(state, "telecom"), 0)
+        discard_standby_entry(state, "mobile", "2.2.2.2")
+        self.assertEqual(prune_standby_pool(state, validation_max_age_hours=6, now_timestamp=1_001_000 + 6 * 3600 + 1), 1)
+        self.assertEqual(set(state.line_standby_pool), {"unicom|3.3.3.3"})
@@ -0,0 +1,44 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.stage_checkpoint import StageCheckpoint
+
+
+class StageCheckpointTests(unittest.TestCase):
+    def test_stages_are_reused_within_ttl_for_same_fingerprint(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            checkpoint_path = Path(temp_dir) / "checkpoint.json"
+            with patch("src.stage_checkpoint.time.time", return_value=1_000):
+                StageCheckpoint(checkpoint_path, fingerprint="cfg-1", ttl_seconds=60).put("selection:A", {"mobile": ["1.1.1.1"]})
+
+            with patch("src.stage_checkpoint.time.time", return_value=1_030):
+                self.assertEqual(
+                    StageCheckpoint(checkpoint_path, fingerprint="cfg-1", ttl_seconds=60).get("selection:A"),
+                    {"mobile": ["1.1.1.1"]},
+                )
+                self.assertIsNone(StageCheckpoint(checkpoint_path, fingerprint="cfg-2", ttl_seconds=60).get("selection:A"))
+            with patch("src.stage_checkpoint.time.time", return_value=1_061):
+                self.assertIsNone(StageCheckpoint(checkpoint_path, fingerprint="cfg-1", ttl_seconds=60).get("selection:A"))
+
+    def test_clear_removes_checkpoint_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            checkpoint_path = Path(temp_dir) / "checkpoint.json"
+            checkpoint = StageCheckpoint(checkpoint_path, fingerprint="cfg")
+            checkpoint.put("candidates:A", {"mobile": []})
+
+            checkpoint.clear()
+
+            self.assertFalse(checkpoint_path.exists())
+            self.assertIsNone(checkpoint.get("candidates:A"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.measurement_store import PHASE_VALIDATION, MeasurementStore, hour_of_week
+from src.time_profiles import build_peak_outlook
+from src.workflow_rules import ProbeObservation
+
+
+# 2026-10-12 00:00（北京时间，周一）。
+WEEK_START = 1_791_734_400
+
+
+def _fill_week(store):
+    for hour in range(7 * 24):
+        is_evening_peak = hour % 24 in (21, 22)
+        observations = []
+        for index in range(10):
+            detection_point = f"移动{index}"
+            observations.append(ProbeObservation("1.1.1.1", "mobile", detection_point, "530", 0.3, True))
+            observations.append(
+                ProbeObservation("2.2.2.2", "mobile", detection_point, "530", 1.5 if is_evening_peak else 0.3, True)
+            )
+            observations.append(ProbeObservation("3.3.3.3", "unicom", detection_point, "530", 0.4, True))
+        store.append_observations(observations, PHASE_VALIDATION, timestamp=WEEK_START + hour * 3600)
+
+
+class TimeProfileTests(unittest.TestCase):
+    def test_hour_of_week_uses_local_time_starting_monday(self):
+        self.assertEqual(hour_of_week(WEEK_START), 0)
+        self.assertEqual(hour_of_week(WEEK_START + 6 * 86400 + 23 * 3600), 167)
+        self.assertEqual(hour_of_week(WEEK_START + 7 * 86400), 0)
+
+    def test_predicts_upcoming_peak_and_penalizes_ips_that_degrade_at_peak(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = MeasurementStore(Path(temp_dir) / "metrics")
+            _fill_week(store)
+            evening_outlook = build_peak_outlook(store, now_timestamp=WEEK_START + 7 * 86400 + 20 * 3600)
+            morning_outlook = build_peak_outlook(store, now_timestamp=WEEK_START + 7 * 86400 + 4 * 3600)
+
+        self.assertEqual(list(evening_outlook.peak_hours_by_line), ["mobile"])
+        self.assertEqual(evening_outlook.peak_hours_by_line["mobile"], [21, 22])
+        steady_score = evening_outlook.adjust_latency("1.1.1.1", "mobile", 0.3)
+        degrading_score = evening_outlook.adjust_latency("2.2.2.2", "mobile", 0.3)
+        self.assertLess(steady_score, 0.4)
+        self.assertGreater(degrading_score, 1.3)
+        self.assertAlmostEqual(evening_outlook.adjust_latency("9.9.9.9", "mobile", 0.3), 0.9)
+        self.assertEqual(evening_outlook.adjust_latency("3.3.3.3", "unicom", 0.4), 0.4)
+        self.assertEqual(morning_outlook.peak_hours_by_line, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
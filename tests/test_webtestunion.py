@@ -40,7 +40,7 @@ class WebTestUnionTests(unittest.IsolatedAsyncioTestCase):
         fake_context = FakeContext()
         fake_page = object()
 
-        async def fake_open_page(context, event):
+        async def fake_open_page(context, event, itdog_url=None):
             return fake_page
 
         async def fake_run_workflow(page, event, target_host, custom_dns):
@@ -9,14 +9,35 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from src.workflow_rules import (
+    aggregate_probe_observations,
     collect_bad_records,
+    compute_record_weights,
+    extract_probe_observations,
     filter_and_select_ips,
+    get_parent_line,
     should_freeze_production_deletions,
     summarize_validation_results,
 )
 
 
 class FilterAndSelectIpsTests(unittest.TestCase):
+    def test_extract_probe_observations_uses_phase_specific_pass_rules(self):
+        raw_results = json.dumps(
+            [
+                {"检测点": "移动上海", "状态": "530", "总耗时": "1.50s", "响应IP": "1.1.1.1"},
+                {"检测点": "联通北京", "状态": "失败", "总耗时": "0.20s", "响应IP": "2.2.2.2"},
+                {"检测点": "电信南京", "状态": "530", "总耗时": "0.20s", "响应IP": "解析失败"},
+            ],
+            ensure_ascii=False,
+        )
+
+        first_pass = extract_probe_observations(raw_results)
+        validation = extract_probe_observations(raw_results, validation=True)
+
+        self.assertEqual([(item.ip_address, item.line_name, item.passed) for item in first_pass], [("1.1.1.1", "mobile", False), ("2.2.2.2", "unicom", False)])
+        self.assertEqual([item.passed for item in validation], [True, False])
+        self.assertEqual(first_pass[0].total_time_seconds, 1.5)
+
     def test_filter_and_select_ips_keeps_only_fast_530_results(self):
         raw_results = [
             {"检测点": "移动上海", "状态": "530", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
@@ -49,6 +70,62 @@ class FilterAndSelectIpsTests(unittest.TestCase):
 
         self.assertEqual(result["mobile"], ["1.1.1.1"])
 
+    def test_filter_and_select_ips_keeps_top_k_by_score_instead_of_random_sample(self):
+        raw_results = [
+            {"检测点": "移动上海", "状态": "530", "总耗时": "0.90s", "响应IP": "1.1.1.1"},
+            {"检测点": "移动北京", "状态": "530", "总耗时": "0.20s", "响应IP": "2.2.2.2"},
+            {"检测点": "移动广州", "状态": "530", "总耗时": "0.50s", "响应IP": "3.3.3.3"},
+        ]
+        json_string = json.dumps(raw_results, ensure_ascii=False)
+
+        by_current_run = filter_and_select_ips(json_string, count_per_carrier=2)
+        by_score = filter_and_select_ips(
+            json_string,
+            count_per_carrier=2,
+            latency_scores={("1.1.1.1", "mobile"): 0.25, ("2.2.2.2", "mobile"): 0.60},
+        )
+
+        self.assertEqual(by_current_run["mobile"], ["2.2.2.2", "3.3.3.3"])
+        self.assertEqual(by_score["mobile"], ["1.1.1.1", "3.3.3.3"])
+
+    def test_filter_and_select_ips_feeds_enabled_province_lines_and_parent_line(self):
+        raw_results = [
+            {"检测点": "电信广州", "状态": "530", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
+            {"检测点": "电信北京", "状态": "530", "总耗时": "0.40s", "响应IP": "2.2.2.2"},
+            {"检测点": "移动深圳", "状态": "530", "总耗时": "0.40s", "响应IP": "3.3.3.3"},
+        ]
+
+        result = filter_and_select_ips(
+            json.dumps(raw_results, ensure_ascii=False),
+            fine_grained_lines=("cn_telecom_guangdong", "cn_unicom_beijing"),
+        )
+
+        self.assertEqual(result["cn_telecom_guangdong"], ["1.1.1.1"])
+        self.assertEqual(result["cn_unicom_beijing"], [])
+        self.assertEqual(result["telecom"], ["1.1.1.1", "2.2.2.2"])
+        self.assertEqual(result["mobile"], ["3.3.3.3"])
+        self.assertEqual(get_parent_line("cn_telecom_guangdong"), "telecom")
+
+
+class RecordWeightTests(unittest.TestCase):
+    def test_compute_record_weights_scales_by_median_latency_per_line(self):
+        weights = compute_record_weights(
+            {
+                ("1.1.1.1", "mobile"): [0.2, 0.1, 0.1],
+                ("2.2.2.2", "mobile"): [0.4],
+                ("3.3.3.3", "mobile"): [],
+                ("4.4.4.4", "mobile"): [0.1],
+                ("5.5.5.5", "unicom"): [0.9],
+            },
+            anomalous_records={("4.4.4.4", "mobile")},
+        )
+
+        self.assertEqual(weights[("1.1.1.1", "mobile")], 100)
+        self.assertEqual(weights[("2.2.2.2", "mobile")], 25)
+        self.assertEqual(weights[("3.3.3.3", "mobile")], 50)
+        self.assertEqual(weights[("4.4.4.4", "mobile")], 1)
+        self.assertEqual(weights[("5.5.5.5", "unicom")], 100)
+
 
 class CollectBadRecordsTests(unittest.TestCase):
     def test_collect_bad_records_marks_failure_and_slow_records(self):
@@ -79,7 +156,7 @@ class CollectBadRecordsTests(unittest.TestCase):
 
 
 class ValidationSummaryTests(unittest.TestCase):
-    def test_summarize_validation_results_marks_record_healthy_if_any_point_is_healthy(self):
+    def test_summarize_validation_results_marks_record_healthy_when_half_of_points_succeed(self):
         raw_results = [
             {"检测点": "移动上海", "状态": "失败", "总耗时": "2.5s", "响应IP": "1.1.1.1"},
             {"检测点": "移动北京", "状态": "530", "总耗时": "0.40s", "响应IP": "1.1.1.1"},
@@ -92,6 +169,94 @@ class ValidationSummaryTests(unittest.TestCase):
         self.assertIn(("1.1.1.1", "mobile"), summary.healthy_records)
         self.assertNotIn(("1.1.1.1", "mobile"), summary.anomalous_records)
 
+    def test_one_lucky_point_does_not_keep_or_promote_a_slow_ip(self):
+        raw_results = [
+            {"检测点": "移动上海", "状态": "530", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
+            {"检测点": "移动北京", "状态": "530", "总耗时": "2.40s", "响应IP": "1.1.1.1"},
+            {"检测点": "移动广州", "状态": "530", "总耗时": "2.60s", "响应IP": "1.1.1.1"},
+            {"检测点": "移动深圳", "状态": "失败", "总耗时": "0.50s", "响应IP": "1.1.1.1"},
+        ]
+        json_string = json.dumps(raw_results, ensure_ascii=False)
+
+        summary = summarize_validation_results(json_string)
+        selection = filter_and_select_ips(json_string)
+
+        self.assertIsNotNone(summary)
+        assert summary is not None
+        aggregate = summary.record_aggregates[("1.1.1.1", "mobile")]
+        self.assertEqual((aggregate.node_count, aggregate.success_count), (4, 3))
+        self.assertAlmostEqual(aggregate.p50_total_time, 2.4)
+        self.assertAlmostEqual(aggregate.p90_total_time, 2.56)
+        self.assertEqual(summary.anomalous_records, {("1.1.1.1", "mobile")})
+        self.assertEqual(selection["mobile"], [])
+
+    def test_line_aggregates_count_unresolved_points_as_failures(self):
+        json_string = json.dumps(
+            [
+                {"检测点": "移动北京", "状态": "200", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
+                {"检测点": "移动上海", "状态": "200", "总耗时": "0.50s", "响应IP": "2.2.2.2"},
+                {"检测点": "移动广州", "状态": "200", "总耗时": "0.20s", "响应IP": "解析失败"},
+                {"检测点": "移动深圳", "状态": "失败", "总耗时": "0.10s", "响应IP": "1.1.1.1"},
+            ],
+            ensure_ascii=False,
+        )
+
+        summary = summarize_validation_results(json_string)
+
+        aggregate = summary.line_aggregates["mobile"]
+        self.assertEqual((aggregate.node_count, aggregate.success_count), (4, 2))
+        self.assertAlmostEqual(aggregate.success_rate, 0.5)
+        self.assertAlmostEqual(aggregate.p50_total_time, 0.4)
+
+    def test_summarize_validation_results_uses_enabled_province_line(self):
+        raw_results = [
+            {"检测点": "电信广州", "状态": "530", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
+            {"检测点": "电信北京", "状态": "530", "总耗时": "0.40s", "响应IP": "2.2.2.2"},
+        ]
+
+        summary = summarize_validation_results(
+            json.dumps(raw_results, ensure_ascii=False),
+            fine_grained_lines=("cn_telecom_guangdong",),
+        )
+
+        self.assertIsNotNone(summary)
+        assert summary is not None
+        self.assertEqual(summary.healthy_records, {("1.1.1.1", "cn_telecom_guangdong"), ("2.2.2.2", "telecom")})
+        self.assertEqual(summary.lines_seen, {"cn_telecom_guangdong", "telecom"})
+
+    def test_oversea_points_use_oversea_profile_and_feed_all_oversea_lines(self):
+        raw_results = [
+            {"检测点": "香港", "状态": "530", "总耗时": "1.20s", "响应IP": "1.1.1.1"},
+            {"检测点": "美国洛杉矶", "状态": "530", "总耗时": "1.80s", "响应IP": "2.2.2.2"},
+            {"检测点": "电信北京", "状态": "530", "总耗时": "1.20s", "响应IP": "3.3.3.3"},
+        ]
+        json_string = json.dumps(raw_results, ensure_ascii=False)
+
+        without_oversea = filter_and_select_ips(json_string)
+        result = filter_and_select_ips(json_string, oversea_lines=("default", "oversea"))
+
+        self.assertNotIn("oversea", without_oversea)
+        self.assertEqual(result["oversea"], ["1.1.1.1"])
+        self.assertEqual(result["default"], ["1.1.1.1"])
+        self.assertEqual(result["telecom"], [])
+
+        summary = summarize_validation_results(
+            json.dumps(
+                [
+                    {"检测点": "日本东京", "状态": "530", "总耗时": "2.50s", "响应IP": "1.1.1.1"},
+                    {"检测点": "电信北京", "状态": "530", "总耗时": "2.50s", "响应IP": "3.3.3.3"},
+                ],
+                ensure_ascii=False,
+            ),
+            oversea_lines=("oversea",),
+        )
+
+        self.assertIsNotNone(summary)
+        assert summary is not None
+        self.assertEqual(summary.healthy_records, {("1.1.1.1", "oversea")})
+        self.assertEqual(summary.anomalous_records, {("3.3.3.3", "telecom")})
+        self.assertEqual(get_parent_line("oversea"), "default")
+
     def test_should_freeze_production_deletions_when_all_lines_are_anomalous(self):
         raw_results = [
             {"检测点": "移动上海", "状态": "失败", "总耗时": "2.5s", "响应IP": "1.1.1.1"},
@@ -127,5 +292,29 @@ class ValidationSummaryTests(unittest.TestCase):
         self.assertTrue(should_freeze_production_deletions(summary))
 
 
+    def test_summary_aggregates_match_shared_observation_aggregation(self):
+        json_string = json.dumps(
+            [
+                {"检测点": "移动北京", "状态": "200", "总耗时": "0.30s", "响应IP": "1.1.1.1"},
+                {"检测点": "移动上海", "状态": "失败", "总耗时": "0.10s", "响应IP": "1.1.1.1"},
+                {"检测点": "移动广州", "状态": "200", "总耗时": "2.50s", "响应IP": "1.1.1.1"},
+                {"检测点": "联通北京", "状态": "200", "总耗时": "0.20s", "响应IP": "解析失败"},
+            ],
+            ensure_ascii=False,
+        )
+        node_weights = {"移动广州": 0.5}
+
+        summary = summarize_validation_results(json_string, node_weights=node_weights)
+        expected = aggregate_probe_observations(
+            extract_probe_observations(json_string, validation=True),
+            validation=True,
+            node_weights=node_weights,
+        )
+
+        self.assertEqual(summary.record_aggregates, expected)
+        self.assertEqual(summary.healthy_records, {("1.1.1.1", "mobile")})
+        self.assertEqual(summary.unresolved_anomaly_points, 1)
+
+
 if __name__ == "__main__":
     unittest.main()